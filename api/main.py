@@ -2,6 +2,15 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .routes import planner, assistant, teacher, practice, revision
+from app.logic.metrics import install_metrics
+from app.logic.compression import CompressionMiddleware
+from app.logic.binary_codec import BinaryNegotiationMiddleware, schema_document
+from app.logic.profiling import ProfilingMiddleware, init_profiling_from_env
+from app.logic.logging_setup import configure_logging
+
+# Log records are formatted and written on a background thread
+configure_logging()
+init_profiling_from_env()
 
 app = FastAPI()
 
@@ -30,6 +39,15 @@ app.include_router(revision.router, prefix="/revision")
 async def ping():
     return {"status": "ok"}
 
+@app.get("/binary_schema")
+async def binary_schema():
+    return schema_document()
+
+install_metrics(app)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(BinaryNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
@@ -1,6 +1,14 @@
+import asyncio
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+
+from app.teacher.modes.teacher_mode import teacher_llm_request
+from app.teacher.modes.practice import practice_llm_request
+from app.teacher.modes.revision import revision_llm_request
+from app.logic.sessions import session_store
+from app.logic.llm import is_llm_request, run_llm_request
+from app.logic.admission import LANES, LANE_CHEAP, LANE_LLM, admission
 
 router = APIRouter()
 
@@ -43,3 +51,99 @@ async def assistant_action(request: AssistantRequest):
         return {"message": "Exam mode activated", "session_id": session_id}
     else:
         raise HTTPException(status_code=400, detail="Invalid mode")
+
+
+# =========================
+# BATCH
+# =========================
+
+_BATCH_MODES = {
+    "teacher": teacher_llm_request,
+    "practice": practice_llm_request,
+    "revision": revision_llm_request,
+}
+
+MAX_BATCH_ITEMS = 32
+
+class BatchItem(BaseModel):
+    mode: str
+    action: str
+    payload: Dict[str, Any] = Field(default_factory=dict)
+
+class BatchRequest(BaseModel):
+    session_id: str
+    items: List[BatchItem] = Field(..., max_length=MAX_BATCH_ITEMS)
+    # Optional topic list / plan; recorded as a topic edit if it changed
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    # Run LLM-backed items through the model (concurrently) instead of
+    # returning their prompts
+    execute: bool = False
+
+
+def _run_item(item: BatchItem, session_id: str, session_state: Dict[str, Any]) -> Dict[str, Any]:
+    handler = _BATCH_MODES.get((item.mode or "").strip().lower())
+    if handler is None:
+        return {"error": True, "reason": f"unknown_mode: {item.mode}"}
+
+    # Mode functions may mutate payload (e.g. start_practice); keep ours intact
+    if handler is revision_llm_request:
+        # Reuses the session's high-yield index across calls
+        result = handler(item.action, dict(item.payload), session_state, session_id=session_id)
+    else:
+        result = handler(item.action, dict(item.payload), session_state)
+    if handler is practice_llm_request:
+        session_store.record_practice_result(session_id, result)
+    return result
+
+
+async def _execute(llm_request: Dict[str, Any]) -> Dict[str, Any]:
+    # A saturated LLM lane fails just this item (LaneSaturated), not the batch
+    async with LANES[LANE_LLM].slot():
+        return await run_llm_request(llm_request)
+
+
+@router.post("/batch")
+async def assistant_batch(request: BatchRequest):
+    """
+    Run many {mode, action, payload} items against one session in a single
+    roundtrip. Prompt building and pure-Python actions run inline, in order,
+    under the session lock (cheap admission lane); LLM-backed items then run
+    concurrently in the llm lane. Each item gets its own result or error.
+    """
+    results: List[Dict[str, Any]] = []
+    pending: Dict[int, Dict[str, Any]] = {}
+
+    async with admission(LANE_CHEAP), session_store.lock(request.session_id):
+        session_state = session_store.attach(request.session_id, request.session_state)
+        for key in ("plan", "plan_id"):
+            if key in request.session_state:
+                session_state = {**session_state, key: request.session_state[key]}
+
+        for index, item in enumerate(request.items):
+            entry: Dict[str, Any] = {"index": index, "mode": item.mode, "action": item.action}
+            try:
+                result = _run_item(item, request.session_id, session_state)
+            except Exception as e:
+                result = {"error": True, "reason": f"{type(e).__name__}: {e}"}
+
+            if result.get("error"):
+                entry.update(ok=False, error=result.get("reason"))
+            elif request.execute and is_llm_request(result):
+                pending[index] = result
+            else:
+                entry.update(ok=True, result=result)
+            results.append(entry)
+
+    if pending:
+        indices = list(pending)
+        outcomes = await asyncio.gather(
+            *(_execute(pending[i]) for i in indices),
+            return_exceptions=True,
+        )
+        for index, outcome in zip(indices, outcomes):
+            if isinstance(outcome, BaseException):
+                results[index].update(ok=False, error=f"{type(outcome).__name__}: {outcome}")
+            else:
+                results[index].update(ok=True, result=outcome)
+
+    return {"session_id": request.session_id, "results": results}
@@ -1,27 +1,44 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header
 from pydantic import BaseModel
 from typing import List
 from datetime import date
 
 from app.logic.scheduler import build_topics_from_payload, generate_study_plan, study_plan_to_dict
+from app.logic.http_cache import plan_etag, etag_matches, not_modified, json_response
+from app.logic.admission import LANE_CHEAP, lane_dependency
+from app.logic.availability import availability_extra, calendar_from_request
+from app.logic.plan_store import plan_store
+from app.schemas import AvailabilityInput
 
 
 router = APIRouter()
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class PlannerRequest(BaseModel):
     topics: List[Dict[str, Any]]
     start_date: date
     exam_date: date
     hours_per_day: float
+    availability: Optional[AvailabilityInput] = None
 
-@router.post("/generate_study_plan")
-async def generate_plan(request: PlannerRequest):
+@router.post("/generate_study_plan", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
+async def generate_plan(request: PlannerRequest, if_none_match: Optional[str] = Header(None)):
     """
     Generates a study plan based on a list of topics, a start date, an exam date, and the number of hours per day.
     """
     try:
+        # 0. Same inputs as the client's cached copy -> 304, no scheduling at all
+        etag = plan_etag(
+            request.topics,
+            request.start_date,
+            request.exam_date,
+            request.hours_per_day,
+            extra={"availability": availability_extra(request.availability)} if request.availability else None,
+        )
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
         # 1. Build topics from the payload
         topic_objects = build_topics_from_payload(request.topics)
 
@@ -30,13 +47,15 @@ async def generate_plan(request: PlannerRequest):
             topics=topic_objects,
             start_date=request.start_date,
             exam_date=request.exam_date,
-            hours_per_day=request.hours_per_day
+            hours_per_day=request.hours_per_day,
+            calendar=calendar_from_request(request.hours_per_day, request.availability),
         )
 
         # 3. Convert the StudyPlan to a JSON-serializable dictionary
         plan_dict = study_plan_to_dict(study_plan)
+        plan_dict["plan_id"] = plan_store.put(plan_dict, request.topics)
 
-        return plan_dict
+        return json_response(plan_dict, etag)
 
     except Exception as e:
         return {"error": True, "message": str(e)}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, List
 import sys
@@ -7,6 +7,7 @@ sys.path.append('/mnt/c/Users/Lenovo/ai_study_assistant_backend')
 # Now importing from the actual practice.py
 from app.teacher.modes.practice import practice_llm_request
 from app.logic.scheduler import build_topics_from_payload, Topic
+from app.logic.admission import LANE_CHEAP, lane_dependency
 
 router = APIRouter()
 
@@ -19,7 +20,7 @@ class PracticeRequest(BaseModel):
     payload: Dict[str, Any]
     session_state: Dict[str, Any]
 
-@router.post("/")
+@router.post("/", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
 async def practice_action(request: PracticeRequest):
     """
     Routes requests to the appropriate practice mode function.
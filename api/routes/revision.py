@@ -1,12 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 import sys
 sys.path.append('/mnt/c/Users/Lenovo/ai_study_assistant_backend')
 
 # Now importing from the actual revision.py
 from app.teacher.modes.revision import revision_llm_request
 from app.logic.scheduler import build_topics_from_payload, Topic
+from app.logic.admission import LANE_CHEAP, lane_dependency
 
 router = APIRouter()
 
@@ -17,16 +18,17 @@ sessions: Dict[str, Dict[str, Any]] = {}
 class RevisionRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    plan_id: Optional[str] = None # Stored plan (see /scheduler/plans) instead of a full plan in session_state
 
-@router.post("/")
+@router.post("/", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
 async def revision_action(request: RevisionRequest):
     """
     Routes requests to the appropriate revision/exam mode function.
     """
     llm_request = revision_llm_request(
         action=request.action,
-        payload=request.payload,
+        payload={**request.payload, "plan_id": request.plan_id} if request.plan_id else request.payload,
         session_state=request.session_state
     )
 
@@ -1,12 +1,13 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 import sys
 sys.path.append('/mnt/c/Users/Lenovo/ai_study_assistant_backend')
 
 # Now importing from the actual teacher_mode.py
 from app.teacher.modes.teacher_mode import teacher_llm_request
 from app.logic.scheduler import build_topics_from_payload, Topic, StudyPlan
+from app.logic.admission import LANE_CHEAP, lane_dependency
 
 router = APIRouter()
 
@@ -16,9 +17,10 @@ sessions: Dict[str, Dict[str, Any]] = {}
 class TeacherRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    plan_id: Optional[str] = None # Stored plan (see /scheduler/plans) instead of a full plan in session_state
 
-@router.post("/")
+@router.post("/", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
 async def teacher_action(request: TeacherRequest):
     """
     Routes requests to the appropriate teacher mode function.
@@ -27,7 +29,7 @@ async def teacher_action(request: TeacherRequest):
     # We will just return that dictionary for now.
     llm_request = teacher_llm_request(
         action=request.action,
-        payload=request.payload,
+        payload={**request.payload, "plan_id": request.plan_id} if request.plan_id else request.payload,
         session_state=request.session_state
     )
 
@@ -0,0 +1,217 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from app.logic.llm import LLM_MAX_CONCURRENCY
+from app.logic.metrics import REGISTRY
+from app.teacher.modes.exam import EXAM_ACTION_COSTS
+from app.teacher.modes.practice import PRACTICE_ACTION_COSTS
+from app.teacher.modes.revision import REVISION_ACTION_COSTS
+from app.teacher.modes.teacher_mode import TEACHER_ACTION_COSTS
+
+
+# =========================
+# CONFIG
+# =========================
+#
+# Lanes with independent limits, so model-bound requests and bulk imports
+# can never take the slots that pure-Python work (plans, topic_stats,
+# high_yield_topics, ...) needs:
+#
+#   cheap   plan generation, pure-Python actions, prompt building
+#   llm     actions whose prompt is executed against the model
+#   import  syllabus imports (POST /topics/import), which stream and
+#           normalize for seconds
+#
+# ADMISSION_<LANE>_CONCURRENCY  requests running at once
+# ADMISSION_<LANE>_QUEUE        requests allowed to wait for a slot; beyond
+#                               that -> 429 immediately
+# ADMISSION_<LANE>_MAX_WAIT     seconds a queued request waits before 503
+#
+# Both rejections carry Retry-After.
+
+LANE_CHEAP = "cheap"
+LANE_LLM = "llm"
+LANE_IMPORT = "import"
+
+_DEFAULTS = {
+    LANE_CHEAP: {"concurrency": 64, "queue": 256, "max_wait": 1.0},
+    LANE_LLM: {"concurrency": LLM_MAX_CONCURRENCY, "queue": 32, "max_wait": 5.0},
+    LANE_IMPORT: {"concurrency": 2, "queue": 4, "max_wait": 5.0},
+}
+
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total", "Requests rejected by admission control.", ("lane", "reason"),
+)
+ADMISSION_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds", "Time spent queued for a lane slot.", ("lane",),
+)
+
+
+class LaneSaturated(Exception):
+    def __init__(self, lane: str, status_code: int, retry_after: int):
+        super().__init__(f"{lane} lane saturated")
+        self.lane = lane
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+# =========================
+# LANE
+# =========================
+
+class Lane:
+    """
+    Counting semaphore with a bounded FIFO of waiters. A released slot is
+    handed straight to the oldest waiter, so queued requests cannot be
+    overtaken by new arrivals.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue = max(0, queue)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _retry_after(self) -> int:
+        # Rough time for the current backlog to drain, at least one second
+        return max(1, int(self.max_wait * (self.queued + 1) / self.concurrency + 0.5))
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.queue:
+            ADMISSION_REJECTED.inc(self.name, "queue_full")
+            raise LaneSaturated(self.name, 429, self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({waiter}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        finally:
+            ADMISSION_WAIT.observe(time.perf_counter() - started, self.name)
+
+        if not done:
+            self._abandon(waiter)
+            ADMISSION_REJECTED.inc(self.name, "wait_timeout")
+            raise LaneSaturated(self.name, 503, self._retry_after())
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up; pass it on
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # slot moves to the waiter
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def _lane_from_env(name: str) -> Lane:
+    defaults = _DEFAULTS[name]
+    prefix = f"ADMISSION_{name.upper()}_"
+    return Lane(
+        name,
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", str(defaults["concurrency"]))),
+        queue=int(os.getenv(prefix + "QUEUE", str(defaults["queue"]))),
+        max_wait=float(os.getenv(prefix + "MAX_WAIT", str(defaults["max_wait"]))),
+    )
+
+
+LANES: Dict[str, Lane] = {name: _lane_from_env(name) for name in _DEFAULTS}
+
+
+# =========================
+# COST CLASSES
+# =========================
+
+_ACTION_COSTS: Dict[str, Dict[str, str]] = {
+    "practice": PRACTICE_ACTION_COSTS,
+    "revision": REVISION_ACTION_COSTS,
+    "teacher": TEACHER_ACTION_COSTS,
+    "exam": EXAM_ACTION_COSTS,
+}
+
+
+def lane_for(mode: str, action: str, execute: bool) -> str:
+    """
+    Lane for one mode action. "llm" actions only build a prompt unless the
+    caller asked to execute it, so they stay in the cheap lane otherwise.
+    Unknown actions are rejected by the mode router right away: cheap.
+    """
+    if not execute:
+        return LANE_CHEAP
+    costs = _ACTION_COSTS.get((mode or "").strip().lower(), {})
+    return costs.get((action or "").strip().lower(), LANE_CHEAP)
+
+
+# =========================
+# FASTAPI GLUE
+# =========================
+
+@asynccontextmanager
+async def admission(lane: str) -> AsyncIterator[None]:
+    """
+    async with admission(lane_for("practice", body.action, body.execute)): ...
+
+    Saturation surfaces as HTTPException 429 (queue full) or 503 (waited too
+    long), both with Retry-After.
+    """
+    from fastapi import HTTPException
+
+    try:
+        await LANES[lane].acquire()
+    except LaneSaturated as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"{e.lane} lane saturated, retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        yield
+    finally:
+        LANES[lane].release()
+
+
+def lane_dependency(lane: str):
+    """
+    Route dependency form, for handlers whose lane does not depend on the
+    body: @router.post(..., dependencies=[Depends(lane_dependency("cheap"))]).
+    """
+    async def dependency() -> AsyncIterator[None]:
+        async with admission(lane):
+            yield
+
+    return dependency
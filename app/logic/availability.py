@@ -0,0 +1,178 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+
+# =========================
+# CALENDAR
+# =========================
+#
+# Study hours per date: a weekly template (Mon..Sun) plus per-date
+# exceptions (exams, trips, blocked days). The scheduler never walks the
+# calendar directly; it asks a CapacityIndex built for the plan horizon.
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def parse_weekday(key: Any) -> int:
+    """
+    "mon" / "Monday" / 0 -> 0 ... "sun" -> 6.
+    """
+    if isinstance(key, int) or (isinstance(key, str) and key.strip().isdigit()):
+        index = int(key)
+        if 0 <= index < 7:
+            return index
+    elif isinstance(key, str):
+        prefix = key.strip().lower()[:3]
+        if prefix in _WEEKDAYS:
+            return _WEEKDAYS.index(prefix)
+    raise ValueError(f"unknown weekday: {key!r}")
+
+
+class AvailabilityCalendar:
+    def __init__(self, weekly: Sequence[float], exceptions: Optional[Mapping[date, float]] = None):
+        if len(weekly) != 7:
+            raise ValueError("weekly template needs 7 values (Mon..Sun)")
+        self.weekly = tuple(max(0.0, float(h)) for h in weekly)
+        self.exceptions = {d: max(0.0, float(h)) for d, h in (exceptions or {}).items()}
+
+    @classmethod
+    def uniform(cls, hours_per_day: float) -> "AvailabilityCalendar":
+        return cls([hours_per_day] * 7)
+
+    @classmethod
+    def from_payload(
+        cls,
+        hours_per_day: float,
+        weekly: Optional[Mapping[Any, float]] = None,
+        exceptions: Optional[Mapping[Any, float]] = None,
+    ) -> "AvailabilityCalendar":
+        """
+        weekly: {"sat": 6, "sun": 0, ...}; days not listed get hours_per_day.
+        exceptions: {"2026-01-10": 0, ...} (date or ISO string keys).
+        """
+        template = [hours_per_day] * 7
+        for key, hours in (weekly or {}).items():
+            template[parse_weekday(key)] = hours
+        parsed = {
+            (day if isinstance(day, date) else date.fromisoformat(str(day))): hours
+            for day, hours in (exceptions or {}).items()
+        }
+        return cls(template, parsed)
+
+    def hours_on(self, day: date) -> float:
+        hours = self.exceptions.get(day)
+        return self.weekly[day.weekday()] if hours is None else hours
+
+    def index(
+        self,
+        start_date: date,
+        end_date: date,
+        reserved: Optional[Mapping[date, Sequence[Any]]] = None,
+    ) -> "CapacityIndex":
+        """
+        Capacity for days [start_date, end_date) (at least one day), minus
+        hours already taken by reserved tasks on those days.
+        """
+        days = max(1, (end_date - start_date).days)
+        # Weekly template rotated to start_date, then only the listed dates
+        # are patched: O(days) list work, no per-day date arithmetic
+        first = start_date.weekday()
+        week = self.weekly[first:] + self.weekly[:first]
+        hours = list(week * (days // 7 + 1))[:days]
+        for day, available in self.exceptions.items():
+            offset = (day - start_date).days
+            if 0 <= offset < days:
+                hours[offset] = available
+        for day, tasks in (reserved or {}).items():
+            offset = (day - start_date).days
+            if 0 <= offset < days:
+                hours[offset] = max(0.0, hours[offset] - sum(t.duration_hours for t in tasks))
+        return CapacityIndex(start_date, hours)
+
+
+# =========================
+# PREFIX-SUM INDEX
+# =========================
+
+class CapacityIndex:
+    """
+    prefix[i] = hours available on days [0, i) of the horizon.
+
+        capacity_before(day)  O(1)
+        day_index_at(hour)    O(log n) bisect; zero-hour days are skipped
+    """
+
+    __slots__ = ("start_date", "hours", "prefix")
+
+    def __init__(self, start_date: date, hours: List[float]):
+        self.start_date = start_date
+        self.hours = hours
+        self.prefix = list(accumulate(hours, initial=0.0))
+
+    @property
+    def days(self) -> int:
+        return len(self.hours)
+
+    @property
+    def total(self) -> float:
+        return self.prefix[-1]
+
+    def date_at(self, index: int) -> date:
+        return self.start_date + timedelta(days=index)
+
+    def capacity_before(self, day: date) -> float:
+        index = min(max(0, (day - self.start_date).days), self.days)
+        return self.prefix[index]
+
+    def capacity_through(self, index: int) -> float:
+        """
+        Hours on days [0, index), index clamped to the horizon.
+        """
+        return self.prefix[min(max(0, index), self.days)]
+
+    def day_index_at(self, hour: float) -> int:
+        """
+        Day on which hour `hour` (counted from the start of the horizon)
+        falls. Hours at or past the end map to the last day.
+        """
+        return min(bisect_right(self.prefix, hour) - 1, self.days - 1)
+
+    def day_end(self, index: int) -> float:
+        return self.prefix[index + 1]
+
+
+# =========================
+# REQUEST GLUE
+# =========================
+
+def calendar_from_request(hours_per_day: float, availability: Any) -> Optional[AvailabilityCalendar]:
+    """
+    Calendar for a planner request's optional `availability` field
+    (app.schemas.AvailabilityInput or a plain dict), None when absent.
+    Raises ValueError on an unknown weekday or a bad date.
+    """
+    if availability is None:
+        return None
+    if hasattr(availability, "model_dump"):
+        availability = availability.model_dump()
+    return AvailabilityCalendar.from_payload(
+        hours_per_day,
+        weekly=availability.get("weekly"),
+        exceptions=availability.get("exceptions"),
+    )
+
+
+def availability_extra(availability: Any) -> Optional[Dict[str, Any]]:
+    """
+    JSON-safe form of a request's availability for the plan ETag.
+    """
+    if availability is None:
+        return None
+    if hasattr(availability, "model_dump"):
+        availability = availability.model_dump()
+    return {
+        "weekly": {str(k): v for k, v in (availability.get("weekly") or {}).items()},
+        "exceptions": {str(k): v for k, v in (availability.get("exceptions") or {}).items()},
+    }
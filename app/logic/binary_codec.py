@@ -0,0 +1,398 @@
+import json
+from datetime import date
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional: JSON only
+    msgpack = None
+
+
+# =========================
+# SCHEMA REGISTRY
+# =========================
+#
+# MessagePack bodies use a shared schema instead of repeating names:
+#
+#   field names   known dict keys are sent as their index in FIELDS
+#   enums         known enum values (ENUMS[field]) as their index
+#   dates         "YYYY-MM-DD" values of DATE_FIELDS as date ordinals
+#                 (date.toordinal(), 0001-01-01 = 1)
+#
+# Anything not in the registry (unknown keys, free text, datetimes, maps
+# keyed by subject or date) is sent as is. An enum or date field must hold
+# a string in JSON; a bare int there would read back as an index. Both lists are append-only:
+# indexes never change meaning within a SCHEMA_VERSION, so a client built
+# against an older registry still decodes everything it knows.
+
+SCHEMA_VERSION = 1
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MSGPACK_CONTENT_TYPE = f"application/msgpack; schema={SCHEMA_VERSION}"
+
+FIELDS: Tuple[str, ...] = (
+    # plans (StudyPlanResponse / MultiExamPlanResponse)
+    "days", "date", "tasks", "topic_name", "subject_name", "task_type",
+    "duration_hours", "priority_score", "total_hours", "start_date",
+    "exam_date", "hours_per_day", "status", "plan_id", "parent_id",
+    "subjects", "scheduled_hours", "last_study_day",
+    # topics and session_state
+    "topics", "difficulty", "weight", "weakness", "progress", "base_hours",
+    "plan", "practice_stats", "attempts", "correct", "last_difficulty",
+    "last_updated_iso", "review_cards", "card_id", "due", "interval_days",
+    "ease", "repetitions", "lapses", "reviews", "last_review",
+    # mode requests
+    "action", "payload", "session_state", "session_id", "execute",
+    "availability", "weekly", "exceptions", "exam_dates", "today_iso",
+    # mode responses
+    "messages", "role", "content", "response_format", "type", "metadata",
+    "error", "reason", "kind", "topic", "subject", "priority", "name",
+    "rank", "combined_score", "estimated_remaining_hours", "count",
+    "total_topics", "selected_count", "stats", "accuracy", "cards",
+    "review", "updated", "ok", "detail",
+    # review cards (same-day answers fold into one review)
+    "last_grade", "before_review",
+)
+
+ENUMS: Dict[str, Tuple[str, ...]] = {
+    "task_type": ("theory", "practice", "revision"),
+    "status": ("realistic", "compressed", "high_yield_only", "last_minute"),
+    "difficulty": ("easy", "medium", "hard"),
+    "last_difficulty": ("easy", "medium", "hard"),
+    "weight": ("low", "medium", "high"),
+    "weakness": ("weak", "moderate", "strong"),
+}
+
+DATE_FIELDS = frozenset(("date", "start_date", "exam_date", "due", "last_review", "last_study_day"))
+
+_FIELD_INDEX: Dict[str, int] = {name: i for i, name in enumerate(FIELDS)}
+_ENUM_INDEX: Dict[str, Dict[str, int]] = {
+    field: {value: i for i, value in enumerate(values)} for field, values in ENUMS.items()
+}
+
+_MAX_ORDINAL = date.max.toordinal()
+
+assert len(_FIELD_INDEX) == len(FIELDS), "duplicate name in FIELDS"
+
+
+def schema_document() -> Dict[str, Any]:
+    """
+    The registry as JSON, for clients to build their decoder from.
+    """
+    return {
+        "version": SCHEMA_VERSION,
+        "content_type": MSGPACK_CONTENT_TYPE,
+        "fields": list(FIELDS),
+        "enums": {field: list(values) for field, values in ENUMS.items()},
+        "date_fields": sorted(DATE_FIELDS),
+        "date_encoding": "ordinal (0001-01-01 = 1)",
+    }
+
+
+# =========================
+# ENCODE / DECODE
+# =========================
+
+@lru_cache(maxsize=4096)
+def _iso_ordinal(value: str) -> Any:
+    if len(value) != 10:
+        return value
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return value
+
+
+@lru_cache(maxsize=4096)
+def _ordinal_iso(value: int) -> str:
+    if not 1 <= value <= _MAX_ORDINAL:
+        raise ValueError(f"invalid date ordinal: {value}")
+    return date.fromordinal(value).isoformat()
+
+
+def _enum_codecs(values: Tuple[str, ...]) -> Tuple[Callable[[str], Any], Callable[[int], Any]]:
+    index = {value: i for i, value in enumerate(values)}
+    # Values outside the enum (and ints the encoder did not produce) pass
+    # through unchanged
+    return (
+        lambda value: index.get(value, value),
+        lambda value: values[value] if 0 <= value < len(values) else value,
+    )
+
+
+def _field_codecs(name: str) -> Tuple[Optional[Callable[[str], Any]], Optional[Callable[[int], Any]]]:
+    if name in ENUMS:
+        return _enum_codecs(ENUMS[name])
+    if name in DATE_FIELDS:
+        return _iso_ordinal, _ordinal_iso
+    return None, None
+
+
+# name -> (index, str -> compact value); index -> (name, int -> str)
+_ENCODERS: Dict[str, Tuple[int, Optional[Callable[[str], Any]]]] = {}
+_DECODERS: List[Tuple[str, Optional[Callable[[int], Any]]]] = []
+for _index, _name in enumerate(FIELDS):
+    _to, _from = _field_codecs(_name)
+    _ENCODERS[_name] = (_index, _to)
+    _DECODERS.append((_name, _from))
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def to_compact(value: Any) -> Any:
+    """
+    JSON-shaped value -> registry-compacted value (int keys, enum
+    indexes, date ordinals), ready for msgpack.
+    """
+    if isinstance(value, dict):
+        compact: Dict[Any, Any] = {}
+        encoders = _ENCODERS
+        for key, item in value.items():
+            spec = encoders.get(key)
+            if item.__class__ not in _SCALARS:
+                if isinstance(item, date) and spec is not None and spec[1] is _iso_ordinal:
+                    item = item.toordinal()
+                else:
+                    item = to_compact(item)
+            elif spec is not None and spec[1] is not None and item.__class__ is str:
+                item = spec[1](item)
+            compact[key if spec is None else spec[0]] = item
+        return compact
+    if isinstance(value, list):
+        return [item if item.__class__ in _SCALARS else to_compact(item) for item in value]
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _decode_pairs(pairs: List[Tuple[Any, Any]]) -> Dict[str, Any]:
+    # msgpack calls this for every map, innermost first, so values are
+    # already decoded
+    decoded: Dict[str, Any] = {}
+    decoders = _DECODERS
+    for key, value in pairs:
+        if key.__class__ is str:
+            decoded[key] = value
+        elif key.__class__ is int:
+            if not 0 <= key < len(decoders):
+                raise ValueError(f"unknown field index: {key}")
+            name, convert = decoders[key]
+            decoded[name] = convert(value) if convert is not None and value.__class__ is int else value
+        else:
+            raise ValueError(f"unsupported map key: {key!r}")
+    return decoded
+
+
+def encode(value: Any) -> bytes:
+    """
+    JSON-shaped value -> MessagePack bytes under the schema registry.
+    """
+    return msgpack.packb(to_compact(value), use_bin_type=True)
+
+
+def decode(body: bytes) -> Any:
+    """
+    MessagePack bytes -> JSON-shaped value (the inverse of encode).
+    Raises ValueError on a body that is not valid MessagePack or uses
+    field indexes the registry does not know.
+    """
+    try:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False, object_pairs_hook=_decode_pairs)
+    except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError, TypeError) as e:
+        raise ValueError(f"invalid MessagePack body: {str(e) or type(e).__name__}") from None
+
+
+# =========================
+# NEGOTIATION
+# =========================
+
+def is_msgpack(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return media_type in MSGPACK_MEDIA_TYPES
+
+
+def _parse_accept(header: str) -> List[Tuple[str, float]]:
+    media_types: List[Tuple[str, float]] = []
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        media_types.append((name.strip().lower(), q))
+    return media_types
+
+
+def prefers_msgpack(accept: str) -> bool:
+    """
+    True when an Accept header ranks MessagePack above JSON. JSON's rank
+    comes from application/json, else application/*, else */*; a tie
+    goes to MessagePack, which the client named explicitly.
+    """
+    if msgpack is None:
+        return False
+    msgpack_q = 0.0
+    json_q: Dict[str, float] = {}
+    for name, q in _parse_accept(accept):
+        if name in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif name in ("application/json", "application/*", "*/*"):
+            json_q[name] = max(json_q.get(name, 0.0), q)
+    if msgpack_q <= 0:
+        return False
+    for name in ("application/json", "application/*", "*/*"):
+        if name in json_q:
+            return msgpack_q >= json_q[name]
+    return True
+
+
+# =========================
+# MIDDLEWARE
+# =========================
+
+# Routers whose bodies may be MessagePack
+BINARY_PATH_PREFIXES = ("/study_plan", "/scheduler", "/teacher", "/practice", "/revision")
+
+
+class BinaryNegotiationMiddleware:
+    """
+    MessagePack in and out for the planner and mode routers.
+
+    Request bodies sent as application/msgpack are decoded and handed to
+    the route as JSON, so routes and pydantic models are unchanged.
+    Single-message application/json responses are re-encoded when the
+    Accept header prefers application/msgpack. Everything else passes
+    through. Add it before CompressionMiddleware so the binary body is
+    the one compressed.
+    """
+
+    def __init__(self, app, path_prefixes: Tuple[str, ...] = BINARY_PATH_PREFIXES):
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or msgpack is None or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        content_type = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept":
+                accept = value.decode("latin-1")
+            elif key == b"content-type":
+                content_type = value.decode("latin-1")
+
+        if is_msgpack(content_type):
+            body = await self._read_body(receive)
+            try:
+                body = json.dumps(decode(body), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            except ValueError as e:
+                await self._send_error(send, 400, str(e), binary=prefers_msgpack(accept))
+                return
+            scope = dict(scope)
+            scope["headers"] = [
+                (k, v) for k, v in scope.get("headers", []) if k not in (b"content-type", b"content-length")
+            ] + [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+            receive = self._replay(body, receive)
+
+        if not prefers_msgpack(accept):
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = start_message.get("headers", [])
+            if message.get("more_body") or not self._is_json(headers) or not body:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            encoded = encode(json.loads(body))
+            new_headers = [
+                (k, v) for k, v in headers if k not in (b"content-type", b"content-length", b"vary")
+            ]
+            new_headers.append((b"content-type", MSGPACK_CONTENT_TYPE.encode()))
+            new_headers.append((b"content-length", str(len(encoded)).encode()))
+            new_headers.append((b"vary", b"Accept"))
+            start_message["headers"] = new_headers
+            await send(start_message)
+            await send({"type": "http.response.body", "body": encoded})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    @staticmethod
+    def _replay(body: bytes, receive):
+        sent = False
+
+        async def replay():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    def _is_json(headers) -> bool:
+        for key, value in headers:
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                return value.decode("latin-1").lower().startswith("application/json")
+        return False
+
+    @staticmethod
+    async def _send_error(send, status: int, detail: str, binary: bool) -> None:
+        error = {"detail": detail}
+        if binary:
+            body, content_type = encode(error), MSGPACK_CONTENT_TYPE
+        else:
+            body, content_type = json.dumps(error).encode("utf-8"), "application/json"
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,416 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.logic.metrics import timed_stage
+from app.logic.sessions import EVENT_PERFORMANCE_UPDATED, SessionStore, session_store
+
+
+# =========================
+# COLUMNAR STATS
+# =========================
+#
+# Every student's practice_stats (TopicPerformance dicts) as two dense
+# matrices, one row per session, one column per topic:
+#
+#   attempts[row, col]   attempts on that topic
+#   correct[row, col]    correct answers on that topic
+#
+# A practice_stats entry holds running totals, so applying one is a plain
+# cell assignment. Row and column totals (per student, per topic) are kept
+# alongside and adjusted by the cell's delta, so whole-cohort aggregates
+# never rescan the matrices. Capacity grows by doubling, so adding a
+# student or a topic is amortized O(1).
+
+class CohortMatrix:
+    def __init__(self):
+        self.student_ids: List[str] = []
+        self.topic_names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._cols: Dict[str, int] = {}
+        self._attempts = np.zeros((0, 0), dtype=np.int32)
+        self._correct = np.zeros((0, 0), dtype=np.int32)
+        self._totals()
+
+    def _totals(self) -> None:
+        # One pass per total; afterwards set() keeps them current
+        self._student_attempts = self._attempts.sum(axis=1, dtype=np.int64)
+        self._student_correct = self._correct.sum(axis=1, dtype=np.int64)
+        self._topic_attempts = self._attempts.sum(axis=0, dtype=np.int64)
+        self._topic_correct = self._correct.sum(axis=0, dtype=np.int64)
+        self._topic_students = np.count_nonzero(self._attempts, axis=0).astype(np.int64)
+
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[Tuple[str, Dict[str, Any]]]) -> "CohortMatrix":
+        matrix = cls()
+        rows: List[int] = []
+        cols: List[int] = []
+        attempts: List[int] = []
+        correct: List[int] = []
+        for session_id, state in sessions:
+            stats = state.get("practice_stats")
+            if not isinstance(stats, dict) or not stats:
+                continue
+            row = matrix._row(session_id)
+            # Copied in one step: the states are live and may gain topics
+            # while a worker thread builds the matrix
+            for topic_name, perf in list(stats.items()):
+                if not isinstance(perf, dict):
+                    continue
+                rows.append(row)
+                cols.append(matrix._col(topic_name))
+                attempts.append(int(perf.get("attempts", 0)))
+                correct.append(int(perf.get("correct", 0)))
+        matrix._reserve(len(matrix.student_ids), len(matrix.topic_names))
+        matrix._attempts[rows, cols] = attempts
+        matrix._correct[rows, cols] = correct
+        matrix._totals()
+        return matrix
+
+    @classmethod
+    def from_arrays(cls, student_ids: List[str], topic_names: List[str],
+                    attempts: np.ndarray, correct: np.ndarray) -> "CohortMatrix":
+        """
+        Matrix over ready-made (students x topics) count arrays.
+        """
+        matrix = cls()
+        matrix.student_ids = list(student_ids)
+        matrix.topic_names = list(topic_names)
+        matrix._rows = {s: i for i, s in enumerate(matrix.student_ids)}
+        matrix._cols = {t: i for i, t in enumerate(matrix.topic_names)}
+        matrix._attempts = np.array(attempts, dtype=np.int32)
+        matrix._correct = np.array(correct, dtype=np.int32)
+        if matrix._attempts.shape != (len(student_ids), len(topic_names)) or matrix._correct.shape != matrix._attempts.shape:
+            raise ValueError("attempts and correct must be (students x topics)")
+        matrix._totals()
+        return matrix
+
+    def copy(self, cells: bool = True) -> "CohortMatrix":
+        """
+        Independent copy, trimmed to the used rows and columns. With
+        cells=False only the totals are copied (enough for whole-cohort
+        queries); its attempts/correct are empty.
+        """
+        matrix = CohortMatrix()
+        matrix.student_ids = list(self.student_ids)
+        matrix.topic_names = list(self.topic_names)
+        matrix._rows = dict(self._rows)
+        matrix._cols = dict(self._cols)
+        if cells:
+            matrix._attempts = self.attempts.copy()
+            matrix._correct = self.correct.copy()
+        student_attempts, student_correct = self.student_totals()
+        topic_attempts, topic_correct, topic_students = self.topic_totals()
+        matrix._student_attempts = student_attempts.copy()
+        matrix._student_correct = student_correct.copy()
+        matrix._topic_attempts = topic_attempts.copy()
+        matrix._topic_correct = topic_correct.copy()
+        matrix._topic_students = topic_students.copy()
+        return matrix
+
+    def take(self, session_ids: Iterable[str]) -> "CohortMatrix":
+        """
+        A new matrix of just these sessions' rows (in that order; repeats
+        and sessions without stats are skipped), with its own totals.
+        """
+        rows = self.rows_for(dict.fromkeys(session_ids))
+        ids = self.student_ids
+        return CohortMatrix.from_arrays(
+            [ids[row] for row in rows.tolist()], self.topic_names, self.attempts[rows], self.correct[rows],
+        )
+
+    def _row(self, session_id: str) -> int:
+        row = self._rows.get(session_id)
+        if row is None:
+            row = self._rows[session_id] = len(self.student_ids)
+            self.student_ids.append(session_id)
+        return row
+
+    def _col(self, topic_name: str) -> int:
+        col = self._cols.get(topic_name)
+        if col is None:
+            col = self._cols[topic_name] = len(self.topic_names)
+            self.topic_names.append(topic_name)
+        return col
+
+    def _reserve(self, rows: int, cols: int) -> None:
+        have_rows, have_cols = self._attempts.shape
+        if rows <= have_rows and cols <= have_cols:
+            return
+        shape = (max(rows, 2 * have_rows) if rows > have_rows else have_rows,
+                 max(cols, 2 * have_cols) if cols > have_cols else have_cols)
+        for name in ("_attempts", "_correct"):
+            old = getattr(self, name)
+            grown = np.zeros(shape, dtype=np.int32)
+            grown[:have_rows, :have_cols] = old
+            setattr(self, name, grown)
+        for name, size in (("_student_attempts", shape[0]), ("_student_correct", shape[0]),
+                           ("_topic_attempts", shape[1]), ("_topic_correct", shape[1]),
+                           ("_topic_students", shape[1])):
+            old = getattr(self, name)
+            grown = np.zeros(size, dtype=np.int64)
+            grown[:old.size] = old
+            setattr(self, name, grown)
+
+    def set(self, session_id: str, topic_name: str, attempts: int, correct: int) -> None:
+        row, col = self._row(session_id), self._col(topic_name)
+        self._reserve(row + 1, col + 1)
+        old_attempts = int(self._attempts[row, col])
+        old_correct = int(self._correct[row, col])
+        self._attempts[row, col] = attempts
+        self._correct[row, col] = correct
+        self._student_attempts[row] += attempts - old_attempts
+        self._student_correct[row] += correct - old_correct
+        self._topic_attempts[col] += attempts - old_attempts
+        self._topic_correct[col] += correct - old_correct
+        self._topic_students[col] += (attempts > 0) - (old_attempts > 0)
+
+    def rows_for(self, session_ids: Iterable[str]) -> np.ndarray:
+        """
+        Row numbers of the given sessions; sessions without stats are skipped.
+        """
+        rows = self._rows
+        return np.fromiter((rows[s] for s in session_ids if s in rows), dtype=np.int64)
+
+    @property
+    def attempts(self) -> np.ndarray:
+        return self._attempts[:len(self.student_ids), :len(self.topic_names)]
+
+    @property
+    def correct(self) -> np.ndarray:
+        return self._correct[:len(self.student_ids), :len(self.topic_names)]
+
+    def student_totals(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (attempts, correct) per student, summed over topics.
+        """
+        n = len(self.student_ids)
+        return self._student_attempts[:n], self._student_correct[:n]
+
+    def topic_totals(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (attempts, correct, students who attempted it) per topic.
+        """
+        n = len(self.topic_names)
+        return self._topic_attempts[:n], self._topic_correct[:n], self._topic_students[:n]
+
+
+# =========================
+# AGGREGATES
+# =========================
+
+def _accuracy(correct: np.ndarray, attempts: np.ndarray) -> np.ndarray:
+    return np.divide(correct, attempts, out=np.zeros(attempts.shape, dtype=np.float64), where=attempts > 0)
+
+
+def percentile_ranks(scores: np.ndarray, of: np.ndarray) -> np.ndarray:
+    """
+    Percentile rank (0-100) of each value in `of` among `scores`: the share
+    of scores below it, counting ties as half.
+    """
+    if scores.size == 0:
+        return np.full(of.shape, np.nan)
+    ordered = np.sort(scores)
+    # Searching in sorted order walks `ordered` front to back
+    order = np.argsort(of, kind="stable")
+    queries = of[order]
+    below = np.searchsorted(ordered, queries, side="left")
+    equal = np.searchsorted(ordered, queries, side="right") - below
+    ranks = np.empty(of.shape, dtype=np.float64)
+    ranks[order] = 100.0 * (below + 0.5 * equal) / ordered.size
+    return ranks
+
+
+@timed_stage("cohort_summary")
+def cohort_summary(
+    matrix: CohortMatrix,
+    session_ids: Optional[List[str]] = None,
+    students: Optional[List[str]] = None,
+    min_attempts: int = 1,
+    weakest_limit: int = 10,
+) -> Dict[str, Any]:
+    """
+    Class-level view over a CohortMatrix, in a few vectorized passes:
+    accuracy per topic, the weakest topics cohort-wide and each student's
+    percentile rank by overall accuracy. The whole cohort is served from
+    the matrix's running totals; a subset sums its own rows.
+
+    session_ids restricts the cohort (None = every student in the matrix);
+    students picks whose ranks are returned (None = the whole cohort),
+    best first.
+    Topics and students with fewer than min_attempts attempts are left out
+    of the weakest-topic list and of ranking.
+    """
+    min_attempts = max(1, min_attempts)
+    if session_ids is None:
+        rows = np.arange(len(matrix.student_ids))
+        topic_attempts, topic_correct, topic_students = matrix.topic_totals()
+        student_attempts, student_correct = matrix.student_totals()
+    else:
+        rows = matrix.rows_for(dict.fromkeys(session_ids))
+        attempts, correct = matrix.attempts[rows], matrix.correct[rows]
+        topic_attempts = attempts.sum(axis=0, dtype=np.int64)
+        topic_correct = correct.sum(axis=0, dtype=np.int64)
+        topic_students = np.count_nonzero(attempts, axis=0)
+        student_attempts = attempts.sum(axis=1, dtype=np.int64)
+        student_correct = correct.sum(axis=1, dtype=np.int64)
+    topic_accuracy = _accuracy(topic_correct, topic_attempts)
+
+    names = matrix.topic_names
+    practiced = sorted(np.flatnonzero(topic_attempts > 0).tolist(), key=names.__getitem__)
+    # Ties by topic name, like topic_accuracy
+    eligible = np.array([i for i in practiced if topic_attempts[i] >= min_attempts], dtype=np.int64)
+    weakest = eligible[np.argsort(topic_accuracy[eligible], kind="stable")][:max(0, weakest_limit)]
+
+    student_accuracy = _accuracy(student_correct, student_attempts)
+    ranked = student_attempts >= min_attempts
+
+    def topic_row(i: int) -> Dict[str, Any]:
+        return {
+            "topic_name": names[i],
+            "attempts": int(topic_attempts[i]),
+            "correct": int(topic_correct[i]),
+            "accuracy": round(float(topic_accuracy[i]), 4),
+            "students": int(topic_students[i]),
+        }
+
+    ids = matrix.student_ids
+    if students is None:
+        picked = np.arange(rows.size)
+    elif session_ids is None:
+        picked = matrix.rows_for(dict.fromkeys(students))
+    else:
+        position = {ids[row]: i for i, row in enumerate(rows.tolist())}
+        picked = np.fromiter((position[s] for s in dict.fromkeys(students) if s in position), dtype=np.int64)
+
+    # Best first; students below min_attempts last
+    picked = picked[np.lexsort((-student_accuracy[picked], ~ranked[picked]))]
+    percentiles = percentile_ranks(student_accuracy[ranked], student_accuracy[picked])
+    percentiles[~ranked[picked]] = np.nan
+
+    student_rows = [
+        {
+            "session_id": ids[row],
+            "attempts": student_total,
+            "accuracy": accuracy,
+            # NaN (not ranked) != itself
+            "percentile": pct if pct == pct else None,
+        }
+        for row, student_total, accuracy, pct in zip(
+            rows[picked].tolist(),
+            student_attempts[picked].tolist(),
+            np.round(student_accuracy[picked], 4).tolist(),
+            np.round(percentiles, 2).tolist(),
+        )
+    ]
+
+    return {
+        "kind": "cohort_analytics",
+        "students": int(rows.size),
+        "ranked_students": int(np.count_nonzero(ranked)),
+        "topics": len(practiced),
+        "topic_accuracy": [topic_row(i) for i in practiced],
+        "weakest_topics": [topic_row(i) for i in weakest.tolist()],
+        "student_percentiles": student_rows,
+    }
+
+
+# =========================
+# CACHED SERVICE
+# =========================
+
+class CohortAnalytics:
+    """
+    cohort_summary over a SessionStore, with results cached per query.
+
+    The matrix is built from the store on first use and then kept current
+    from its events: a performance update rewrites one cell and drops the
+    cached results; load() (sessions replaced wholesale) drops the matrix.
+
+    Events arrive on the recording thread (the event loop), so the lock
+    is only held to touch the matrix and the cache: summary() computes on
+    a copy of what the query needs (the totals, or the rows of the
+    requested sessions), and a result is only cached if no event came in
+    meanwhile (the generation is unchanged).
+    """
+
+    def __init__(self, store: SessionStore, max_cached: int = 64):
+        self._store = store
+        self._matrix: Optional[CohortMatrix] = None
+        self._results: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self.max_cached = max_cached
+        self._generation = 0
+        self._lock = threading.Lock()
+        store.subscribe(self._on_event)
+
+    def _on_event(self, event: Optional[Dict[str, Any]]) -> None:
+        if event is None:
+            with self._lock:
+                self._generation += 1
+                self._matrix = None
+                self._results.clear()
+            return
+        if event.get("kind") != EVENT_PERFORMANCE_UPDATED:
+            return
+        data = event["data"]
+        performance = data.get("performance") or {}
+        with self._lock:
+            self._generation += 1
+            self._results.clear()
+            if self._matrix is not None:
+                self._matrix.set(
+                    event["session_id"],
+                    data["topic_name"],
+                    int(performance.get("attempts", 0)),
+                    int(performance.get("correct", 0)),
+                )
+
+    def summary(
+        self,
+        session_ids: Optional[List[str]] = None,
+        students: Optional[List[str]] = None,
+        min_attempts: int = 1,
+        weakest_limit: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        cohort_summary for the store's sessions. Results are shared; callers
+        must treat them as read-only. Safe to call from a worker thread.
+        """
+        key = (
+            tuple(session_ids) if session_ids is not None else None,
+            tuple(students) if students is not None else None,
+            min_attempts,
+            weakest_limit,
+        )
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+                return cached
+            generation = self._generation
+            matrix = None
+            if self._matrix is not None:
+                # Only what the query reads: the totals, or the class's rows
+                if session_ids is None:
+                    matrix = self._matrix.copy(cells=False)
+                else:
+                    matrix = self._matrix.take(session_ids)
+        if matrix is None:
+            built = CohortMatrix.from_sessions(self._store.items())
+            with self._lock:
+                # Events that came in while building may have been missed
+                if self._generation == generation and self._matrix is None:
+                    self._matrix = built.copy()
+            matrix = built.take(session_ids) if session_ids is not None else built
+        result = cohort_summary(matrix, None, students, min_attempts, weakest_limit)
+        with self._lock:
+            if self._generation == generation:
+                self._results[key] = result
+                while len(self._results) > self.max_cached:
+                    self._results.popitem(last=False)
+        return result
+
+# Process-wide analytics over session_store, used by the cohort router.
+cohort_analytics = CohortAnalytics(session_store)
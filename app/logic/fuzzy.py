@@ -0,0 +1,147 @@
+from functools import lru_cache
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+# =========================
+# EDIT DISTANCE
+# =========================
+
+def levenshtein(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    Edit distance (insert / delete / substitute). With limit, stops early
+    and returns limit + 1 once the distance is known to exceed it.
+    """
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# =========================
+# BK-TREE
+# =========================
+
+class BKTree:
+    """
+    Words indexed by edit distance. A node's children are keyed by their
+    distance to it, so a search within radius r only descends into
+    children whose key is within r of the query's distance to the node
+    (triangle inequality); most of the tree is never compared.
+    """
+
+    def __init__(self, words: List[str]):
+        # node = (word, insertion order, {distance: child node})
+        self._root: Optional[Tuple[str, int, Dict[int, tuple]]] = None
+        for order, word in enumerate(words):
+            self._add(word, order)
+
+    def _add(self, word: str, order: int) -> None:
+        if self._root is None:
+            self._root = (word, order, {})
+            return
+        node = self._root
+        while True:
+            distance = levenshtein(word, node[0])
+            if distance == 0:
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (word, order, {})
+                return
+            node = child
+
+    def search(self, query: str, radius: int) -> List[Tuple[int, int, str]]:
+        """
+        (distance, insertion order, word) for every word within radius,
+        closest first.
+        """
+        found: List[Tuple[int, int, str]] = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            word, order, children = stack.pop()
+            distance = levenshtein(query, word)
+            if distance <= radius:
+                found.append((distance, order, word))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+# =========================
+# LABEL MATCHER
+# =========================
+
+def max_typos(length: int) -> int:
+    """
+    Edits tolerated for a label of this length: none for 1-4 characters
+    (too many short words are one edit apart: "lost"/"most", "good"/
+    "food"), then 1, 2, 3.
+    """
+    if length <= 4:
+        return 0
+    if length <= 5:
+        return 1
+    if length <= 9:
+        return 2
+    return 3
+
+
+class FuzzyMatcher(Generic[V]):
+    """
+    Closest-label lookup over a vocabulary {label: value}, memoized.
+
+    match(text) compares the whole text (at most one edit if it has
+    several words); match_words(text) also tries each two-word window and
+    then each word, left to right. A query whose nearest labels map to
+    different values is ambiguous and matches nothing.
+    """
+
+    def __init__(self, vocabulary: Dict[str, V], cache_size: int = 4096):
+        self._vocabulary = dict(vocabulary)
+        self._tree = BKTree(list(self._vocabulary))
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+        self.match_words = lru_cache(maxsize=cache_size)(self._match_words)
+
+    def _match(self, text: str) -> Optional[V]:
+        radius = max_typos(len(text))
+        if " " in text:
+            # A couple of edits can turn any filler word into "not"
+            radius = min(radius, 1)
+        if radius == 0:
+            return self._vocabulary.get(text)
+        found = self._tree.search(text, radius)
+        if not found:
+            return None
+        best = found[0][0]
+        values = {self._vocabulary[word] for distance, _, word in found if distance == best}
+        return values.pop() if len(values) == 1 else None
+
+    def _match_words(self, text: str) -> Optional[V]:
+        words = text.split()
+        candidates = [text]
+        candidates += [" ".join(words[i:i + 2]) for i in range(len(words) - 1)] if len(words) > 2 else []
+        candidates += words if len(words) > 1 else []
+        for candidate in candidates:
+            value = self.match(candidate)
+            if value is not None:
+                return value
+        return None
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from fastapi import Response
+
+
+# Bump whenever the scheduler's output for identical inputs changes, so old
+# client caches stop matching.
+PLAN_ALGORITHM_VERSION = "2"
+
+
+def _canonical_json(value: Any) -> bytes:
+    return json.dumps(
+        value,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    ).encode("utf-8")
+
+
+def plan_etag(
+    topics: List[Dict[str, Any]],
+    start_date: date,
+    exam_date: date,
+    hours_per_day: float,
+    session_id: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Weak ETag derived from the plan inputs only, so it can be checked
+    before any scheduling work. Weak because the same plan may be sent
+    gzip/brotli/identity encoded. extra carries any other input the plan
+    depends on (per-subject exam dates, the session's review count, ...).
+    """
+    inputs: Dict[str, Any] = {
+        "topics": topics,
+        "start_date": start_date.isoformat(),
+        "exam_date": exam_date.isoformat(),
+        "hours_per_day": float(hours_per_day),
+        "session_id": session_id,
+    }
+    if extra:
+        inputs["extra"] = extra
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(PLAN_ALGORITHM_VERSION.encode())
+    digest.update(_canonical_json(inputs))
+    return f'W/"plan-{digest.hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison as required for If-None-Match (RFC 9110 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(candidate) == target for candidate in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def json_response(data: Any, etag: Optional[str] = None) -> Response:
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    headers = {"ETag": etag} if etag else None
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,196 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+
+# =========================
+# BINARY LAYOUT
+# =========================
+#
+# Journal:  [len:u32][crc32:u32][json bytes] [len][crc][json] ...
+# Snapshot: [magic:8s][last_seq:u64] then one journal-style record per session
+#
+# Both files use the same record framing so a torn write at the tail (crash
+# mid-append) is detected by length/crc and simply ignored on replay.
+
+_RECORD_HEADER = struct.Struct("<II")
+_SNAPSHOT_HEADER = struct.Struct("<8sQ")
+_SNAPSHOT_MAGIC = b"SSNAP001"
+
+JOURNAL_FILENAME = "sessions.journal"
+SNAPSHOT_FILENAME = "sessions.snapshot"
+
+
+def _encode_record(obj: Dict[str, Any]) -> bytes:
+    body = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return _RECORD_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def _iter_records(buf, offset: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (end_offset, record) for every intact record starting at offset.
+    Stops silently at the first truncated or corrupted record.
+    """
+    size = len(buf)
+    header_size = _RECORD_HEADER.size
+    while offset + header_size <= size:
+        length, crc = _RECORD_HEADER.unpack_from(buf, offset)
+        start = offset + header_size
+        end = start + length
+        if end > size:
+            return
+        body = buf[start:end]
+        if zlib.crc32(body) != crc:
+            return
+        try:
+            record = json.loads(body)
+        except ValueError:
+            return
+        yield end, record
+        offset = end
+
+
+# =========================
+# JOURNAL
+# =========================
+
+class SessionJournal:
+    """
+    Append-only, length-prefixed event log plus a compacted snapshot.
+
+    Events are plain dicts carrying a monotonically increasing "seq".
+    write_snapshot() persists the full session map together with the last
+    seq it covers and then truncates the journal, so replay only ever has
+    to read the snapshot plus the (short) journal tail.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        self.directory = directory
+        self.fsync = fsync
+        self.journal_path = os.path.join(directory, JOURNAL_FILENAME)
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILENAME)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._fh = open(self.journal_path, "ab")
+
+    # ---- writing ----
+
+    def append(self, event: Dict[str, Any]) -> None:
+        data = _encode_record(event)
+        with self._lock:
+            self._fh.write(data)
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._fh.tell()
+
+    def write_snapshot(
+        self,
+        sessions: Iterable[Tuple[str, Dict[str, Any]]],
+        last_seq: int,
+        covered_bytes: int,
+    ) -> None:
+        """
+        Atomically replace the snapshot, then drop the journal entries it
+        covers: the first covered_bytes, which must hold exactly the events
+        with seq <= last_seq (size_bytes() taken together with last_seq).
+        Events appended while the snapshot is written are kept.
+
+        The states may already include changes of later events; replay
+        applies those again, which is harmless since events carry resulting
+        values. The states must not change while they are written (pass
+        copies). Runs without blocking append() except for the final
+        journal swap.
+        """
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, last_seq))
+            for session_id, state in sessions:
+                out.write(_encode_record({"session_id": session_id, "state": state}))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        with self._lock:
+            self._fh.flush()
+            with open(self.journal_path, "rb") as fh:
+                fh.seek(covered_bytes)
+                tail = fh.read()
+            self._fh.close()
+            tmp_path = self.journal_path + ".tmp"
+            with open(tmp_path, "wb") as out:
+                out.write(tail)
+                if self.fsync:
+                    out.flush()
+                    os.fsync(out.fileno())
+            os.replace(tmp_path, self.journal_path)
+            self._fh = open(self.journal_path, "ab")
+
+    # ---- reading ----
+
+    def _load_snapshot(self, sessions: Dict[str, Dict[str, Any]]) -> int:
+        if not os.path.exists(self.snapshot_path):
+            return 0
+        if os.path.getsize(self.snapshot_path) < _SNAPSHOT_HEADER.size:
+            return 0
+
+        with open(self.snapshot_path, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                magic, last_seq = _SNAPSHOT_HEADER.unpack_from(buf, 0)
+                if magic != _SNAPSHOT_MAGIC:
+                    return 0
+                for _, record in _iter_records(buf, _SNAPSHOT_HEADER.size):
+                    sessions[record["session_id"]] = record["state"]
+        return last_seq
+
+    def replay(
+        self,
+        apply_event: Callable[[Dict[str, Dict[str, Any]], Dict[str, Any]], None],
+    ) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """
+        Rebuild the session map: snapshot first, then every journal event
+        newer than the snapshot. Returns (sessions, last_seq).
+        """
+        sessions: Dict[str, Dict[str, Any]] = {}
+        last_seq = self._load_snapshot(sessions)
+
+        valid_end = 0
+        with self._lock:
+            self._fh.flush()
+            if os.path.getsize(self.journal_path) > 0:
+                with open(self.journal_path, "rb") as fh:
+                    with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                        for end, event in _iter_records(buf):
+                            valid_end = end
+                            seq = int(event.get("seq", 0))
+                            if seq <= last_seq:
+                                continue
+                            apply_event(sessions, event)
+                            last_seq = seq
+
+            # Chop off a torn tail so new appends start on a record boundary.
+            if valid_end < self._fh.tell():
+                self._fh.close()
+                with open(self.journal_path, "r+b") as fh:
+                    fh.truncate(valid_end)
+                self._fh = open(self.journal_path, "ab")
+
+        return sessions, last_seq
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+
+def open_journal(directory: Optional[str], fsync: bool = False) -> Optional[SessionJournal]:
+    if not directory:
+        return None
+    return SessionJournal(directory, fsync=fsync)
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.logic.llm_cassette import Cassette, cassette_from_env
+from app.logic.llm_hedging import LLMTimeout, hedger
+from app.logic.llm_output import InvalidLLMOutput, complete_validated
+from app.logic.metrics import stage
+
+
+# =========================
+# LAZY CLIENT
+# =========================
+#
+# google.generativeai takes most of the application's cold-start time, and
+# the planner/scheduler endpoints never touch it. It is imported and
+# configured on the first LLM call instead of at import time.
+#
+# LLM_BACKEND_URL replaces Gemini with any HTTP endpoint speaking
+#   POST {"prompt": "..."} -> {"text": "..."}
+# e.g. scripts/stub_llm.py for offline load tests.
+#
+# LLM_CASSETTE puts a record/replay cassette (app.logic.llm_cassette) in
+# front of the model; in replay mode the model is never created.
+
+_model = None
+_model_lock = threading.Lock()
+
+_UNSET = object()
+_cassette: Any = _UNSET
+
+
+class _HttpResponse:
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class HttpModel:
+    """
+    Minimal stand-in for GenerativeModel backed by an HTTP endpoint.
+    """
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+        self._loop = None
+
+    async def generate_content_async(self, prompt: str) -> _HttpResponse:
+        # Connection pools belong to one event loop (tests and in-process
+        # load runs start several)
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            import httpx
+
+            limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+            self._loop = loop
+        response = await self._client.post(self.url, json={"prompt": prompt})
+        response.raise_for_status()
+        return _HttpResponse(response.json()["text"])
+
+
+def get_model():
+    """
+    Return the shared model client (Gemini, or HttpModel when
+    LLM_BACKEND_URL is set), creating it on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                backend_url = os.getenv("LLM_BACKEND_URL")
+                if backend_url:
+                    _model = HttpModel(backend_url, float(os.getenv("LLM_BACKEND_TIMEOUT", "60")))
+                else:
+                    import google.generativeai as genai
+
+                    api_key = os.getenv("GEMINI_API_KEY") or "YOUR_PLACEHOLDER_KEY"
+                    genai.configure(api_key=api_key)
+                    _model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-pro"))
+    return _model
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    The cassette from LLM_CASSETTE (read on first use), or the one set
+    with use_cassette(); None when model calls go straight through.
+    """
+    global _cassette
+    if _cassette is _UNSET:
+        with _model_lock:
+            if _cassette is _UNSET:
+                _cassette = cassette_from_env()
+    return _cassette
+
+
+def use_cassette(cassette: Optional[Cassette]) -> None:
+    """
+    Route model calls through cassette from now on (None: no cassette).
+    """
+    global _cassette
+    _cassette = cassette
+
+
+# =========================
+# EXECUTION
+# =========================
+
+# Process-wide cap on in-flight model calls; enforced by the "llm" admission
+# lane (app.logic.admission). Hedged calls (app.logic.llm_hedging) can go
+# over it by their budget, and only while nothing is queued for the lane.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+
+def is_llm_request(result: Dict[str, Any]) -> bool:
+    """
+    True for the dicts built by the modes' _wrap_llm_request helpers,
+    False for pure-Python results (topic_stats, high_yield_topics, ...).
+    """
+    return isinstance(result, dict) and "messages" in result and not result.get("error")
+
+
+def _prompt_from_messages(messages: List[Dict[str, str]]) -> str:
+    # Gemini takes a single prompt here; keep system rules ahead of the task.
+    return "\n\n".join(m.get("content", "") for m in messages)
+
+
+async def _call_model(llm_request: Dict[str, Any]) -> str:
+    response = await get_model().generate_content_async(
+        _prompt_from_messages(llm_request["messages"])
+    )
+    return response.text
+
+
+async def _hedged_call(llm_request: Dict[str, Any]) -> str:
+    # Timeout budget and tail hedging per action (app.logic.llm_hedging)
+    return await hedger.call(llm_request, _call_model)
+
+
+async def _complete_text(llm_request: Dict[str, Any]) -> str:
+    cassette = get_cassette()
+    with stage("llm_call"):
+        if cassette is not None:
+            return await cassette.call(llm_request, _hedged_call)
+        return await _hedged_call(llm_request)
+
+
+async def run_llm_request(llm_request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send a _wrap_llm_request dict to the model (or its cassette) and return
+    the parsed JSON, checked against the action's output schema
+    (app.logic.llm_output): repaired, or re-asked when it does not fit.
+    """
+    return await complete_validated(llm_request, _complete_text)
+
+
+# =========================
+# FASTAPI GLUE
+# =========================
+
+@contextmanager
+def llm_http_errors() -> Iterator[None]:
+    """
+    with llm_http_errors(): return await run_llm_request(...)
+
+    A model call past its timeout budget surfaces as HTTPException 504, an
+    answer with no JSON in it as 502.
+    """
+    from fastapi import HTTPException
+
+    try:
+        yield
+    except LLMTimeout as e:
+        raise HTTPException(status_code=504, detail=f"llm_timeout: {e}")
+    except InvalidLLMOutput as e:
+        raise HTTPException(status_code=502, detail=f"invalid_llm_output: {e}")
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.logic.metrics import REGISTRY
+
+
+# =========================
+# LLM CASSETTES
+# =========================
+#
+# Record model answers once, replay them offline. A cassette is a JSONL
+# file, one recording per line:
+#
+#   {"key": ..., "metadata": {"teacher_action": ...}, "response": "<model text>",
+#    "latency_ms": 812.4, "recorded_at": "..."}
+#
+# key is a hash of the canonical request: the messages and response_format
+# of a _wrap_llm_request dict, serialized with sorted keys. metadata is
+# only there for people reading the file. Identical requests recorded
+# several times are replayed in recorded order, round robin.
+#
+#   replay   answer from the cassette; a request not in it raises
+#            CassetteMiss (nothing leaves the machine)
+#   record   always call the model and append the answer
+#   auto     replay what is recorded, record the rest
+#
+# latency_scale > 0 sleeps recorded latency * scale before a replayed
+# answer, so benchmarks see model-like timing without the model.
+
+MODES = ("replay", "record", "auto")
+
+CASSETTE_REQUESTS = REGISTRY.counter(
+    "llm_cassette_requests_total", "LLM requests served by a cassette.", ("result",),
+)
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+def request_key(llm_request: Dict[str, Any]) -> str:
+    """
+    Stable hash of what is sent to the model for a _wrap_llm_request dict.
+    """
+    canonical = json.dumps(
+        {
+            "messages": llm_request.get("messages") or [],
+            "response_format": llm_request.get("response_format"),
+        },
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Recordings of one cassette file, keyed by request_key().
+    """
+
+    def __init__(self, path: str, mode: str = "replay", latency_scale: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode: {mode} (expected one of {', '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = max(0.0, latency_scale)
+        self._recordings: Dict[str, List[Tuple[str, float]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    entry = (record["response"], float(record.get("latency_ms", 0.0)))
+                    self._recordings.setdefault(record["key"], []).append(entry)
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f"{self.path}:{line_no}: bad cassette record: {e}") from None
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._recordings.values())
+
+    def _next(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entries = self._recordings.get(key)
+            if not entries:
+                return None
+            position = self._cursor.get(key, 0)
+            self._cursor[key] = position + 1
+            return entries[position % len(entries)]
+
+    def _append(self, key: str, llm_request: Dict[str, Any], text: str, latency_ms: float) -> None:
+        record = {
+            "key": key,
+            "metadata": llm_request.get("metadata") or {},
+            "response": text,
+            "latency_ms": round(latency_ms, 1),
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._recordings.setdefault(key, []).append((text, latency_ms))
+
+    async def call(
+        self,
+        llm_request: Dict[str, Any],
+        model_call: Callable[[Dict[str, Any]], Awaitable[str]],
+    ) -> str:
+        """
+        The model's text for llm_request: replayed, or produced by
+        model_call and recorded, depending on the mode.
+        """
+        key = request_key(llm_request)
+        if self.mode != "record":
+            recording = self._next(key)
+            if recording is not None:
+                text, latency_ms = recording
+                if self.latency_scale > 0:
+                    await asyncio.sleep(latency_ms * self.latency_scale / 1000.0)
+                CASSETTE_REQUESTS.inc("hit")
+                return text
+            if self.mode == "replay":
+                CASSETTE_REQUESTS.inc("miss")
+                raise CassetteMiss(
+                    f"no recording for {llm_request.get('metadata') or {}} (key {key}) in {self.path}"
+                )
+
+        started = time.perf_counter()
+        text = await model_call(llm_request)
+        self._append(key, llm_request, text, (time.perf_counter() - started) * 1000.0)
+        CASSETTE_REQUESTS.inc("recorded")
+        return text
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """
+    Cassette configured by the environment, or None:
+      LLM_CASSETTE                path of the JSONL file; unset = no cassette
+      LLM_CASSETTE_MODE           replay | record | auto (default replay)
+      LLM_CASSETTE_LATENCY_SCALE  replay delay = recorded latency * scale
+                                  (default 0: answer immediately)
+    """
+    path = os.getenv("LLM_CASSETTE")
+    if not path:
+        return None
+    return Cassette(
+        path,
+        mode=os.getenv("LLM_CASSETTE_MODE", "replay"),
+        latency_scale=float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "0")),
+    )
@@ -0,0 +1,314 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app.logic.llm_output import is_usable, request_action
+from app.logic.metrics import REGISTRY
+
+
+# =========================
+# HEDGED MODEL CALLS
+# =========================
+#
+# Model latency has a long tail: a few percent of calls take several times
+# the median. Every model call made for a mode action gets
+#
+#   timeout  a budget for the whole call, hedge included:
+#            LLM_TIMEOUT_<ACTION> (e.g. LLM_TIMEOUT_EXPLAIN_TOPIC=20), else
+#            the action's default below, else LLM_TIMEOUT (default 60 s).
+#            Past it the call raises LLMTimeout, unless one call already
+#            answered (unusably): that answer is returned instead.
+#   hedge    when the call has not answered by the action's recent p95
+#            (LLM_HEDGE_QUANTILE), the same request is sent a second time.
+#            The first usable answer wins (parses and fits the action's
+#            output schema, see app.logic.llm_output); the other call is
+#            cancelled.
+#
+# Hedges are paid for from a global budget: every call earns
+# LLM_HEDGE_BUDGET (default 0.05) of a hedge, up to LLM_HEDGE_BURST saved
+# up, so hedging adds at most ~5% model calls over time. No hedge is sent
+# while requests are queued for the llm admission lane, or before an
+# action has LLM_HEDGE_MIN_SAMPLES latencies (of the last
+# LLM_HEDGE_WINDOW) to estimate its p95 from. LLM_HEDGING=0 (or
+# POST /admin/llm_hedging) turns hedging off; calls already waiting to
+# hedge then just wait for their primary.
+#
+# Two latencies are kept per action, as llm_call_latency_seconds{action,
+# measure} and in stats():
+#
+#   primary    the first call alone, i.e. latency without hedging (a
+#              primary cancelled because its hedge won counts with the
+#              time it had taken so far, a lower bound)
+#   effective  what the caller waited for
+#
+# so p99 before and after hedging can be compared on live traffic.
+
+# Seconds; short-answer actions give up sooner than generation
+_DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "summarize_topic": 20.0,
+    "check_answer": 20.0,
+    "last_minute_revision": 20.0,
+}
+
+LLM_CALL_LATENCY = REGISTRY.histogram(
+    "llm_call_latency_seconds", "Model call latency per action, without (primary) and with (effective) hedging.",
+    ("action", "measure"),
+)
+LLM_HEDGES = REGISTRY.counter(
+    "llm_hedges_total", "Hedged model calls by outcome (sent, won, lost, no_budget).", ("action", "result"),
+)
+LLM_TIMEOUTS = REGISTRY.counter(
+    "llm_timeouts_total", "Model calls that ran past their action's timeout budget.", ("action",),
+)
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+class LatencyWindow:
+    """
+    The last `size` latencies (seconds) of one action.
+    """
+
+    def __init__(self, size: int):
+        self._values: Deque[float] = deque(maxlen=max(1, size))
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, seconds: float) -> None:
+        self._values.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self._values:
+            return None
+        ordered = sorted(self._values)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class HedgeBudget:
+    """
+    Token bucket: each call earns `ratio` of a hedge, a hedge spends one.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = max(0.0, ratio)
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._lock = threading.Lock()
+
+    def earn(self) -> None:
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def _llm_lane_queued() -> bool:
+    # Imported late: admission imports app.logic.llm, which imports this module
+    from app.logic.admission import LANE_LLM, LANES
+
+    return LANES[LANE_LLM].queued > 0
+
+
+class Hedger:
+    """
+    Runs model calls with per-action timeouts and budgeted hedges; see
+    the module comment.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        quantile: float = 0.95,
+        budget: float = 0.05,
+        burst: float = 5.0,
+        window: int = 500,
+        min_samples: int = 20,
+        default_timeout: float = 60.0,
+        timeouts: Optional[Dict[str, float]] = None,
+        lane_busy: Callable[[], bool] = _llm_lane_queued,
+    ):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.budget = HedgeBudget(budget, burst)
+        self.window = window
+        self.min_samples = max(1, min_samples)
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self._lane_busy = lane_busy
+        self._primary: Dict[str, LatencyWindow] = {}
+        self._effective: Dict[str, LatencyWindow] = {}
+
+    def _windows(self, windows: Dict[str, LatencyWindow], action: str) -> LatencyWindow:
+        window = windows.get(action)
+        if window is None:
+            window = windows[action] = LatencyWindow(self.window)
+        return window
+
+    def timeout_for(self, action: str) -> float:
+        return self.timeouts.get(action, self.default_timeout)
+
+    def hedge_delay(self, action: str) -> Optional[float]:
+        """
+        Seconds to wait for the primary before hedging, None when the
+        action has too few samples yet.
+        """
+        window = self._primary.get(action)
+        if window is None or len(window) < self.min_samples:
+            return None
+        return window.quantile(self.quantile)
+
+    def _may_hedge(self, action: str) -> bool:
+        if not self.enabled or self._lane_busy():
+            return False
+        if not self.budget.try_spend():
+            LLM_HEDGES.inc(action, "no_budget")
+            return False
+        return True
+
+    def _record(self, action: str, primary: float, effective: float) -> None:
+        self._windows(self._primary, action).add(primary)
+        self._windows(self._effective, action).add(effective)
+        LLM_CALL_LATENCY.observe(primary, action, "primary")
+        LLM_CALL_LATENCY.observe(effective, action, "effective")
+
+    async def call(
+        self,
+        llm_request: Dict[str, Any],
+        model_call: Callable[[Dict[str, Any]], Awaitable[str]],
+    ) -> str:
+        """
+        model_call(llm_request), hedged once if it is slow. Raises
+        LLMTimeout past the action's budget, or the first error when every
+        call failed.
+        """
+        action = request_action(llm_request)
+        started = time.perf_counter()
+        deadline = started + self.timeout_for(action)
+        delay = self.hedge_delay(action) if self.enabled else None
+        self.budget.earn()
+
+        primary = asyncio.ensure_future(model_call(llm_request))
+        primary_done: List[float] = []
+        primary.add_done_callback(lambda _: primary_done.append(time.perf_counter()))
+        hedge: Optional[asyncio.Future] = None
+        pending = {primary}
+        fallback: Optional[str] = None
+        errors: List[BaseException] = []
+        try:
+            while pending:
+                now = time.perf_counter()
+                wait = deadline - now
+                hedge_at = started + delay if delay is not None and hedge is None else None
+                if hedge_at is not None:
+                    wait = min(wait, hedge_at - now)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wait), return_when=asyncio.FIRST_COMPLETED,
+                )
+
+                if not done:
+                    if time.perf_counter() >= deadline:
+                        LLM_TIMEOUTS.inc(action)
+                        self._finish(action, started, primary_done, hedge, winner=None)
+                        if fallback is not None:
+                            # An unusable answer is still worth repairing
+                            # or re-asking (complete_validated)
+                            return fallback
+                        raise LLMTimeout(f"model call for {action} took longer than {self.timeout_for(action):g}s")
+                    delay = None  # one hedge decision per call
+                    if self._may_hedge(action):
+                        LLM_HEDGES.inc(action, "sent")
+                        hedge = asyncio.ensure_future(model_call(llm_request))
+                        pending.add(hedge)
+                    continue
+
+                # Primary first when both finished in the same step
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    text = task.result()
+                    if hedge is None or is_usable(llm_request, text):
+                        self._finish(action, started, primary_done, hedge, winner=task)
+                        return text
+                    if fallback is None:
+                        fallback = text
+
+            # Every call answered badly or failed: the first answer (the
+            # caller repairs or re-asks), else the first error
+            if fallback is not None:
+                self._finish(action, started, primary_done, hedge, winner=None)
+                return fallback
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in (primary, hedge):
+                if task is not None and task.done() and not task.cancelled():
+                    task.exception()  # retrieved: no "never retrieved" warning
+
+    def _finish(self, action: str, started: float, primary_done: List[float], hedge, winner) -> None:
+        now = time.perf_counter()
+        if hedge is not None and winner is not None:
+            LLM_HEDGES.inc(action, "won" if winner is hedge else "lost")
+        # A primary still running (beaten by its hedge, or timed out) took
+        # at least until now
+        primary = (primary_done[0] if primary_done else now) - started
+        self._record(action, primary, now - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-action p50/p95/p99 (ms) of primary and effective latency, the
+        current hedge delay and the hedge budget.
+        """
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000.0, 1)
+
+        actions = {}
+        for action, window in sorted(self._primary.items()):
+            effective = self._effective[action]
+            actions[action] = {
+                "samples": len(window),
+                "timeout_s": self.timeout_for(action),
+                "hedge_after_ms": ms(self.hedge_delay(action)),
+                "primary": {f"p{int(q * 100)}": ms(window.quantile(q)) for q in (0.5, 0.95, 0.99)},
+                "effective": {f"p{int(q * 100)}": ms(effective.quantile(q)) for q in (0.5, 0.95, 0.99)},
+            }
+        return {
+            "enabled": self.enabled,
+            "quantile": self.quantile,
+            "budget": {"ratio": self.budget.ratio, "burst": self.budget.burst, "tokens": round(self.budget.tokens, 2)},
+            "actions": actions,
+        }
+
+
+def _hedger_from_env() -> Hedger:
+    timeouts = dict(_DEFAULT_TIMEOUTS)
+    prefix = "LLM_TIMEOUT_"
+    for name, value in os.environ.items():
+        if name.startswith(prefix) and value:
+            timeouts[name[len(prefix):].lower()] = float(value)
+    return Hedger(
+        enabled=os.getenv("LLM_HEDGING", "1") == "1",
+        quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        budget=float(os.getenv("LLM_HEDGE_BUDGET", "0.05")),
+        burst=float(os.getenv("LLM_HEDGE_BURST", "5")),
+        window=int(os.getenv("LLM_HEDGE_WINDOW", "500")),
+        min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        default_timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+        timeouts=timeouts,
+    )
+
+
+hedger = _hedger_from_env()
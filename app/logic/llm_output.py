@@ -0,0 +1,429 @@
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.logic.metrics import REGISTRY, stage
+from app.teacher.modes.exam import EXAM_OUTPUT_SCHEMAS
+from app.teacher.modes.practice import PRACTICE_OUTPUT_SCHEMAS
+from app.teacher.modes.revision import REVISION_OUTPUT_SCHEMAS
+from app.teacher.modes.teacher_mode import TEACHER_OUTPUT_SCHEMAS
+
+
+# =========================
+# MODEL OUTPUT VALIDATION
+# =========================
+#
+# Every prompt asks for one JSON "kind". Each mode declares the expected
+# shape per action (*_OUTPUT_SCHEMAS) in a JSON-schema subset:
+#
+#   type (or a list of types), const, enum, properties, required, items,
+#   minItems, maxItems
+#
+# A count bound may be {"$meta": "count", "add": 2}: the value of that
+# request-metadata key (plus add), for "EXACTLY {count}" style prompts.
+# Schemas are compiled into closures once, at import.
+#
+# An executed answer then goes through
+#
+#   parse    json.loads; failing that, the JSON object inside code fences
+#            or surrounding prose, then without trailing commas
+#   repair   wrong/missing "kind", numbers sent as strings, enum case,
+#            arrays longer than the prompt allowed (truncated)
+#   re-ask   what is still wrong goes back to the model as a follow-up
+#            turn listing the problems, up to LLM_MAX_REASKS times
+#
+# llm_outputs_total{kind, outcome} counts valid / repaired / reasked /
+# invalid answers; llm_regenerations_total{kind} counts re-asks.
+
+LLM_MAX_REASKS = int(os.getenv("LLM_MAX_REASKS", "1"))
+
+# Problems listed in one re-ask prompt
+MAX_REASK_ERRORS = 8
+
+LLM_OUTPUTS = REGISTRY.counter(
+    "llm_outputs_total", "Executed model answers by expected kind and validation outcome.", ("kind", "outcome"),
+)
+LLM_REGENERATIONS = REGISTRY.counter(
+    "llm_regenerations_total", "Follow-up requests sent because a model answer failed validation.", ("kind",),
+)
+
+
+class InvalidLLMOutput(ValueError):
+    pass
+
+
+# =========================
+# SCHEMA COMPILER
+# =========================
+
+class _Check:
+    """
+    State of one validation pass.
+    """
+    __slots__ = ("metadata", "repair", "errors", "repairs")
+
+    def __init__(self, metadata: Dict[str, Any], repair: bool):
+        self.metadata = metadata
+        self.repair = repair
+        self.errors: List[str] = []
+        self.repairs = 0
+
+
+Node = Callable[[Any, str, _Check], Any]
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: (isinstance(v, int) and not isinstance(v, bool)) or (isinstance(v, float) and v.is_integer()),
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "null": lambda v: v is None,
+}
+
+
+def _bound(spec: Any, metadata: Dict[str, Any]) -> Optional[int]:
+    if spec is None:
+        return None
+    if isinstance(spec, dict):
+        value = metadata.get(spec["$meta"])
+        try:
+            return int(value) + int(spec.get("add", 0))
+        except (TypeError, ValueError):
+            return None     # count not in this request: no bound
+    return int(spec)
+
+
+def _join(path: str, key: Any) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    return f"{path}.{key}" if path else str(key)
+
+
+def compile_schema(schema: Dict[str, Any]) -> Node:
+    """
+    Schema -> node(value, path, check) returning the (possibly repaired)
+    value and appending problems to check.errors.
+    """
+    checks: List[Node] = []
+
+    if "const" in schema:
+        expected = schema["const"]
+
+        def const(value, path, check):
+            if value == expected:
+                return value
+            if check.repair:
+                check.repairs += 1
+                return expected
+            check.errors.append(f"{path or 'value'}: must be {json.dumps(expected)}")
+            return value
+        checks.append(const)
+
+    types = schema.get("type")
+    if types is not None:
+        names = (types,) if isinstance(types, str) else tuple(types)
+        predicates = [_TYPE_CHECKS[name] for name in names]
+        numeric = "number" in names or "integer" in names
+
+        def typed(value, path, check):
+            if any(p(value) for p in predicates):
+                return value
+            if check.repair and numeric and isinstance(value, str):
+                try:
+                    number = float(value.strip())
+                except ValueError:
+                    pass
+                else:
+                    check.repairs += 1
+                    return int(number) if number.is_integer() else number
+            check.errors.append(f"{path or 'value'}: expected {' or '.join(names)}, got {type(value).__name__}")
+            raise _Stop()
+        checks.append(typed)
+
+    if "enum" in schema:
+        allowed = tuple(schema["enum"])
+        folded = {str(a).lower(): a for a in allowed}
+
+        def enum(value, path, check):
+            if value in allowed:
+                return value
+            match = folded.get(str(value).strip().lower())
+            if check.repair and match is not None:
+                check.repairs += 1
+                return match
+            check.errors.append(f"{path or 'value'}: must be one of {', '.join(map(str, allowed))}")
+            return value
+        checks.append(enum)
+
+    if "properties" in schema or "required" in schema:
+        required = tuple(schema.get("required", ()))
+        properties = [(key, compile_schema(sub)) for key, sub in schema.get("properties", {}).items()]
+        constants = {key: sub["const"] for key, sub in schema.get("properties", {}).items() if "const" in sub}
+
+        def obj(value, path, check):
+            if not isinstance(value, dict):
+                return value
+            for key in required:
+                if key in value:
+                    continue
+                if check.repair and key in constants:
+                    check.repairs += 1
+                    value[key] = constants[key]
+                else:
+                    check.errors.append(f"{_join(path, key)}: missing")
+            for key, node in properties:
+                if key in value:
+                    value[key] = node(value[key], _join(path, key), check)
+            return value
+        checks.append(obj)
+
+    if "items" in schema or "minItems" in schema or "maxItems" in schema:
+        item_node = compile_schema(schema["items"]) if "items" in schema else None
+        min_spec, max_spec = schema.get("minItems"), schema.get("maxItems")
+
+        def array(value, path, check):
+            if not isinstance(value, list):
+                return value
+            low, high = _bound(min_spec, check.metadata), _bound(max_spec, check.metadata)
+            if high is not None and len(value) > high:
+                if check.repair:
+                    check.repairs += 1
+                    del value[high:]
+                else:
+                    check.errors.append(f"{path}: expected at most {high} items, got {len(value)}")
+            if low is not None and len(value) < low:
+                expected = f"exactly {low}" if low == high else f"at least {low}"
+                check.errors.append(f"{path}: expected {expected} items, got {len(value)}")
+            if item_node is not None:
+                for i, item in enumerate(value):
+                    value[i] = item_node(item, _join(path, i), check)
+            return value
+        checks.append(array)
+
+    def node(value, path, check):
+        try:
+            for step in checks:
+                value = step(value, path, check)
+        except _Stop:
+            pass
+        return value
+
+    return node
+
+
+class _Stop(Exception):
+    # wrong type: the remaining checks of that node do not apply
+    pass
+
+
+class OutputSchema:
+    """
+    A compiled per-action schema. check() validates a parsed answer
+    against it, repairing in place when asked.
+    """
+
+    def __init__(self, action: str, schema: Dict[str, Any]):
+        self.action = action
+        self.schema = schema
+        self.kind: str = schema.get("properties", {}).get("kind", {}).get("const", action)
+        self._node = compile_schema(schema)
+
+    def check(self, value: Any, metadata: Optional[Dict[str, Any]] = None, repair: bool = False) -> Tuple[Any, List[str], int]:
+        """
+        (value, problems, repairs made).
+        """
+        check = _Check(metadata or {}, repair)
+        value = self._node(value, "", check)
+        return value, check.errors, check.repairs
+
+
+# (metadata key naming the action, action) -> compiled schema
+OUTPUT_SCHEMAS: Dict[Tuple[str, str], OutputSchema] = {}
+for _key, _schemas in (
+    ("teacher_action", TEACHER_OUTPUT_SCHEMAS),
+    ("practice_action", PRACTICE_OUTPUT_SCHEMAS),
+    ("revision_action", REVISION_OUTPUT_SCHEMAS),
+    ("exam_action", EXAM_OUTPUT_SCHEMAS),
+):
+    for _action, _schema in _schemas.items():
+        OUTPUT_SCHEMAS[(_key, _action)] = OutputSchema(_action, _schema)
+
+_SCHEMAS_BY_KIND: Dict[str, OutputSchema] = {s.kind: s for s in OUTPUT_SCHEMAS.values()}
+
+
+_ACTION_KEYS = ("teacher_action", "practice_action", "revision_action", "exam_action")
+
+
+def request_action(llm_request: Dict[str, Any]) -> str:
+    """
+    The mode action a _wrap_llm_request dict was built for ("unknown" if
+    none).
+    """
+    metadata = llm_request.get("metadata") or {}
+    for key in _ACTION_KEYS:
+        if key in metadata:
+            return str(metadata[key])
+    return "unknown"
+
+
+def schema_for(llm_request: Dict[str, Any]) -> Optional[OutputSchema]:
+    """
+    The schema the answer to a _wrap_llm_request dict must match, if known.
+    """
+    metadata = llm_request.get("metadata") or {}
+    for key in _ACTION_KEYS:
+        if key in metadata:
+            return OUTPUT_SCHEMAS.get((key, metadata[key]))
+    return None
+
+
+def is_usable(llm_request: Dict[str, Any], text: str) -> bool:
+    """
+    True when text parses and, after repairs, matches the request's schema.
+    """
+    try:
+        value, _ = parse_output(text)
+    except InvalidLLMOutput:
+        return False
+    schema = schema_for(llm_request)
+    if schema is None:
+        return True
+    _, errors, _ = schema.check(value, llm_request.get("metadata") or {}, repair=True)
+    return not errors
+
+
+def schema_for_kind(kind: str) -> Optional[OutputSchema]:
+    return _SCHEMAS_BY_KIND.get(kind)
+
+
+# =========================
+# PARSE / REPAIR / RE-ASK
+# =========================
+
+_FENCE = re.compile(r"```[A-Za-z]*\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_decoder = json.JSONDecoder()
+
+
+def parse_output(text: str) -> Tuple[Any, bool]:
+    """
+    (value, repaired) for a model answer. Raises ValueError when no JSON
+    object can be recovered.
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+
+    fenced = _FENCE.search(text)
+    candidates = [fenced.group(1)] if fenced else []
+    candidates.append(text)
+    for candidate in candidates:
+        start = candidate.find("{")
+        if start < 0:
+            continue
+        for body in (candidate, _TRAILING_COMMA.sub(r"\1", candidate)):
+            try:
+                value, _ = _decoder.raw_decode(body, body.find("{"))
+                return value, True
+            except ValueError:
+                continue
+    raise InvalidLLMOutput(f"no JSON object in model output: {text[:80]!r}")
+
+
+def reask_request(llm_request: Dict[str, Any], previous: str, errors: List[str], attempt: int) -> Dict[str, Any]:
+    """
+    Follow-up request: the original conversation, the rejected answer and
+    the list of problems to fix.
+    """
+    listed = "\n".join(f"- {e}" for e in errors[:MAX_REASK_ERRORS])
+    if len(errors) > MAX_REASK_ERRORS:
+        listed += f"\n- ... and {len(errors) - MAX_REASK_ERRORS} more"
+    return {
+        "messages": list(llm_request["messages"]) + [
+            {"role": "assistant", "content": previous},
+            {"role": "user", "content": (
+                "Your reply does not match the required JSON shape:\n"
+                f"{listed}\n\n"
+                "Return the corrected JSON object only, with every problem above fixed. "
+                "No text outside the JSON."
+            )},
+        ],
+        "response_format": llm_request.get("response_format"),
+        "metadata": {**(llm_request.get("metadata") or {}), "reask": attempt},
+    }
+
+
+async def complete_validated(
+    llm_request: Dict[str, Any],
+    call: Callable[[Dict[str, Any]], Awaitable[str]],
+    max_reasks: int = LLM_MAX_REASKS,
+) -> Any:
+    """
+    Run llm_request through call (model text out) and return the parsed,
+    validated answer, repairing or re-asking as needed. After the last
+    re-ask the latest parsed answer is returned even if still invalid;
+    InvalidLLMOutput is raised only when none could be parsed.
+    """
+    schema = schema_for(llm_request)
+    kind = schema.kind if schema is not None else "unknown"
+    metadata = llm_request.get("metadata") or {}
+    request = llm_request
+    latest: Any = None
+    parsed = False
+
+    for attempt in range(max(0, max_reasks) + 1):
+        text = await call(request)
+        with stage("llm_json_parse"):
+            try:
+                value, repaired = parse_output(text)
+            except InvalidLLMOutput as e:
+                errors, previous = [str(e)], text
+            else:
+                latest, parsed = value, True
+                if schema is None:
+                    LLM_OUTPUTS.inc(kind, "repaired" if repaired else "valid")
+                    return value
+                value, errors, repairs = schema.check(value, metadata, repair=True)
+                latest = value
+                if not errors:
+                    if attempt:
+                        outcome = "reasked"
+                    else:
+                        outcome = "repaired" if repaired or repairs else "valid"
+                    LLM_OUTPUTS.inc(kind, outcome)
+                    return value
+                previous = json.dumps(value, ensure_ascii=False)
+        if attempt < max_reasks:
+            LLM_REGENERATIONS.inc(kind)
+            request = reask_request(llm_request, previous, errors, attempt + 1)
+
+    LLM_OUTPUTS.inc(kind, "invalid")
+    if not parsed:
+        raise InvalidLLMOutput(f"model output for {kind} is not JSON")
+    return latest
+
+
+# =========================
+# EXAMPLES
+# =========================
+
+def example_output(schema: Dict[str, Any], metadata: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Smallest value matching schema (count bounds from metadata), for stubs.
+    """
+    metadata = metadata or {}
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return schema["enum"][0]
+    types = schema.get("type", "string")
+    name = next((t for t in ([types] if isinstance(types, str) else types) if t != "null"), "null")
+    if name == "object":
+        return {key: example_output(sub, metadata) for key, sub in schema.get("properties", {}).items()}
+    if name == "array":
+        count = _bound(schema.get("minItems"), metadata) or 1
+        return [example_output(schema.get("items", {}), metadata) for _ in range(count)]
+    return {"string": "Stub text.", "number": 1, "integer": 1, "boolean": True, "null": None}[name]
@@ -0,0 +1,198 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Any, Dict, List, Optional
+
+
+# =========================
+# CONFIG
+# =========================
+#
+# LOG_LEVEL             root level (default INFO)
+# LOG_SAMPLE_DEFAULT    fraction of INFO/DEBUG route logs kept (default 1.0)
+# LOG_SAMPLE_RATES      per-route overrides, e.g.
+#                       "/study_plan/generate_study_plan=0.05,/teacher/=0.2"
+# LOG_FIELD_MAX_CHARS   cap on the rendered size of one field (default 256)
+#
+# Warnings and errors are never sampled out.
+
+LOG_FIELD_MAX_CHARS = int(os.getenv("LOG_FIELD_MAX_CHARS", "256"))
+
+
+def _parse_rates(raw: str) -> Dict[str, float]:
+    rates: Dict[str, float] = {}
+    for part in raw.split(","):
+        route, sep, rate = part.strip().rpartition("=")
+        if not sep or not route:
+            continue
+        try:
+            rates[route] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+_DEFAULT_RATE = float(os.getenv("LOG_SAMPLE_DEFAULT", "1.0"))
+_ROUTE_RATES = _parse_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+# =========================
+# BOUNDED, LAZY FIELDS
+# =========================
+
+def _summarize(value: Any, budget: int) -> str:
+    """
+    Render value in at most ~budget chars. Containers are walked item by
+    item and abandoned once the budget is spent, so the cost depends on
+    the cap rather than on the payload size.
+    """
+    if hasattr(value, "model_dump") and not isinstance(value, type):
+        value = {name: getattr(value, name) for name in type(value).model_fields}
+
+    if isinstance(value, dict):
+        parts: List[str] = []
+        used = 0
+        for i, (k, v) in enumerate(value.items()):
+            if used >= budget:
+                parts.append(f"...+{len(value) - i} keys")
+                break
+            item = f"{k}={_summarize(v, budget - used)}"
+            parts.append(item)
+            used += len(item) + 2
+        return "{" + ", ".join(parts) + "}"
+
+    if isinstance(value, (list, tuple)):
+        parts = []
+        used = 0
+        for i, v in enumerate(value):
+            if used >= budget:
+                parts.append(f"...+{len(value) - i}")
+                break
+            item = _summarize(v, budget - used)
+            parts.append(item)
+            used += len(item) + 2
+        return f"[len={len(value)}: " + ", ".join(parts) + "]"
+
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) > budget:
+        return text[: max(0, budget)] + "..."
+    return text
+
+
+class LazyFields:
+    """
+    key=value pairs that are only rendered for records that are actually
+    emitted (not sampled out or below the level). They are rendered to a
+    capped string when the record is queued, on the caller's thread: the
+    fields are often live request objects that keep changing afterwards.
+    """
+
+    __slots__ = ("fields", "max_chars")
+
+    def __init__(self, fields: Dict[str, Any], max_chars: int = LOG_FIELD_MAX_CHARS):
+        self.fields = fields
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return " ".join(f"{k}={_summarize(v, self.max_chars)}" for k, v in self.fields.items())
+
+
+# =========================
+# PER-ROUTE SAMPLED LOGGER
+# =========================
+
+class RouteLogger:
+    """
+    log = route_logger(__name__, "/teacher/")
+    log.info("teacher_request", action=body.action, payload=body.payload)
+
+    INFO/DEBUG calls are sampled per route before any record is built;
+    warning/error/exception always go through.
+    """
+
+    def __init__(self, name: str, route: str, sample_rate: Optional[float] = None):
+        self.logger = logging.getLogger(name)
+        self.route = route
+        self.sample_rate = _ROUTE_RATES.get(route, _DEFAULT_RATE) if sample_rate is None else sample_rate
+
+    def _sampled(self) -> bool:
+        rate = self.sample_rate
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    def debug(self, event: str, **fields: Any) -> None:
+        if self.logger.isEnabledFor(logging.DEBUG) and self._sampled():
+            self.logger.debug("%s %s", event, LazyFields(fields))
+
+    def info(self, event: str, **fields: Any) -> None:
+        if self.logger.isEnabledFor(logging.INFO) and self._sampled():
+            self.logger.info("%s %s", event, LazyFields(fields))
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self.logger.warning("%s %s", event, LazyFields(fields))
+
+    def error(self, event: str, exc_info: bool = False, **fields: Any) -> None:
+        self.logger.error("%s %s", event, LazyFields(fields), exc_info=exc_info)
+
+
+def route_logger(name: str, route: str) -> RouteLogger:
+    return RouteLogger(name, route)
+
+
+# =========================
+# BACKGROUND HANDLER
+# =========================
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    The stock QueueHandler formats the whole message in prepare(), i.e. on
+    the caller's thread. Records stay in-process here, so only LazyFields
+    arguments are rendered now (snapshotting live payloads, at a cost
+    bounded by LOG_FIELD_MAX_CHARS per field); the formatting itself is
+    left to the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if isinstance(args, tuple) and any(isinstance(a, LazyFields) for a in args):
+            record.args = tuple(str(a) if isinstance(a, LazyFields) else a for a in args)
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None) -> None:
+    """
+    Route all logging through an unbounded queue drained by one background
+    thread. Idempotent; replaces any handlers installed by basicConfig().
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level or os.getenv("LOG_LEVEL", "INFO"))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
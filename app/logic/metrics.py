@@ -0,0 +1,310 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+# =========================
+# CONFIG
+# =========================
+#
+# METRICS_ENABLED=0 turns all instrumentation into no-ops: timed_stage()
+# returns the undecorated function and stage() a shared nullcontext, so the
+# disabled cost is one bool check per `with stage(...)` block.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Scheduler stages live in the sub-ms range, LLM calls in seconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [
+        '%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+# =========================
+# METRIC TYPES
+# =========================
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        return self._values.get(labelvalues, 0.0)
+
+    def collect(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_float(value)}")
+        return lines
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(labelvalues)
+            if child is None:
+                child = self._children[labelvalues] = _HistogramChild(len(self.buckets))
+            child.counts[index] += 1
+            child.total += value
+            child.count += 1
+
+    def snapshot(self, *labelvalues: str) -> Tuple[int, float]:
+        child = self._children.get(labelvalues)
+        if child is None:
+            return 0, 0.0
+        return child.count, child.total
+
+    def collect(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = [
+                (labels, list(c.counts), c.total, c.count)
+                for labels, c in sorted(self._children.items())
+            ]
+        for labelvalues, counts, total, count in items:
+            cumulative = 0
+            for upper, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _format_float(upper)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_float(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"),
+)
+STAGE_LATENCY = REGISTRY.histogram(
+    "stage_duration_seconds", "Latency of internal scheduler/LLM stages.", ("stage",),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "stage_errors_total", "Internal stages that raised.", ("stage",),
+)
+WS_MESSAGE_LATENCY = REGISTRY.histogram(
+    "ws_message_duration_seconds", "Server time per WebSocket message.", ("route", "type"),
+)
+
+
+# =========================
+# STAGE TIMING
+# =========================
+
+_DISABLED = nullcontext()
+
+
+# Set by app.logic.profiling while profiling is configured: enter(name)
+# returns a token (None when the current request is not profiled) that is
+# passed back to exit(token) when the stage ends.
+_stage_observer = None
+
+
+def set_stage_observer(observer) -> None:
+    global _stage_observer
+    _stage_observer = observer
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    observer = _stage_observer
+    token = observer.enter(name) if observer is not None else None
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(name)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, name)
+        if token is not None:
+            observer.exit(token)
+
+
+def stage(name: str):
+    """
+    with stage("llm_call"): ...
+    """
+    if not METRICS_ENABLED:
+        return _DISABLED
+    return _timed(name)
+
+
+def timed_stage(name: str) -> Callable:
+    """
+    Decorator form of stage() for sync functions. When metrics are disabled
+    the function is returned unwrapped.
+    """
+    def decorator(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            observer = _stage_observer
+            token = observer.enter(name) if observer is not None else None
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                STAGE_ERRORS.inc(name)
+                raise
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - started, name)
+                if token is not None:
+                    observer.exit(token)
+
+        return wrapper
+
+    return decorator
+
+
+# =========================
+# HTTP
+# =========================
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and status per route template
+    (e.g. "/practice/" rather than the raw path, to keep label cardinality
+    bounded).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - started, method, path)
+            HTTP_REQUESTS.inc(method, path, str(status["code"]))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def install_metrics(app) -> None:
+    """
+    Add the request middleware and the /metrics endpoint to a FastAPI app.
+    """
+    from fastapi.responses import Response
+
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,380 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.logic.scheduler import study_plan_from_dict
+
+
+# =========================
+# RECORDS
+# =========================
+#
+# Plans are stored as immutable, content-addressed records:
+#
+#   day      [date, total_hours, [[topic, subject, task_type, hours, priority], ...]]
+#   topics   the topic payload the plan was built from
+#   version  plan_id, parent_id, metadata (dates, status, ...), the digests
+#            of its days in order, the digest of its topics
+#
+# A regenerated plan only adds the days that actually changed; every other
+# day (and the topic list, usually) is the very same record its parent
+# points to. A version costs 16 bytes per day plus its metadata.
+#
+# plan_id is derived from the content together with session_id and
+# parent_id, so versions (and their lineage) are never shared between
+# sessions, and a plan_id always maps to the same row. Regenerating a plan
+# identical to its parent returns the parent's id.
+
+_DIGEST_SIZE = 16
+
+PlanVersion = Tuple[Optional[str], Optional[str], bytes, Tuple[bytes, ...], Optional[bytes]]
+# (parent_id, session_id, meta json, day digests, topics digest)
+
+
+def _compact(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, sort_keys=True).encode("utf-8")
+
+
+def _digest(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=_DIGEST_SIZE).digest()
+
+
+def _encode_day(day: Dict[str, Any]) -> bytes:
+    return _compact([
+        str(day["date"]),
+        day.get("total_hours", 0.0),
+        [
+            [t["topic_name"], t.get("subject_name", ""), t["task_type"], t["duration_hours"], t.get("priority_score", 0.0)]
+            for t in day.get("tasks", [])
+        ],
+    ])
+
+
+def _decode_day(body: bytes) -> Dict[str, Any]:
+    day, total_hours, tasks = json.loads(body)
+    return {
+        "date": day,
+        "tasks": [
+            {
+                "topic_name": topic_name,
+                "subject_name": subject_name,
+                "task_type": task_type,
+                "duration_hours": duration_hours,
+                "priority_score": priority_score,
+            }
+            for topic_name, subject_name, task_type, duration_hours, priority_score in tasks
+        ],
+        "total_hours": total_hours,
+    }
+
+
+# =========================
+# STORE
+# =========================
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_records (
+    digest BLOB PRIMARY KEY,
+    body   BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plan_versions (
+    plan_id    TEXT PRIMARY KEY,
+    parent_id  TEXT,
+    session_id TEXT,
+    meta       BLOB NOT NULL,
+    days       BLOB NOT NULL,
+    topics     BLOB
+) WITHOUT ROWID;
+"""
+
+
+class PlanStore:
+    """
+    Versioned study plans keyed by plan_id.
+
+    Versions and records live in memory, reference-counted; the least
+    recently used versions beyond max_cached are dropped from memory (and
+    records nobody points to any more with them). With a sqlite path every
+    version is also written through, and evicted versions are read back on
+    demand; without one, evicted plans are gone.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_cached: int = 4096):
+        self.path: Optional[str] = None
+        self.max_cached = max(1, max_cached)
+        self._versions: "OrderedDict[str, PlanVersion]" = OrderedDict()
+        self._records: Dict[bytes, bytes] = {}
+        self._refs: Dict[bytes, int] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.attach_db(path)
+
+    def attach_db(self, path: Optional[str]) -> None:
+        """
+        Write through to the sqlite file at path from now on (None = memory
+        only). Versions already in memory are not copied over.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            self.path = path
+            if not path:
+                return
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    # ---- writing ----
+
+    def put(
+        self,
+        plan: Dict[str, Any],
+        topics: Optional[List[Dict[str, Any]]] = None,
+        session_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+    ) -> str:
+        """
+        Store a plan dict (study_plan_to_dict output, extra keys such as
+        "subjects" included) and return its plan_id.
+        """
+        meta = _compact({k: v for k, v in plan.items() if k not in ("days", "plan_id", "parent_id")})
+        day_bodies = [_encode_day(day) for day in plan.get("days", [])]
+        day_digests = tuple(_digest(body) for body in day_bodies)
+        topics_body = _compact(topics) if topics else None
+        topics_digest = _digest(topics_body) if topics_body is not None else None
+
+        plan_id = "plan_" + hashlib.blake2b(
+            meta + b"".join(day_digests) + (topics_digest or b"")
+            + _compact([session_id, parent_id]),
+            digest_size=12,
+        ).hexdigest()
+
+        with self._lock:
+            if parent_id is not None:
+                parent = self._version(parent_id)
+                if parent is not None and parent[1:] == (session_id, meta, day_digests, topics_digest):
+                    return parent_id
+            if plan_id in self._versions:
+                self._versions.move_to_end(plan_id)
+                return plan_id
+
+            records = dict(zip(day_digests, day_bodies))
+            if topics_digest is not None:
+                records[topics_digest] = topics_body
+            for digest in day_digests:
+                self._retain(digest, records[digest])
+            if topics_digest is not None:
+                self._retain(topics_digest, topics_body)
+            self._versions[plan_id] = (parent_id, session_id, meta, day_digests, topics_digest)
+
+            if self._db is not None:
+                # Records the file already has (shared with older versions)
+                # are skipped by the primary key
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO plan_records (digest, body) VALUES (?, ?)", records.items(),
+                )
+                self._db.execute(
+                    "INSERT OR IGNORE INTO plan_versions VALUES (?, ?, ?, ?, ?, ?)",
+                    (plan_id, parent_id, session_id, meta, b"".join(day_digests), topics_digest),
+                )
+                self._db.execute("COMMIT")
+
+            self._evict()
+        return plan_id
+
+    def _retain(self, digest: bytes, body: bytes) -> None:
+        refs = self._refs.get(digest, 0)
+        self._refs[digest] = refs + 1
+        if refs == 0:
+            self._records[digest] = body
+
+    def _release(self, digest: bytes) -> None:
+        refs = self._refs[digest] - 1
+        if refs:
+            self._refs[digest] = refs
+        else:
+            del self._refs[digest]
+            del self._records[digest]
+
+    def _evict(self) -> None:
+        while len(self._versions) > self.max_cached:
+            _, (_, _, _, day_digests, topics_digest) = self._versions.popitem(last=False)
+            for digest in day_digests:
+                self._release(digest)
+            if topics_digest is not None:
+                self._release(topics_digest)
+
+    # ---- reading ----
+
+    def _version(self, plan_id: str) -> Optional[PlanVersion]:
+        version = self._versions.get(plan_id)
+        if version is not None:
+            self._versions.move_to_end(plan_id)
+            return version
+        if self._db is None:
+            return None
+
+        row = self._db.execute(
+            "SELECT parent_id, session_id, meta, days, topics FROM plan_versions WHERE plan_id = ?",
+            (plan_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        parent_id, session_id, meta, days, topics_digest = row
+        day_digests = tuple(bytes(days[i:i + _DIGEST_SIZE]) for i in range(0, len(days), _DIGEST_SIZE))
+        wanted = set(day_digests) | ({bytes(topics_digest)} if topics_digest else set())
+        missing = [d for d in wanted if d not in self._records]
+        bodies: Dict[bytes, bytes] = {}
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            bodies.update(
+                (bytes(digest), bytes(body))
+                for digest, body in self._db.execute(
+                    f"SELECT digest, body FROM plan_records WHERE digest IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            )
+        if len(bodies) < len(missing):
+            return None  # records lost; treat the version as unknown
+        for digest in day_digests:
+            self._retain(digest, bodies.get(digest) or self._records[digest])
+        if topics_digest:
+            topics_digest = bytes(topics_digest)
+            self._retain(topics_digest, bodies.get(topics_digest) or self._records[topics_digest])
+
+        version = (parent_id, session_id, bytes(meta), day_digests, topics_digest)
+        self._versions[plan_id] = version
+        self._evict()
+        return version
+
+    def get(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored plan dict (with plan_id / parent_id), or None.
+        """
+        with self._lock:
+            version = self._version(plan_id)
+            if version is None:
+                return None
+            parent_id, _, meta, day_digests, _ = version
+            bodies = [self._records[digest] for digest in day_digests]
+
+        plan = json.loads(meta)
+        plan["days"] = [_decode_day(body) for body in bodies]
+        plan["plan_id"] = plan_id
+        plan["parent_id"] = parent_id
+        return plan
+
+    def parent(self, plan_id: str) -> Optional[str]:
+        """
+        parent_id of a stored version (None for a first version or an
+        unknown plan_id).
+        """
+        with self._lock:
+            version = self._version(plan_id)
+            return version[0] if version is not None else None
+
+    def topics(self, plan_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            version = self._version(plan_id)
+            if version is None or version[4] is None:
+                return None
+            body = self._records[version[4]]
+        return json.loads(body)
+
+    def lineage(self, plan_id: str, limit: int = 20) -> List[str]:
+        """
+        plan_id followed by its ancestors, newest first.
+        """
+        chain: List[str] = []
+        with self._lock:
+            current: Optional[str] = plan_id
+            while current and len(chain) < limit and current not in chain:
+                version = self._version(current)
+                if version is None:
+                    break
+                chain.append(current)
+                current = version[0]
+        return chain
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "versions": len(self._versions),
+                "records": len(self._records),
+                "record_bytes": sum(len(body) for body in self._records.values()),
+                "day_refs": sum(len(v[3]) for v in self._versions.values()),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# =========================
+# MODE GLUE
+# =========================
+
+def resolve_session_plan(
+    session_state: Dict[str, Any],
+    payload: Dict[str, Any],
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    (session_state, None) with session_state["plan"] as a StudyPlan, or
+    (None, reason).
+
+    The plan comes from, in order: payload["plan_id"], a plan the client
+    sent in session_state["plan"] (dict or StudyPlan), session_state
+    ["plan_id"]. A stored plan also fills in "topics" when the client sent
+    none.
+    """
+    explicit = payload.get("plan_id")
+    plan_id = explicit or (session_state.get("plan_id") if session_state.get("plan") is None else None)
+    if plan_id:
+        plan = plan_store.get(plan_id)
+        if plan is not None:
+            state = {**session_state, "plan": study_plan_from_dict(plan)}
+            if not state.get("topics"):
+                state["topics"] = plan_store.topics(plan_id) or []
+            return state, None
+        if explicit:
+            return None, f"plan_not_found: {plan_id}"
+
+    plan = session_state.get("plan")
+    if isinstance(plan, dict):
+        try:
+            return {**session_state, "plan": study_plan_from_dict(plan)}, None
+        except (KeyError, TypeError, ValueError) as e:
+            return None, f"invalid_plan: {e}"
+    return session_state, None
+
+
+# Process-wide store used by the routers; memory-only until
+# init_plan_store_from_env() runs.
+plan_store = PlanStore()
+
+
+def init_plan_store_from_env() -> None:
+    """
+    Configure plan_store from the environment:
+      PLAN_STORE_PATH          sqlite file (default: plans.sqlite in
+                               SESSION_DATA_DIR; neither = memory only)
+      PLAN_STORE_MAX_CACHED    versions kept in memory
+    """
+    path = os.getenv("PLAN_STORE_PATH")
+    if not path and os.getenv("SESSION_DATA_DIR"):
+        path = os.path.join(os.environ["SESSION_DATA_DIR"], "plans.sqlite")
+    plan_store.max_cached = max(1, int(os.getenv("PLAN_STORE_MAX_CACHED", "4096")))
+    if path != plan_store.path:
+        plan_store.attach_db(path)
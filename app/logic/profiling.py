@@ -0,0 +1,498 @@
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter as CountMap, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.logic import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# ON-DEMAND PROFILING
+# =========================
+#
+# Off unless PROFILE_SECRET is set. A request is profiled when
+#
+#   - it carries a valid X-Profile header: "<expires>.<signature>", the
+#     signature being HMAC-SHA256(PROFILE_SECRET, "<expires>.<METHOD> <path>")
+#     in hex and expires a unix time at most PROFILE_MAX_TTL seconds ahead
+#     (see sign_request), or
+#   - a sampling rule set through POST /admin/profiling matches its path
+#     prefix (rate = fraction of requests, limit = how many in total).
+#
+# A profiled request gets an X-Profile-Id response header and leaves in
+# PROFILE_DIR:
+#
+#   <id>.cpu.folded      sampled stacks of the threads running the
+#                        request, one "frame;frame;... count" line per
+#                        stack (flamegraph.pl / speedscope input)
+#   <id>.memory.folded   peak bytes per timed stage (schedule_from_tasks,
+#                        study_plan_to_dict, ...) as "request;stage;... bytes"
+#   <id>.retained.folded tracemalloc snapshot at the end of the request:
+#                        bytes still alive per allocation traceback
+#   <id>.json            summary (timings, sample counts, stage peaks)
+#
+# The CPU sampler reads sys._current_frames() every PROFILE_INTERVAL_MS;
+# on the event-loop thread it also sees concurrent requests, so profile
+# under light load. tracemalloc is process-wide, so only one request is
+# memory-profiled at a time; others get CPU profiles only.
+
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Leaf frames of a thread that is waiting rather than running
+_IDLE_LEAVES = frozenset((
+    ("selectors.py", "select"), ("threading.py", "wait"), ("queue.py", "get"),
+    ("threading.py", "_wait_for_tstate_lock"), ("threading.py", "join"),
+))
+
+
+def _signature(secret: str, method: str, path: str, expires: int) -> str:
+    message = f"{expires}.{method.upper()} {path}".encode("utf-8")
+    return hmac.new(secret.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def sign_request(secret: str, method: str, path: str, ttl: int = 300) -> str:
+    """
+    X-Profile header value that profiles one METHOD path request (or
+    authorizes an /admin/profiling call) for the next ttl seconds.
+    """
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_signature(secret, method, path, expires)}"
+
+
+@dataclass
+class ProfileRule:
+    prefix: str
+    rate: float
+    remaining: int
+    cpu: bool = True
+    memory: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "prefix": self.prefix,
+            "rate": self.rate,
+            "remaining": self.remaining,
+            "cpu": self.cpu,
+            "memory": self.memory,
+        }
+
+
+@dataclass
+class _StageFrame:
+    path: Tuple[str, ...]
+    start: int
+    peak: int
+
+
+@dataclass
+class RequestProfile:
+    profile_id: str
+    method: str
+    path: str
+    cpu: bool
+    memory: bool
+    started: float = field(default_factory=time.perf_counter)
+    # threads that ran this request's code (sampled by the CPU profiler)
+    threads: set = field(default_factory=set)
+    samples: CountMap = field(default_factory=CountMap)
+    idle_samples: int = 0
+    stage_stack: List[_StageFrame] = field(default_factory=list)
+    # stage path -> [calls, max peak bytes, net bytes]
+    stage_peaks: Dict[Tuple[str, ...], List[int]] = field(default_factory=dict)
+    started_tracing: bool = False
+
+
+_current: "contextvars.ContextVar[Optional[RequestProfile]]" = contextvars.ContextVar("profile", default=None)
+
+
+def _frame_label(code, cache: Dict[Any, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        cwd = os.getcwd() + os.sep
+        short = filename[len(cwd):] if filename.startswith(cwd) else os.path.basename(filename)
+        label = cache[code] = f"{code.co_name} ({short}:{code.co_firstlineno})"
+    return label
+
+
+# =========================
+# CPU SAMPLER
+# =========================
+
+class _Sampler(threading.Thread):
+    """
+    Samples the stacks of profile.threads every interval seconds until
+    stopped.
+    """
+
+    def __init__(self, profile: RequestProfile, interval: float):
+        super().__init__(name=f"profiler-{profile.profile_id}", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        profile = self.profile
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(profile.threads):
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    profile.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                profile.samples[tuple(stack)] += 1
+            del frames
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+# =========================
+# PROFILER
+# =========================
+
+class Profiler:
+    """
+    Decides which requests to profile and runs their profiles. Also the
+    stage observer of app.logic.metrics: timed stages entered under a
+    memory profile record their tracemalloc peak.
+    """
+
+    def __init__(self):
+        self.secret: Optional[str] = None
+        self.directory = "profiles"
+        self.interval = 0.005
+        self.max_ttl = 3600
+        self.tracemalloc_frames = 10
+        self._rules: List[ProfileRule] = []
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._memory_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret)
+
+    def configure(
+        self,
+        secret: Optional[str],
+        directory: str = "profiles",
+        interval_ms: float = 5.0,
+        max_ttl: int = 3600,
+        tracemalloc_frames: int = 10,
+    ) -> None:
+        self.secret = secret or None
+        self.directory = directory
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.max_ttl = max_ttl
+        self.tracemalloc_frames = max(1, tracemalloc_frames)
+        metrics.set_stage_observer(self if self.secret else None)
+
+    # ---- authorization ----
+
+    def verify(self, header: Optional[str], method: str, path: str) -> bool:
+        """
+        True for an unexpired X-Profile value signed for METHOD path.
+        """
+        if not self.secret or not header:
+            return False
+        expires_text, _, signature = header.strip().partition(".")
+        try:
+            expires = int(expires_text)
+        except ValueError:
+            return False
+        now = time.time()
+        if expires < now or expires > now + self.max_ttl:
+            return False
+        return hmac.compare_digest(signature, _signature(self.secret, method, path, expires))
+
+    # ---- sampling rules ----
+
+    def set_rule(self, rule: ProfileRule) -> None:
+        with self._lock:
+            self._rules = [r for r in self._rules if r.prefix != rule.prefix] + [rule]
+
+    def clear_rules(self) -> None:
+        with self._lock:
+            self._rules = []
+
+    def rules(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [r.to_dict() for r in self._rules]
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._recent)
+
+    def _match_rule(self, path: str) -> Optional[ProfileRule]:
+        if not self._rules:
+            return None
+        with self._lock:
+            for rule in self._rules:
+                if path.startswith(rule.prefix) and rule.remaining > 0 and random.random() < rule.rate:
+                    rule.remaining -= 1
+                    if rule.remaining == 0:
+                        self._rules.remove(rule)
+                    return rule
+        return None
+
+    def select(self, method: str, path: str, header: Optional[str]) -> Optional[Tuple[bool, bool]]:
+        """
+        (cpu, memory) if this request should be profiled, else None.
+        """
+        if not self.secret:
+            return None
+        if header is not None and self.verify(header, method, path):
+            return True, True
+        rule = self._match_rule(path)
+        if rule is not None:
+            return rule.cpu, rule.memory
+        return None
+
+    # ---- one request ----
+
+    def start(self, method: str, path: str, cpu: bool, memory: bool) -> Tuple[RequestProfile, Optional[_Sampler], contextvars.Token]:
+        profile = RequestProfile(
+            profile_id=time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:8],
+            method=method,
+            path=path,
+            cpu=cpu,
+            memory=memory and self._memory_lock.acquire(blocking=False),
+        )
+        profile.threads.add(threading.get_ident())
+        if profile.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.tracemalloc_frames)
+                profile.started_tracing = True
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            profile.stage_stack.append(_StageFrame(path=(f"{method} {path}",), start=current, peak=current))
+        sampler = None
+        if cpu:
+            sampler = _Sampler(profile, self.interval)
+            sampler.start()
+        return profile, sampler, _current.set(profile)
+
+    def finish(self, profile: RequestProfile, sampler: Optional[_Sampler], token: contextvars.Token,
+               status: int) -> Dict[str, Any]:
+        _current.reset(token)
+        wall = time.perf_counter() - profile.started
+        if sampler is not None:
+            sampler.stop()
+        snapshot = None
+        if profile.memory:
+            root = profile.stage_stack[0]
+            self._close_stage(profile, root)
+            if profile.started_tracing:
+                snapshot = tracemalloc.take_snapshot().filter_traces((
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, __file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                ))
+                tracemalloc.stop()
+            self._memory_lock.release()
+
+        try:
+            summary = self._write(profile, wall, status, snapshot)
+        except OSError:
+            logger.exception("could not write profile %s", profile.profile_id)
+            summary = {"profile_id": profile.profile_id, "error": "write_failed"}
+        with self._lock:
+            self._recent.append(summary)
+        return summary
+
+    # ---- stage observer (see metrics.set_stage_observer) ----
+
+    def enter(self, name: str) -> Optional[Tuple[RequestProfile, _StageFrame]]:
+        profile = _current.get()
+        if profile is None:
+            return None
+        profile.threads.add(threading.get_ident())
+        if not profile.memory or not profile.stage_stack:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        parent = profile.stage_stack[-1]
+        parent.peak = max(parent.peak, peak)
+        # tracemalloc has one peak; it is folded into the parent first so
+        # resetting it for the child loses nothing
+        tracemalloc.reset_peak()
+        frame = _StageFrame(path=parent.path + (name,), start=current, peak=current)
+        profile.stage_stack.append(frame)
+        return profile, frame
+
+    def exit(self, token: Tuple[RequestProfile, _StageFrame]) -> None:
+        profile, frame = token
+        self._close_stage(profile, frame)
+        if profile.stage_stack:
+            parent = profile.stage_stack[-1]
+            parent.peak = max(parent.peak, frame.peak)
+
+    @staticmethod
+    def _close_stage(profile: RequestProfile, frame: _StageFrame) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        frame.peak = max(frame.peak, peak)
+        if profile.stage_stack and profile.stage_stack[-1] is frame:
+            profile.stage_stack.pop()
+        entry = profile.stage_peaks.setdefault(frame.path, [0, 0, 0])
+        entry[0] += 1
+        entry[1] = max(entry[1], frame.peak - frame.start)
+        entry[2] += current - frame.start
+
+    # ---- output ----
+
+    def _write(self, profile: RequestProfile, wall: float, status: int,
+               snapshot: Optional[tracemalloc.Snapshot]) -> Dict[str, Any]:
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, profile.profile_id)
+        summary: Dict[str, Any] = {
+            "profile_id": profile.profile_id,
+            "method": profile.method,
+            "path": profile.path,
+            "status": status,
+            "wall_ms": round(wall * 1000.0, 2),
+        }
+
+        if profile.cpu:
+            labels: Dict[Any, str] = {}
+            lines = [
+                ";".join(_frame_label(code, labels) for code in stack) + f" {count}"
+                for stack, count in profile.samples.most_common()
+            ]
+            _write_lines(base + ".cpu.folded", lines)
+            summary["cpu"] = {
+                "file": base + ".cpu.folded",
+                "interval_ms": self.interval * 1000.0,
+                "samples": sum(profile.samples.values()),
+                "idle_samples": profile.idle_samples,
+            }
+
+        if profile.memory:
+            stages = sorted(profile.stage_peaks.items(), key=lambda item: -item[1][1])
+            _write_lines(base + ".memory.folded", [
+                ";".join(path) + f" {peak}" for path, (_, peak, _) in stages if peak > 0
+            ])
+            summary["memory"] = {
+                "file": base + ".memory.folded",
+                "peak_bytes": stages[0][1][1] if stages else 0,
+                "stages": [
+                    {"stage": ";".join(path), "calls": calls, "peak_bytes": peak, "net_bytes": net}
+                    for path, (calls, peak, net) in stages
+                ],
+            }
+            if snapshot is not None:
+                _write_lines(base + ".retained.folded", _retained_lines(snapshot))
+                summary["memory"]["retained_file"] = base + ".retained.folded"
+
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def _retained_lines(snapshot: tracemalloc.Snapshot, limit: int = 2000) -> List[str]:
+    stacks: CountMap = CountMap()
+    for stat in snapshot.statistics("traceback"):
+        # oldest frame first, as folded stacks expect
+        frames = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+        stacks[";".join(frames)] += stat.size
+    return [f"{stack} {size}" for stack, size in stacks.most_common(limit)]
+
+
+def _write_lines(path: str, lines: List[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + ("\n" if lines else ""))
+
+
+# Process-wide profiler; disabled until init_profiling_from_env() finds
+# PROFILE_SECRET.
+profiler = Profiler()
+
+
+def init_profiling_from_env() -> None:
+    """
+    Configure profiler from the environment:
+      PROFILE_SECRET           HMAC key; unset = profiling off
+      PROFILE_DIR              output directory (default: profiles)
+      PROFILE_INTERVAL_MS      CPU sampling interval (default 5)
+      PROFILE_MAX_TTL          longest X-Profile validity, seconds (default 3600)
+      PROFILE_TRACEMALLOC_FRAMES  traceback depth for memory profiles (default 10)
+    """
+    profiler.configure(
+        secret=os.getenv("PROFILE_SECRET"),
+        directory=os.getenv("PROFILE_DIR", "profiles"),
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+        max_ttl=int(os.getenv("PROFILE_MAX_TTL", "3600")),
+        tracemalloc_frames=int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10")),
+    )
+
+
+# =========================
+# MIDDLEWARE
+# =========================
+
+class ProfilingMiddleware:
+    """
+    Profiles the requests profiler.select() picks; every other request
+    costs one attribute check while profiling is off.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path.startswith("/admin/"):
+            # there the header authorizes the admin call itself
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-profile":
+                header = value.decode("latin-1")
+                break
+        method = scope.get("method", "")
+        choice = profiler.select(method, path, header)
+        if choice is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile, sampler, token = profiler.start(method, path, *choice)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile.profile_id.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.finish(profile, sampler, token, status["code"])
@@ -1,8 +1,14 @@
 from enum import Enum
 from dataclasses import dataclass, field,asdict 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import date, timedelta
+import heapq
 import re
+from functools import lru_cache
+
+from app.logic.availability import AvailabilityCalendar, CapacityIndex
+from app.logic.fuzzy import FuzzyMatcher
+from app.logic.metrics import timed_stage
 
 
 
@@ -76,6 +82,13 @@ class StudyPlan:
 
 
 # NORMALIZERS
+#
+# Each normalizer tries, in order: the exact label, a close misspelling
+# of a whole label (FuzzyMatcher: BK-tree over the map's labels, a few
+# edits depending on length), a label inside the text, keyword stems, a
+# close misspelling of a phrase or word in the text, then the default.
+# Results are memoized per raw value, so mass imports of repeated labels
+# cost a dict lookup each.
 def _clean_text(value: str) -> str:
     text = value.strip().lower()
     text = re.sub(r"\s+", " ", text)
@@ -135,6 +148,10 @@ _DIFFICULTY_MAP: Dict[str, Difficulty] = {
 }
 
 
+_DIFFICULTY_FUZZY: FuzzyMatcher[Difficulty] = FuzzyMatcher(_DIFFICULTY_MAP)
+
+
+@lru_cache(maxsize=4096)
 def normalize_difficulty(value: str) -> Difficulty:
     if not value:
         return Difficulty.MEDIUM
@@ -144,6 +161,10 @@ def normalize_difficulty(value: str) -> Difficulty:
     if text in _DIFFICULTY_MAP:
         return _DIFFICULTY_MAP[text]
 
+    close = _DIFFICULTY_FUZZY.match(text)
+    if close is not None:
+        return close
+
     for key, enum_value in _DIFFICULTY_MAP.items():
         if key in text:
             return enum_value
@@ -153,6 +174,10 @@ def normalize_difficulty(value: str) -> Difficulty:
     if any(w in text for w in ["easy", "simple", "basic", "intro"]):
         return Difficulty.EASY
 
+    close = _DIFFICULTY_FUZZY.match_words(text)
+    if close is not None:
+        return close
+
     return Difficulty.MEDIUM
 
 
@@ -209,6 +234,10 @@ _WEIGHT_MAP: Dict[str, Weight] = {
 }
 
 
+_WEIGHT_FUZZY: FuzzyMatcher[Weight] = FuzzyMatcher(_WEIGHT_MAP)
+
+
+@lru_cache(maxsize=4096)
 def normalize_weight(value: str) -> Weight:
     if not value:
         return Weight.MEDIUM
@@ -218,6 +247,10 @@ def normalize_weight(value: str) -> Weight:
     if text in _WEIGHT_MAP:
         return _WEIGHT_MAP[text]
 
+    close = _WEIGHT_FUZZY.match(text)
+    if close is not None:
+        return close
+
     for key, enum_value in _WEIGHT_MAP.items():
         if key in text:
             return enum_value
@@ -227,6 +260,10 @@ def normalize_weight(value: str) -> Weight:
     if any(w in text for w in ["low", "minor", "optional", "extra", "filler"]):
         return Weight.LOW
 
+    close = _WEIGHT_FUZZY.match_words(text)
+    if close is not None:
+        return close
+
     return Weight.MEDIUM
 
 
@@ -281,6 +318,10 @@ _WEAKNESS_MAP: Dict[str, Weakness] = {
 }
 
 
+_WEAKNESS_FUZZY: FuzzyMatcher[Weakness] = FuzzyMatcher(_WEAKNESS_MAP)
+
+
+@lru_cache(maxsize=4096)
 def normalize_weakness(value: str) -> Weakness:
     if not value:
         return Weakness.MODERATE
@@ -290,6 +331,10 @@ def normalize_weakness(value: str) -> Weakness:
     if text in _WEAKNESS_MAP:
         return _WEAKNESS_MAP[text]
 
+    close = _WEAKNESS_FUZZY.match(text)
+    if close is not None:
+        return close
+
     for key, enum_value in _WEAKNESS_MAP.items():
         if key in text:
             return enum_value
@@ -299,9 +344,14 @@ def normalize_weakness(value: str) -> Weakness:
     if any(w in text for w in ["strong", "confident", "master", "comfortable"]):
         return Weakness.STRONG
 
+    close = _WEAKNESS_FUZZY.match_words(text)
+    if close is not None:
+        return close
+
     return Weakness.MODERATE
 
 #Building topics from raw payload
+@timed_stage("build_topics_from_payload")
 def build_topics_from_payload(payload: list[dict[str, Any]]) ->list[Topic]:
     topics: list[Topic]=[]
     for item in payload:
@@ -422,6 +472,7 @@ def generate_tasks_for_a_topic(topic: Topic) -> List[Task]:
         )
     return tasks
 
+@timed_stage("build_task_list")
 def build_task_list(topics: List[Topic]) -> List[Task]:
     all_tasks: List[Task] = []
     for topic in topics:
@@ -432,6 +483,7 @@ def build_task_list(topics: List[Topic]) -> List[Task]:
 
 
 #Trims less priority tasks when time is limited
+@timed_stage("trim_low_priority_tasks")
 def trim_low_priority_tasks(tasks: List[Task],total_available_hours: float) -> List[Task]:
     trimmed=[]
     used=0.0
@@ -445,75 +497,106 @@ def trim_low_priority_tasks(tasks: List[Task],total_available_hours: float) -> L
             continue
     return trimmed
     
+@timed_stage("schedule_from_tasks")
 def schedule_from_tasks(
     tasks: List[Task],
     start_date: date,
     exam_date: date,
     hours_per_day: float,
-    initial_status: PlanStatus
+    initial_status: PlanStatus,
+    reserved: Optional[Dict[date, List[Task]]] = None,
+    calendar: Optional[AvailabilityCalendar] = None,
 ) -> StudyPlan:
-    # Work on a local copy so we don't mutate the caller's list
-    tasks = [
-        Task(
-            topic_name=t.topic_name,
-            subject_name=t.subject_name,
-            task_type=t.task_type,
-            duration_hours=t.duration_hours,
-            priority_score=t.priority_score,
-        )
-        for t in tasks
-    ]
-
-    days: List[PlanDay] = []
-    current_date = start_date
+    # reserved: tasks pinned to specific days (due spaced-repetition
+    # reviews); they go first and the day's remaining hours get the rest.
+    # calendar: hours per date; defaults to hours_per_day every day.
+    reserved = reserved or {}
     days_left = (exam_date - start_date).days
 
     if days_left <= 0:
         days_left = 1  # last day
 
+    calendar = calendar or AvailabilityCalendar.uniform(hours_per_day)
+    index = calendar.index(start_date, start_date + timedelta(days=days_left), reserved)
+
+    # Tasks are laid end to end on the horizon's hour line and split at day
+    # ends. Leaving a day asks the index which day the next hour falls on
+    # (bisect), so blocked days are jumped over instead of walked.
+    prefix = index.prefix
+    total = index.total
+    placed: Dict[int, List[Task]] = {}
+    filled: Dict[int, float] = {}  # day index -> hours of new work
+    position = 0.0
+    day_index = index.day_index_at(position)
+    day_end = prefix[day_index + 1]
+    last_index = 0
     task_index = 0
     status = initial_status
 
-    for _ in range(days_left):
-        remaining_hours = hours_per_day
-        day_tasks: List[Task] = []
+    # The caller's tasks are never mutated; `remaining` is the unplaced
+    # part of the current one
+    remaining = tasks[0].duration_hours if tasks else 0.0
+    while task_index < len(tasks) and position < total - 1e-9:
+        current_task = tasks[task_index]
 
-        while remaining_hours > 0 and task_index < len(tasks):
-            current_task = tasks[task_index]
+        # 🔹 Skip tasks that are effectively zero duration
+        if remaining <= 1e-6:
+            task_index += 1
+            remaining = tasks[task_index].duration_hours if task_index < len(tasks) else 0.0
+            continue
 
-            # 🔹 Skip tasks that are effectively zero duration
-            if current_task.duration_hours <= 1e-6:
-                task_index += 1
-                continue
+        room = day_end - position
+        if room <= 1e-9:
+            day_index = index.day_index_at(day_end)
+            position = prefix[day_index]
+            day_end = prefix[day_index + 1]
+            continue
 
-            if current_task.duration_hours <= remaining_hours:
-                day_tasks.append(current_task)
-                remaining_hours -= current_task.duration_hours
-                task_index += 1
-            else:
-                part_task = Task(
-                    topic_name=current_task.topic_name,
-                    subject_name=current_task.subject_name,
-                    task_type=current_task.task_type,
-                    duration_hours=remaining_hours,
-                    priority_score=current_task.priority_score,
-                )
-                day_tasks.append(part_task)
-                current_task.duration_hours -= remaining_hours
-                remaining_hours = 0
+        duration = remaining if remaining <= room else room
+        day_tasks = placed.get(day_index)
+        if day_tasks is None:
+            day_tasks = placed[day_index] = []
+        day_tasks.append(
+            Task(
+                topic_name=current_task.topic_name,
+                subject_name=current_task.subject_name,
+                task_type=current_task.task_type,
+                duration_hours=duration,
+                priority_score=current_task.priority_score,
+            )
+        )
+        last_index = day_index
+        if remaining <= room:
+            position += remaining
+            filled[day_index] = position - prefix[day_index]
+            task_index += 1
+            remaining = tasks[task_index].duration_hours if task_index < len(tasks) else 0.0
+        else:
+            position = day_end
+            filled[day_index] = index.hours[day_index]
+            remaining -= room
 
-        used_hours = hours_per_day - remaining_hours
+    # Finish the last day holding reviews even if new work ran out earlier
+    for day in reserved:
+        offset = (day - start_date).days
+        if 0 <= offset < index.days:
+            last_index = max(last_index, offset)
+
+    days: List[PlanDay] = []
+    for day_index in range(last_index + 1):
+        current_date = index.date_at(day_index)
+        day_reserved = reserved.get(current_date, ())
         days.append(
             PlanDay(
                 date=current_date,
-                tasks=day_tasks,
-                total_hours=used_hours,
+                tasks=list(day_reserved) + placed.get(day_index, []),
+                total_hours=sum(t.duration_hours for t in day_reserved) + filled.get(day_index, 0.0),
             )
         )
-        current_date += timedelta(days=1)
 
-        if task_index >= len(tasks):
-            break
+    # skip trailing zero-duration tasks before deciding anything was left out
+    while task_index < len(tasks) and tasks[task_index].duration_hours <= 1e-6:
+        task_index += 1
 
     # if we still have tasks left and status wasn't compressed, mark as high_yield_only
     if task_index < len(tasks) and status == PlanStatus.REALISTIC:
@@ -531,9 +614,11 @@ def schedule_from_tasks(
 def generate_last_minute_plan(topics: List[Topic],
                               start_date:date,
                               exam_date:date,
-                              hours_per_day:float)->StudyPlan:
-    tasks=build_task_list(topics)
-    if not tasks:
+                              hours_per_day:float,
+                              reserved: Optional[Dict[date, List[Task]]] = None,
+                              calendar: Optional[AvailabilityCalendar] = None)->StudyPlan:
+    tasks=_without_reviewed_revision(build_task_list(topics), reserved)
+    if not tasks and not reserved:
         return StudyPlan(
             days=[],
             start_date=start_date,
@@ -547,30 +632,45 @@ def generate_last_minute_plan(topics: List[Topic],
     top_count=max(1,int(len(tasks)*0.3))
     tasks=tasks[:top_count]
     days_left=max(1,(exam_date-start_date).days)
-    total_available_hours=days_left*hours_per_day
+    calendar=calendar or AvailabilityCalendar.uniform(hours_per_day)
+    total_available_hours=calendar.index(start_date, start_date+timedelta(days=days_left), reserved).total
     tasks=trim_low_priority_tasks(tasks,total_available_hours)
     return schedule_from_tasks(
         tasks=tasks,
         start_date=start_date,
         exam_date=exam_date,
         hours_per_day=hours_per_day,
-        initial_status=PlanStatus.LAST_MINUTE
+        initial_status=PlanStatus.LAST_MINUTE,
+        reserved=reserved,
+        calendar=calendar,
     )
 
 def generate_study_plan(topics:List[Topic],
                         start_date:date,
                         exam_date:date,
                         hours_per_day:float,
+                        reserved: Optional[Dict[date, List[Task]]] = None,
+                        calendar: Optional[AvailabilityCalendar] = None,
                         )->StudyPlan:
+    """
+    reserved: per-day tasks placed before anything else, e.g.
+    app.logic.spaced_repetition.review_tasks_by_day(); topics with reviews
+    there lose their fixed revision slice.
+    calendar: per-date study hours (app.logic.availability); without one
+    every day gets hours_per_day.
+    """
     days_left=(exam_date-start_date).days
     if days_left<=0:
         return generate_last_minute_plan(topics=topics,
                                    start_date=start_date,
                                    exam_date=exam_date,
-                                   hours_per_day=hours_per_day)
-    tasks=build_task_list(topics)
+                                   hours_per_day=hours_per_day,
+                                   reserved=reserved,
+                                   calendar=calendar)
+    tasks=_without_reviewed_revision(build_task_list(topics), reserved)
     total_required_hours=sum(t.duration_hours for t in tasks)
-    total_available_hours=days_left*hours_per_day
+    calendar=calendar or AvailabilityCalendar.uniform(hours_per_day)
+    total_available_hours=calendar.index(start_date, exam_date, reserved).capacity_before(exam_date)
 
     if total_required_hours <= total_available_hours:
         status = PlanStatus.REALISTIC
@@ -583,9 +683,229 @@ def generate_study_plan(topics:List[Topic],
         start_date=start_date,
         exam_date=exam_date,
         hours_per_day=hours_per_day,
-        initial_status=status
+        initial_status=status,
+        reserved=reserved,
+        calendar=calendar,
+    )
+
+
+def _without_reviewed_revision(tasks: List[Task], reserved: Optional[Dict[date, List[Task]]]) -> List[Task]:
+    # Topics under spaced repetition get their revision from the due reviews
+    if not reserved:
+        return tasks
+    reviewed = {t.topic_name for day_tasks in reserved.values() for t in day_tasks}
+    return [t for t in tasks if not (t.task_type == TaskType.REVISION and t.topic_name in reviewed)]
+
+# ============ MULTI-EXAM SCHEDULING ============
+#
+# One shared calendar of study hours, one exam date per subject. A task's deadline is
+# the day index of its subject's exam: it must be scheduled on days
+# [0, deadline). Both passes are heap-based, O(tasks log tasks).
+
+# (deadline day index, task)
+DeadlineTask = Tuple[int, Task]
+
+
+def _deadline_index(start_date: date, exam_date: date) -> int:
+    # Exam today or already past -> one day, as in generate_last_minute_plan
+    return max(1, (exam_date - start_date).days)
+
+
+def _subject_key(subject_name: str) -> str:
+    return _clean_text(subject_name)
+
+
+@timed_stage("trim_tasks_per_deadline")
+def trim_tasks_per_deadline(items: List[DeadlineTask], capacity: CapacityIndex) -> List[DeadlineTask]:
+    """
+    Drop lowest-priority tasks until, for every deadline d, the work due by
+    d fits in the hours available on days [0, d). Windows are visited in deadline order with
+    a min-heap (by priority) of everything accepted so far, so an overfull
+    window sheds the least important work due by then, whichever subject it
+    belongs to. Returns the kept items in their original order.
+    """
+    order = sorted(range(len(items)), key=lambda i: items[i][0])
+    accepted: List[Tuple[float, int]] = []
+    dropped = set()
+    used = 0.0
+
+    i = 0
+    while i < len(order):
+        deadline = items[order[i]][0]
+        while i < len(order) and items[order[i]][0] == deadline:
+            index = order[i]
+            task = items[index][1]
+            if task.duration_hours > 0:
+                # equal priority: the later task (e.g. revision) goes first
+                heapq.heappush(accepted, (task.priority_score, -index))
+                used += task.duration_hours
+            else:
+                dropped.add(index)
+            i += 1
+
+        available = capacity.capacity_through(deadline)
+        while used > available + 1e-9 and accepted:
+            _, neg_index = heapq.heappop(accepted)
+            dropped.add(-neg_index)
+            used -= items[-neg_index][1].duration_hours
+
+    return [item for index, item in enumerate(items) if index not in dropped]
+
+
+@timed_stage("schedule_by_deadline")
+def schedule_by_deadline(
+    items: List[DeadlineTask],
+    start_date: date,
+    exam_date: date,
+    hours_per_day: float,
+    initial_status: PlanStatus,
+    calendar: Optional[AvailabilityCalendar] = None,
+) -> StudyPlan:
+    """
+    Earliest-deadline-first packing into each day's hours, highest priority
+    first among equal deadlines; tasks are split across days like
+    schedule_from_tasks does. After trim_tasks_per_deadline every task
+    finishes before its subject's exam.
+    """
+    heap = [
+        (
+            deadline,
+            -task.priority_score,
+            seq,
+            Task(
+                topic_name=task.topic_name,
+                subject_name=task.subject_name,
+                task_type=task.task_type,
+                duration_hours=task.duration_hours,
+                priority_score=task.priority_score,
+            ),
+        )
+        for seq, (deadline, task) in enumerate(items)
+    ]
+    heapq.heapify(heap)
+
+    horizon = max([deadline for deadline, _ in items] + [_deadline_index(start_date, exam_date)])
+    capacity = (calendar or AvailabilityCalendar.uniform(hours_per_day)).index(
+        start_date, start_date + timedelta(days=horizon)
+    )
+
+    days: List[PlanDay] = []
+    current_date = start_date
+    status = initial_status
+
+    while heap and len(days) < capacity.days:
+        day_index = len(days)
+        day_hours = capacity.hours[day_index]
+        remaining_hours = day_hours
+        day_tasks: List[Task] = []
+
+        while remaining_hours > 1e-9 and heap:
+            deadline, _, _, current_task = heap[0]
+            if deadline <= day_index and status == PlanStatus.REALISTIC:
+                # Only reachable with untrimmed input; report it like
+                # schedule_from_tasks reports leftovers
+                status = PlanStatus.HIGH_YIELD_ONLY
+
+            if current_task.duration_hours <= 1e-6:
+                heapq.heappop(heap)
+                continue
+
+            if current_task.duration_hours <= remaining_hours + 1e-9:
+                heapq.heappop(heap)
+                day_tasks.append(current_task)
+                remaining_hours -= current_task.duration_hours
+            else:
+                day_tasks.append(
+                    Task(
+                        topic_name=current_task.topic_name,
+                        subject_name=current_task.subject_name,
+                        task_type=current_task.task_type,
+                        duration_hours=remaining_hours,
+                        priority_score=current_task.priority_score,
+                    )
+                )
+                current_task.duration_hours -= remaining_hours
+                remaining_hours = 0
+
+        days.append(
+            PlanDay(
+                date=current_date,
+                tasks=day_tasks,
+                total_hours=day_hours - max(0.0, remaining_hours),
+            )
+        )
+        current_date += timedelta(days=1)
+
+    if heap and status == PlanStatus.REALISTIC:
+        status = PlanStatus.HIGH_YIELD_ONLY
+
+    return StudyPlan(
+        days=days,
+        start_date=start_date,
+        exam_date=exam_date,
+        hours_per_day=hours_per_day,
+        status=status,
     )
 
+
+def generate_multi_exam_plan(
+    topics: List[Topic],
+    start_date: date,
+    exam_dates: Dict[str, date],
+    hours_per_day: float,
+    calendar: Optional[AvailabilityCalendar] = None,
+) -> StudyPlan:
+    """
+    One plan for several exams: exam_dates maps subject_name -> exam date
+    (matched case/space-insensitively). plan.exam_date is the last exam.
+    Raises ValueError when a subject has no exam date.
+    """
+    deadlines = {
+        _subject_key(subject): _deadline_index(start_date, exam_date)
+        for subject, exam_date in exam_dates.items()
+    }
+    # Resolve each distinct subject name once, not once per task
+    subject_deadline = {name: deadlines.get(_subject_key(name)) for name in {t.subject_name for t in topics}}
+    missing = sorted(name for name, deadline in subject_deadline.items() if deadline is None)
+    if missing:
+        raise ValueError(f"no exam date for subjects: {', '.join(missing)}")
+
+    last_exam = max(exam_dates.values()) if exam_dates else start_date
+    items = [(subject_deadline[t.subject_name], t) for t in build_task_list(topics)]
+    calendar = calendar or AvailabilityCalendar.uniform(hours_per_day)
+    horizon = max([deadline for deadline, _ in items] + [_deadline_index(start_date, last_exam)])
+    kept = trim_tasks_per_deadline(items, calendar.index(start_date, start_date + timedelta(days=horizon)))
+    status = PlanStatus.REALISTIC if len(kept) == len(items) else PlanStatus.COMPRESSED
+
+    return schedule_by_deadline(
+        items=kept,
+        start_date=start_date,
+        exam_date=last_exam,
+        hours_per_day=hours_per_day,
+        initial_status=status,
+        calendar=calendar,
+    )
+
+def summarize_subjects(plan: StudyPlan, exam_dates: Dict[str, date]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-subject scheduled hours and last study day of a multi-exam plan,
+    keyed like exam_dates.
+    """
+    summaries = {
+        subject: {"exam_date": exam_date.isoformat(), "scheduled_hours": 0.0, "last_study_day": None}
+        for subject, exam_date in exam_dates.items()
+    }
+    by_key = {_subject_key(subject): summary for subject, summary in summaries.items()}
+    for day in plan.days:
+        for task in day.tasks:
+            summary = by_key.get(_subject_key(task.subject_name))
+            if summary is not None:
+                summary["scheduled_hours"] += task.duration_hours
+                summary["last_study_day"] = day.date.isoformat()
+    for summary in summaries.values():
+        summary["scheduled_hours"] = round(summary["scheduled_hours"], 3)
+    return summaries
+
 # ============ SERIALIZATION HELPERS (for API / LLM / frontend) ============
 
 def _serialize_value(value: Any):
@@ -618,6 +938,7 @@ def _serialize_value(value: Any):
 def topic_to_dict(topic: Topic) -> Dict[str,Any]:
     return _serialize_value(topic)
 
+@timed_stage("study_plan_to_dict")
 def study_plan_to_dict(plan: StudyPlan) -> Dict[str, Any]:
     """
     Convert StudyPlan -> plain dict with only JSON-safe values:
@@ -625,3 +946,33 @@ def study_plan_to_dict(plan: StudyPlan) -> Dict[str, Any]:
     - dates as ISO strings
     """
     return _serialize_value(plan)
+
+
+def study_plan_from_dict(data: Dict[str, Any]) -> StudyPlan:
+    """
+    Inverse of study_plan_to_dict, for plans that come back as JSON
+    (client session_state, the plan store).
+    """
+    return StudyPlan(
+        days=[
+            PlanDay(
+                date=date.fromisoformat(str(day["date"])),
+                tasks=[
+                    Task(
+                        topic_name=t["topic_name"],
+                        subject_name=t.get("subject_name", ""),
+                        task_type=TaskType(t["task_type"]),
+                        duration_hours=float(t["duration_hours"]),
+                        priority_score=float(t.get("priority_score", 0.0)),
+                    )
+                    for t in day.get("tasks", [])
+                ],
+                total_hours=float(day.get("total_hours", 0.0)),
+            )
+            for day in data.get("days", [])
+        ],
+        start_date=date.fromisoformat(str(data["start_date"])),
+        exam_date=date.fromisoformat(str(data["exam_date"])),
+        hours_per_day=float(data["hours_per_day"]),
+        status=PlanStatus(data["status"]),
+    )
@@ -0,0 +1,319 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.logic.journal import SessionJournal, open_journal
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# EVENTS
+# =========================
+#
+# Every state-changing action on a server-side session is recorded as one
+# event. Events carry the *resulting* values (not the inputs), so replaying
+# them is idempotent and does not depend on wall-clock time.
+
+EVENT_TOPICS_UPDATED = "topics_updated"
+EVENT_PERFORMANCE_UPDATED = "performance_updated"
+EVENT_PLAN_GENERATED = "plan_generated"
+EVENT_REVIEW_UPDATED = "review_updated"
+
+
+def _new_session() -> Dict[str, Any]:
+    return {"topics": [], "practice_stats": {}}
+
+
+def _copy_state(value: Any) -> Any:
+    # dict()/list() copy a container in one step, so a state mutated by a
+    # request meanwhile can never change size under the copy
+    if isinstance(value, dict):
+        return {k: _copy_state(v) for k, v in dict(value).items()}
+    if isinstance(value, list):
+        return [_copy_state(v) for v in list(value)]
+    return value
+
+
+def apply_event(sessions: Dict[str, Dict[str, Any]], event: Dict[str, Any]) -> None:
+    session = sessions.setdefault(event["session_id"], _new_session())
+    kind = event.get("kind")
+    data = event.get("data") or {}
+
+    if kind == EVENT_TOPICS_UPDATED:
+        session["topics"] = data.get("topics") or []
+    elif kind == EVENT_PERFORMANCE_UPDATED:
+        stats = session.get("practice_stats")
+        if not isinstance(stats, dict):
+            stats = {}
+            session["practice_stats"] = stats
+        stats[data["topic_name"]] = data["performance"]
+    elif kind == EVENT_PLAN_GENERATED:
+        # Events carry the plan_id (the plan itself lives in
+        # app.logic.plan_store); older journals carry the full plan
+        session["plan"] = data.get("plan")
+        session["plan_id"] = data.get("plan_id")
+    elif kind == EVENT_REVIEW_UPDATED:
+        cards = session.get("review_cards")
+        if not isinstance(cards, dict):
+            cards = {}
+            session["review_cards"] = cards
+        card = data["card"]
+        cards[card["card_id"]] = card
+
+
+# =========================
+# PER-SESSION LOCKS
+# =========================
+
+class SessionLocks:
+    """
+    One asyncio.Lock per session_id, created on demand.
+
+    Locks are held in a WeakValueDictionary, so a session's lock only exists
+    while some request is holding or waiting on it. Requests for different
+    sessions never share a lock; requests for the same session (double
+    submit, two tabs) run their read-modify-write one after another.
+    """
+
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def __call__(self, session_id: str) -> asyncio.Lock:
+        # No await in here, so this is atomic with respect to the event loop.
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+# =========================
+# STORE
+# =========================
+
+class SessionStore:
+    """
+    Server-side session states keyed by session_id.
+
+    The dicts handed out by get()/attach() have the same shape as the
+    client-sent session_state ("topics", "practice_stats", "plan_id"), so the
+    mode functions can mutate them unchanged. Mutations become durable by
+    calling record(), which applies the event and appends it to the journal.
+    """
+
+    def __init__(
+        self,
+        journal: Optional[SessionJournal] = None,
+        compact_after_bytes: int = 64 * 1024 * 1024,
+    ):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._journal = journal
+        self._seq = 0
+        self._lock = threading.Lock()
+        # One compaction at a time (compactor thread or close())
+        self._compact_lock = threading.Lock()
+        self.compact_after_bytes = compact_after_bytes
+        self._compactor: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Set by record() when the journal outgrows compact_after_bytes
+        self._compact_requested = threading.Event()
+        # async with session_store.lock(session_id): ...
+        self.lock = SessionLocks()
+        self._listeners: List[Callable[[Optional[Dict[str, Any]]], None]] = []
+
+    def subscribe(self, listener: Callable[[Optional[Dict[str, Any]]], None]) -> None:
+        """
+        Call listener(event) after every recorded event, and listener(None)
+        when load() replaces all sessions. Listeners run on the recording
+        thread, outside the store lock, and must be quick.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event: Optional[Dict[str, Any]]) -> None:
+        for listener in self._listeners:
+            listener(event)
+
+    def attach_journal(self, journal: Optional[SessionJournal]) -> None:
+        self._journal = journal
+
+    def load(self) -> int:
+        """
+        Restore sessions from snapshot + journal tail. Returns session count.
+        """
+        if self._journal is None:
+            return len(self._sessions)
+        sessions, last_seq = self._journal.replay(apply_event)
+        with self._lock:
+            self._sessions = sessions
+            self._seq = last_seq
+        self._notify(None)
+        return len(sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        (session_id, state) pairs at this moment; the states are live.
+        """
+        with self._lock:
+            return list(self._sessions.items())
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            with self._lock:
+                session = self._sessions.setdefault(session_id, _new_session())
+        return session
+
+    def attach(
+        self,
+        session_id: str,
+        client_state: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Return the server-side state for session_id. If the client sent a
+        topic list that differs from the stored one, it is recorded as a
+        topic edit first.
+        """
+        session = self.get(session_id)
+        topics = (client_state or {}).get("topics")
+        if isinstance(topics, list) and topics and topics != session.get("topics"):
+            self.record(session_id, EVENT_TOPICS_UPDATED, {"topics": topics})
+        return session
+
+    def record(self, session_id: str, kind: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._seq += 1
+            event = {
+                "seq": self._seq,
+                "session_id": session_id,
+                "kind": kind,
+                "data": data,
+            }
+            apply_event(self._sessions, event)
+            if self._journal is not None:
+                self._journal.append(event)
+        self._notify(event)
+
+        if self._journal is not None and self._journal.size_bytes() >= self.compact_after_bytes:
+            # Only wakes the compactor thread: record() runs on the event loop
+            self._compact_requested.set()
+
+    # ---- convenience recorders ----
+
+    def record_performance(self, session_id: str, performance: Dict[str, Any]) -> None:
+        self.record(
+            session_id,
+            EVENT_PERFORMANCE_UPDATED,
+            {"topic_name": performance["topic_name"], "performance": performance},
+        )
+
+    def record_review(self, session_id: str, card: Dict[str, Any]) -> None:
+        self.record(session_id, EVENT_REVIEW_UPDATED, {"card": card})
+
+    def record_practice_result(self, session_id: str, result: Dict[str, Any]) -> None:
+        """
+        Journal what an update_performance result changed: the topic's
+        practice stats and its spaced-repetition card.
+        """
+        if not result.get("ok"):
+            return
+        if "updated" in result:
+            self.record_performance(session_id, result["updated"])
+        if "review" in result:
+            self.record_review(session_id, result["review"])
+
+    def record_plan(self, session_id: str, plan_id: str) -> None:
+        self.record(session_id, EVENT_PLAN_GENERATED, {"plan_id": plan_id})
+
+    def record_topics(self, session_id: str, topics: List[Dict[str, Any]]) -> None:
+        self.record(session_id, EVENT_TOPICS_UPDATED, {"topics": topics})
+
+    # ---- compaction ----
+
+    def compact(self) -> None:
+        """
+        Snapshot all sessions and drop the journal entries it covers. The
+        store lock is only held to read the last seq, the journal size and
+        the session list, so record() is not stalled by encoding or fsync;
+        each state is copied before it is encoded. Blocking: runs on the
+        compactor thread (or at close()), never from a request.
+        """
+        if self._journal is None:
+            return
+        with self._compact_lock:
+            with self._lock:
+                last_seq = self._seq
+                covered_bytes = self._journal.size_bytes()
+                sessions = list(self._sessions.items())
+            self._journal.write_snapshot(
+                ((session_id, _copy_state(state)) for session_id, state in sessions),
+                last_seq,
+                covered_bytes,
+            )
+
+    def start_compactor(self, interval_seconds: float) -> None:
+        """
+        Compact every interval_seconds, and as soon as record() finds the
+        journal past compact_after_bytes.
+        """
+        if self._journal is None or self._compactor is not None:
+            return
+
+        def _run() -> None:
+            while True:
+                self._compact_requested.wait(interval_seconds)
+                self._compact_requested.clear()
+                if self._stop.is_set():
+                    return
+                try:
+                    if self._journal.size_bytes() > 0:
+                        self.compact()
+                except Exception:
+                    # Keep compacting on the next tick; the journal still
+                    # holds everything meanwhile
+                    logger.exception("session compaction failed")
+
+        self._stop.clear()
+        self._compactor = threading.Thread(target=_run, name="session-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._compact_requested.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+            self._compactor = None
+        if self._journal is not None:
+            self.compact()
+            self._journal.close()
+
+
+# Process-wide store used by the routers.
+session_store = SessionStore()
+
+
+def init_session_store_from_env() -> int:
+    """
+    Configure session_store from the environment and restore it:
+      SESSION_DATA_DIR          directory for journal + snapshot (unset = memory only)
+      SESSION_JOURNAL_FSYNC     "1" to fsync every append
+      SESSION_COMPACT_SECONDS   snapshot interval for the background compactor
+    """
+    data_dir = os.getenv("SESSION_DATA_DIR")
+    fsync = os.getenv("SESSION_JOURNAL_FSYNC", "0") == "1"
+    session_store.attach_journal(open_journal(data_dir, fsync=fsync))
+    restored = session_store.load()
+    session_store.start_compactor(float(os.getenv("SESSION_COMPACT_SECONDS", "300")))
+    return restored
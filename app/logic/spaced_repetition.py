@@ -0,0 +1,277 @@
+import heapq
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.logic.availability import AvailabilityCalendar
+from app.logic.scheduler import Task, TaskType
+
+
+# =========================
+# CONFIG
+# =========================
+#
+# SM-2 scheduling (Wozniak 1990) with grades derived from practice answers.
+# Cards live in session_state["review_cards"] as plain JSON-able dicts keyed
+# by card_id (the topic name unless the client sends its own card_id), so
+# they are journaled and restored like the rest of the session.
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 3650
+
+# Card fields one review changes; saved as the card's "before_review" so a
+# second answer on the same day can redo that review instead of stacking
+# another one
+_SCHEDULE_FIELDS = ("ease", "interval_days", "repetitions", "lapses", "reviews", "due")
+
+# Plan time reserved per due card
+REVIEW_MINUTES_PER_CARD = float(os.getenv("SR_REVIEW_MINUTES", "5"))
+
+# Due reviews are never trimmed in favour of new material
+REVIEW_PRIORITY = 1.0
+
+
+def today_utc() -> date:
+    return datetime.utcnow().date()
+
+
+# =========================
+# SM-2
+# =========================
+
+def grade_from_answer(was_correct: bool, difficulty: Optional[str] = None) -> int:
+    """
+    SM-2 grade (0-5) from one practice answer. A correct answer to a harder
+    question is stronger evidence of recall.
+    """
+    if not was_correct:
+        return 1
+    return {"easy": 3, "hard": 5}.get((difficulty or "").strip().lower(), 4)
+
+
+def new_card(card_id: str, topic_name: str, today: date) -> Dict[str, Any]:
+    return {
+        "card_id": card_id,
+        "topic_name": topic_name,
+        "ease": DEFAULT_EASE,
+        "interval_days": 0,
+        "repetitions": 0,
+        "lapses": 0,
+        "reviews": 0,
+        "due": today.isoformat(),
+        "last_review": None,
+        "last_grade": None,
+    }
+
+
+def sm2_next(card: Dict[str, Any], grade: int, today: date) -> Dict[str, Any]:
+    """
+    Return the card after one review with grade 0-5 (a new dict).
+    """
+    ease = float(card.get("ease", DEFAULT_EASE))
+    interval = int(card.get("interval_days", 0))
+    repetitions = int(card.get("repetitions", 0))
+    lapses = int(card.get("lapses", 0))
+
+    if grade >= 3:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = min(MAX_INTERVAL_DAYS, max(1, round(interval * ease)))
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1
+        lapses += 1
+
+    ease = max(MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    return {
+        **card,
+        "ease": round(ease, 4),
+        "interval_days": interval,
+        "repetitions": repetitions,
+        "lapses": lapses,
+        "reviews": int(card.get("reviews", 0)) + 1,
+        "due": (today + timedelta(days=interval)).isoformat(),
+        "last_review": today.isoformat(),
+    }
+
+
+# =========================
+# DUE QUEUE
+# =========================
+
+class ReviewDeck(dict):
+    """
+    card_id -> card dict, plus a min-heap of (due ordinal, seq, card_id).
+
+    Writes go through __setitem__ and push a fresh heap entry (O(log n));
+    superseded entries are skipped lazily and the heap is rebuilt once they
+    outnumber live cards. Still a dict, so it serializes like the plain
+    dict it replaces in session_state. Use item assignment only: update()
+    and setdefault() bypass the index.
+    """
+
+    def __init__(self, cards: Optional[Dict[str, Dict[str, Any]]] = None):
+        super().__init__()
+        self._heap: List[Tuple[int, int, str]] = []
+        self._latest: Dict[str, int] = {}
+        self._seq = 0
+        self.total_reviews = 0
+        for card_id, card in (cards or {}).items():
+            dict.__setitem__(self, card_id, card)
+            self._seq += 1
+            self._latest[card_id] = self._seq
+            self._heap.append((date.fromisoformat(card["due"]).toordinal(), self._seq, card_id))
+            self.total_reviews += int(card.get("reviews", 0))
+        heapq.heapify(self._heap)
+
+    def __setitem__(self, card_id: str, card: Dict[str, Any]) -> None:
+        previous = self.get(card_id)
+        if previous is card:
+            return
+        if previous is not None:
+            self.total_reviews -= int(previous.get("reviews", 0))
+        dict.__setitem__(self, card_id, card)
+        self.total_reviews += int(card.get("reviews", 0))
+        self._seq += 1
+        self._latest[card_id] = self._seq
+        heapq.heappush(self._heap, (date.fromisoformat(card["due"]).toordinal(), self._seq, card_id))
+        if len(self._heap) > 2 * len(self) + 64:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._heap = [
+            (date.fromisoformat(card["due"]).toordinal(), self._latest[card_id], card_id)
+            for card_id, card in self.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def review(self, card_id: str, topic_name: str, grade: int, today: date) -> Dict[str, Any]:
+        """
+        Apply one graded answer. All answers on one day count as a single
+        review graded by the weakest of them: a second answer redoes the
+        day's review from the card as it was before it.
+        """
+        card = self.get(card_id) or new_card(card_id, topic_name, today)
+        before = card.get("before_review")
+        if card.get("last_review") == today.isoformat() and isinstance(before, dict):
+            if card.get("last_grade") is not None:
+                grade = min(grade, int(card["last_grade"]))
+            card = {**card, **before}
+        updated = sm2_next(card, grade, today)
+        updated["last_grade"] = grade
+        updated["before_review"] = {field: card.get(field) for field in _SCHEDULE_FIELDS}
+        self[card_id] = updated
+        return updated
+
+    def due(self, on_or_before: date, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Cards due on or before the given day, most overdue first.
+
+        Walks only heap nodes whose key is <= the day (children of a node
+        are never earlier), so finding the k due cards touches O(k) nodes
+        plus superseded entries, independent of deck size; ordering them
+        is O(k log k).
+        """
+        bound = on_or_before.toordinal()
+        heap = self._heap
+        found: List[Tuple[int, str]] = []
+        stack = [0] if heap else []
+        while stack:
+            i = stack.pop()
+            due, seq, card_id = heap[i]
+            if due > bound:
+                continue
+            if self._latest.get(card_id) == seq:
+                found.append((due, card_id))
+            left = 2 * i + 1
+            if left < len(heap):
+                stack.append(left)
+                if left + 1 < len(heap):
+                    stack.append(left + 1)
+        found.sort()
+        if limit is not None:
+            found = found[:limit]
+        return [self[card_id] for _, card_id in found]
+
+
+def session_deck(session_state: Dict[str, Any]) -> Optional[ReviewDeck]:
+    """
+    deck_for() if the session has any cards, else None.
+    """
+    return deck_for(session_state) if session_state.get("review_cards") else None
+
+
+def deck_for(session_state: Dict[str, Any]) -> ReviewDeck:
+    """
+    The session's ReviewDeck, indexing session_state["review_cards"] in
+    place on first use (O(n)); later calls reuse the same object.
+    """
+    cards = session_state.get("review_cards")
+    if isinstance(cards, ReviewDeck):
+        return cards
+    deck = ReviewDeck(cards if isinstance(cards, dict) else None)
+    session_state["review_cards"] = deck
+    return deck
+
+
+# =========================
+# PLAN INTEGRATION
+# =========================
+
+def review_tasks_by_day(
+    deck: ReviewDeck,
+    start_date: date,
+    end_date: date,
+    hours_per_day: float,
+    subjects: Optional[Dict[str, str]] = None,
+    calendar: Optional[AvailabilityCalendar] = None,
+) -> Dict[date, List[Task]]:
+    """
+    Revision tasks for every card due before end_date, one task per topic
+    per day. Overdue cards land on start_date. A day's reviews are capped at
+    its study hours (calendar, else hours_per_day); the excess moves to the
+    next day and the last day takes whatever is left. subjects maps
+    topic_name -> subject_name for the emitted tasks.
+    """
+    per_card = REVIEW_MINUTES_PER_CARD / 60.0
+    last_day = max(start_date, end_date - timedelta(days=1))
+    calendar = calendar or AvailabilityCalendar.uniform(hours_per_day)
+
+    def day_cap(day: date) -> int:
+        hours = calendar.hours_on(day)
+        return max(1, int(hours / per_card)) if per_card > 0 and hours > 0 else 0
+
+    # day -> topic -> card count, in due order
+    load: Dict[date, Dict[str, int]] = {}
+    day = start_date
+    used = 0
+    for card in deck.due(last_day):
+        card_day = max(start_date, date.fromisoformat(card["due"]))
+        if card_day > day:
+            day, used = card_day, 0
+        while used >= day_cap(day) and day < last_day:
+            day, used = day + timedelta(days=1), 0
+        topics = load.setdefault(day, {})
+        topics[card["topic_name"]] = topics.get(card["topic_name"], 0) + 1
+        used += 1
+
+    subjects = subjects or {}
+    return {
+        day: [
+            Task(
+                topic_name=topic_name,
+                subject_name=subjects.get(topic_name, ""),
+                task_type=TaskType.REVISION,
+                duration_hours=count * per_card,
+                priority_score=REVIEW_PRIORITY,
+            )
+            for topic_name, count in topics.items()
+        ]
+        for day, topics in load.items()
+    }
@@ -0,0 +1,213 @@
+import csv
+import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from app.logic.scheduler import Topic, build_topics_from_payload
+from app.logic.topic_store import STATUS_COMPLETE, STATUS_FAILED, TopicStore
+
+
+# =========================
+# STREAMING SYLLABUS IMPORT
+# =========================
+#
+# CSV (header row) or JSONL (one topic object per line) is read row by
+# row and handled chunk_size rows at a time:
+#
+#   parse       rows -> (line number, topic payload dict) or a row error
+#   normalize   build_topics_from_payload on the whole chunk; if any row
+#               fails, the chunk is redone row by row to pin the errors
+#               (optionally in a process pool)
+#   store       the chunk's topics are appended to the TopicStore
+#
+# At most chunk_size rows (times the chunks in flight in the pool) are in
+# memory at once. A bad row is reported and skipped; it never aborts the
+# import.
+
+FORMATS = ("csv", "jsonl")
+TOPIC_FIELDS = ("subject_name", "topic_name", "difficulty", "weight", "weakness", "progress", "base_hours")
+
+RowError = Dict[str, Any]        # {"line": int, "error": str}
+
+
+def _row_error(line: int, error: str) -> RowError:
+    return {"line": line, "error": error}
+
+
+def iter_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    (line number, row dict, None) per data row, or (line number, None,
+    error) for a row that cannot be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # e.g. a NUL byte or an oversized field; the reader goes on
+                # with the next line
+                yield reader.line_num, None, f"invalid CSV: {e}"
+                continue
+            if None in row:
+                yield reader.line_num, None, "too many columns"
+                continue
+            yield reader.line_num, row, None
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, row, None
+    else:
+        raise ValueError(f"unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+
+
+def _payload_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    # CSV cells are strings; empty ones mean "use the default"
+    payload = {
+        key: (value.strip() if isinstance(value, str) else value)
+        for key, value in row.items()
+        if key in TOPIC_FIELDS and value is not None and value != ""
+    }
+    for key in ("subject_name", "topic_name"):
+        if not str(payload.get(key, "")).strip():
+            raise ValueError(f"missing {key}")
+    return payload
+
+
+def normalized_topic(topic: Topic) -> Dict[str, Any]:
+    """
+    A Topic as a payload dict build_topics_from_payload accepts unchanged.
+    """
+    return {
+        "subject_name": topic.subject_name,
+        "topic_name": topic.name,
+        "difficulty": topic.difficulty.value,
+        "weight": topic.weight.value,
+        "weakness": topic.weakness.value,
+        "progress": topic.progress,
+        "base_hours": topic.base_hours,
+    }
+
+
+def normalize_chunk(rows: List[Tuple[int, Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[RowError]]:
+    """
+    Normalized topics and row errors for (line number, row) pairs, in order.
+    Top-level so a process pool can run it.
+    """
+    payloads: List[Tuple[int, Dict[str, Any]]] = []
+    errors: List[RowError] = []
+    for line, row in rows:
+        try:
+            payloads.append((line, _payload_from_row(row)))
+        except ValueError as e:
+            errors.append(_row_error(line, str(e)))
+
+    try:
+        topics = [normalized_topic(t) for t in build_topics_from_payload([p for _, p in payloads])]
+        return topics, errors
+    except (KeyError, TypeError, ValueError, AttributeError):
+        pass
+
+    topics = []
+    for line, payload in payloads:
+        try:
+            topics.extend(normalized_topic(t) for t in build_topics_from_payload([payload]))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            errors.append(_row_error(line, f"{type(e).__name__}: {e}"))
+    errors.sort(key=lambda err: err["line"])
+    return topics, errors
+
+
+def _chunks(stream: TextIO, fmt: str, chunk_size: int) -> Iterator[Tuple[List[Tuple[int, Dict[str, Any]]], List[RowError]]]:
+    rows = iter_rows(stream, fmt)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield (
+            [(line, row) for line, row, error in chunk if error is None],
+            [_row_error(line, error) for line, _, error in chunk if error is not None],
+        )
+
+
+def _normalized_chunks(
+    stream: TextIO, fmt: str, chunk_size: int, workers: int,
+) -> Iterator[Tuple[List[Dict[str, Any]], List[RowError]]]:
+    if workers <= 1:
+        for rows, parse_errors in _chunks(stream, fmt, chunk_size):
+            topics, errors = normalize_chunk(rows)
+            yield topics, sorted(parse_errors + errors, key=lambda err: err["line"])
+        return
+
+    # Results are consumed in submission order; at most 2 chunks per
+    # worker are in flight, which bounds memory.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: "deque[Tuple[Future, List[RowError]]]" = deque()
+        for rows, parse_errors in _chunks(stream, fmt, chunk_size):
+            pending.append((pool.submit(normalize_chunk, rows), parse_errors))
+            if len(pending) >= 2 * workers:
+                future, parse_errors = pending.popleft()
+                topics, errors = future.result()
+                yield topics, sorted(parse_errors + errors, key=lambda err: err["line"])
+        while pending:
+            future, parse_errors = pending.popleft()
+            topics, errors = future.result()
+            yield topics, sorted(parse_errors + errors, key=lambda err: err["line"])
+
+
+def import_topics(
+    stream: TextIO,
+    fmt: str,
+    store: TopicStore,
+    name: str = "",
+    chunk_size: int = 1000,
+    workers: int = 0,
+    max_errors: int = 100,
+) -> Dict[str, Any]:
+    """
+    Import a CSV/JSONL syllabus from a text stream into store. Returns
+    the syllabus_id, the imported / failed row counts and the first
+    max_errors row errors ({"line", "error"}).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+    chunk_size = max(1, chunk_size)
+
+    syllabus_id = store.begin(name)
+    imported = failed = 0
+    errors: List[RowError] = []
+    try:
+        for topics, chunk_errors in _normalized_chunks(stream, fmt, chunk_size, workers):
+            if topics:
+                store.append(syllabus_id, imported, topics)
+                imported += len(topics)
+            failed += len(chunk_errors)
+            errors.extend(chunk_errors[:max(0, max_errors - len(errors))])
+    except BaseException:
+        # Unreadable input (e.g. not UTF-8) stops the import; what was
+        # stored so far stays, marked failed
+        store.finish(syllabus_id, imported, failed, STATUS_FAILED)
+        raise
+    store.finish(syllabus_id, imported, failed, STATUS_COMPLETE)
+
+    return {
+        "syllabus_id": syllabus_id,
+        "name": name,
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# =========================
+# SYLLABI
+# =========================
+#
+# Imported syllabi (normalized topic lists) keyed by syllabus_id, in
+# sqlite. Topics are appended chunk by chunk as an import runs and read
+# back in pages, so neither side holds a whole syllabus in memory.
+#
+#   syllabi          syllabus_id, name, status, counts, timestamps
+#   syllabus_topics  (syllabus_id, position) -> topic payload JSON, in the
+#                    shape build_topics_from_payload accepts
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS syllabi (
+    syllabus_id TEXT PRIMARY KEY,
+    name        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    imported    INTEGER NOT NULL DEFAULT 0,
+    failed      INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    finished_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS syllabus_topics (
+    syllabus_id TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    body        TEXT NOT NULL,
+    PRIMARY KEY (syllabus_id, position)
+) WITHOUT ROWID;
+"""
+
+STATUS_IMPORTING = "importing"
+STATUS_COMPLETE = "complete"
+STATUS_FAILED = "failed"
+
+
+class TopicStore:
+    """
+    Normalized syllabi keyed by syllabus_id, in a sqlite file (path=None:
+    an in-memory database, gone on restart).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path: Optional[str] = None
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.attach_db(path)
+
+    def attach_db(self, path: Optional[str]) -> None:
+        """
+        Use the sqlite file at path from now on (None = memory only).
+        Syllabi in the previous database are not copied over.
+        """
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+            self.path = path
+            if path:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path or ":memory:", check_same_thread=False, isolation_level=None)
+            if path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    # ---- writing ----
+
+    def begin(self, name: str = "") -> str:
+        syllabus_id = "syl_" + uuid.uuid4().hex[:20]
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO syllabi (syllabus_id, name, status, created_at) VALUES (?, ?, ?, ?)",
+                (syllabus_id, name, STATUS_IMPORTING, time.time()),
+            )
+        return syllabus_id
+
+    def append(self, syllabus_id: str, start: int, topics: List[Dict[str, Any]]) -> None:
+        """
+        Store topics at positions start, start + 1, ... in one transaction.
+        """
+        rows = [
+            (syllabus_id, start + i, json.dumps(topic, separators=(",", ":"), ensure_ascii=False))
+            for i, topic in enumerate(topics)
+        ]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO syllabus_topics VALUES (?, ?, ?)", rows)
+            self._db.execute("COMMIT")
+
+    def finish(self, syllabus_id: str, imported: int, failed: int, status: str = STATUS_COMPLETE) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE syllabi SET status = ?, imported = ?, failed = ?, finished_at = ? WHERE syllabus_id = ?",
+                (status, imported, failed, time.time(), syllabus_id),
+            )
+
+    # ---- reading ----
+
+    def info(self, syllabus_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT name, status, imported, failed, created_at, finished_at FROM syllabi WHERE syllabus_id = ?",
+                (syllabus_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        name, status, imported, failed, created_at, finished_at = row
+        return {
+            "syllabus_id": syllabus_id,
+            "name": name,
+            "status": status,
+            "imported": imported,
+            "failed": failed,
+            "created_at": created_at,
+            "finished_at": finished_at,
+        }
+
+    def topics(self, syllabus_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT body FROM syllabus_topics WHERE syllabus_id = ? AND position >= ? ORDER BY position LIMIT ?",
+                (syllabus_id, offset, -1 if limit is None else limit),
+            ).fetchall()
+        return [json.loads(body) for (body,) in rows]
+
+    def iter_topics(self, syllabus_id: str, chunk_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Every topic of a syllabus in order, read chunk_size at a time.
+        """
+        offset = 0
+        while True:
+            page = self.topics(syllabus_id, offset, chunk_size)
+            yield from page
+            if len(page) < chunk_size:
+                return
+            offset += len(page)
+
+    @property
+    def closed(self) -> bool:
+        return self._db is None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Process-wide store used by the topics router; in-memory until
+# init_topic_store_from_env() runs.
+topic_store = TopicStore()
+
+
+def init_topic_store_from_env() -> None:
+    """
+    Configure topic_store from the environment:
+      TOPIC_STORE_PATH   sqlite file (default: topics.sqlite in
+                         SESSION_DATA_DIR; neither = memory only)
+    """
+    path = os.getenv("TOPIC_STORE_PATH")
+    if not path and os.getenv("SESSION_DATA_DIR"):
+        path = os.path.join(os.environ["SESSION_DATA_DIR"], "topics.sqlite")
+    if path != topic_store.path or topic_store.closed:
+        topic_store.attach_db(path)
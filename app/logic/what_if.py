@@ -0,0 +1,135 @@
+from bisect import bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from app.logic.availability import AvailabilityCalendar
+from app.logic.metrics import timed_stage
+from app.logic.scheduler import PlanStatus, Task, Topic, build_task_list
+
+
+# =========================
+# WHAT-IF SWEEP
+# =========================
+#
+# Status and coverage of generate_study_plan for every (hours_per_day,
+# exam_date) pair without building any plan. One build_task_list feeds
+# every cell:
+#
+#   available hours   prefix sums of the availability calendar, one
+#                     CapacityIndex per distinct hours_per_day
+#   status            required vs available, as generate_study_plan decides
+#   coverage          hours trim_low_priority_tasks would keep; its greedy
+#                     pass is replayed per cell from a prefix-sum bisect
+#                     (the run of tasks that all fit), then only the few
+#                     tasks small enough for the leftover slack are visited
+#
+# Cells agree with generate_study_plan without reserved reviews.
+
+MAX_WHAT_IF_AXIS = 64
+
+# generate_last_minute_plan keeps this share of tasks, highest priority first
+_LAST_MINUTE_SHARE = 0.3
+
+
+class _TrimIndex:
+    """
+    trim_low_priority_tasks(tasks, capacity) kept-hours for any capacity.
+    """
+
+    def __init__(self, tasks: List[Task]):
+        # Zero-length tasks are skipped by the trim pass too
+        self.durations = [t.duration_hours for t in tasks if t.duration_hours > 0]
+        self.prefix = list(accumulate(self.durations, initial=0.0))
+        suffix_min = [float("inf")] * (len(self.durations) + 1)
+        for i in range(len(self.durations) - 1, -1, -1):
+            suffix_min[i] = min(self.durations[i], suffix_min[i + 1])
+        self.suffix_min = suffix_min
+
+    def kept_hours(self, capacity: float) -> float:
+        # Tasks [0, k) all fit (same float sums as the greedy `used`)
+        k = bisect_right(self.prefix, capacity) - 1
+        used = self.prefix[k]
+        durations, suffix_min = self.durations, self.suffix_min
+        i = k + 1
+        while i < len(durations) and used + suffix_min[i] <= capacity:
+            if used + durations[i] <= capacity:
+                used += durations[i]
+            i += 1
+        return used
+
+
+@timed_stage("what_if_sweep")
+def what_if_sweep(
+    topics: List[Topic],
+    start_date: date,
+    hours_per_day: List[float],
+    exam_dates: List[date],
+    weekly: Optional[Dict[str, float]] = None,
+    exceptions: Optional[Dict[Any, float]] = None,
+) -> Dict[str, Any]:
+    """
+    Matrices indexed [hours_per_day index][exam_dates index]: status,
+    available hours and coverage (share of required hours the plan would
+    schedule). weekly/exceptions are an optional availability calendar,
+    as in the planner routes. Raises ValueError on bad input.
+    """
+    if not hours_per_day or not exam_dates:
+        raise ValueError("hours_per_day and exam_dates must not be empty")
+    if len(hours_per_day) > MAX_WHAT_IF_AXIS or len(exam_dates) > MAX_WHAT_IF_AXIS:
+        raise ValueError(f"at most {MAX_WHAT_IF_AXIS} values per axis")
+    if any(h <= 0 for h in hours_per_day):
+        raise ValueError("hours_per_day values must be greater than 0")
+
+    tasks = build_task_list(topics)
+    required = sum(t.duration_hours for t in tasks)
+    full = _TrimIndex(tasks)
+
+    # Last-minute cells (exam today or past) only consider the top tasks
+    last_minute_tasks = sorted(tasks, key=lambda t: t.priority_score, reverse=True)
+    last_minute = _TrimIndex(last_minute_tasks[:max(1, int(len(tasks) * _LAST_MINUTE_SHARE))])
+
+    days_left = [(exam - start_date).days for exam in exam_dates]
+    horizon = max([1] + days_left)
+
+    status: List[List[str]] = []
+    available: List[List[float]] = []
+    coverage: List[List[float]] = []
+    for hours in hours_per_day:
+        calendar = AvailabilityCalendar.from_payload(hours, weekly, exceptions)
+        capacity = calendar.index(start_date, start_date + timedelta(days=horizon))
+
+        status_row, available_row, coverage_row = [], [], []
+        for days in days_left:
+            if days <= 0:
+                cell_available = capacity.capacity_through(1)
+                cell_status = PlanStatus.LAST_MINUTE
+                kept = last_minute.kept_hours(cell_available) if tasks else 0.0
+            else:
+                cell_available = capacity.capacity_through(days)
+                if required <= cell_available:
+                    cell_status = PlanStatus.REALISTIC
+                    kept = required
+                else:
+                    cell_status = PlanStatus.COMPRESSED
+                    kept = full.kept_hours(cell_available)
+
+            status_row.append(cell_status.value)
+            available_row.append(round(cell_available, 3))
+            coverage_row.append(round(kept / required, 4) if required > 0 else 1.0)
+        status.append(status_row)
+        available.append(available_row)
+        coverage.append(coverage_row)
+
+    return {
+        "kind": "what_if",
+        "start_date": start_date.isoformat(),
+        "required_hours": round(required, 3),
+        "task_count": len(tasks),
+        "hours_per_day": list(hours_per_day),
+        "exam_dates": [exam.isoformat() for exam in exam_dates],
+        "days_left": days_left,
+        "status": status,
+        "available_hours": available,
+        "coverage": coverage,
+    }
@@ -1,25 +1,46 @@
 import os
-import google.generativeai as genai
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 # Import routers
-from app.routes import planner, scheduler, study_plan, teacher, practice, revision, exam
+from app.routes import planner, scheduler, study_plan, teacher, practice, revision, exam, cohort, topics, admin
+from app.logic.sessions import session_store, init_session_store_from_env
+from app.logic.plan_store import plan_store, init_plan_store_from_env
+from app.logic.topic_store import topic_store, init_topic_store_from_env
+from app.logic.metrics import install_metrics
+from app.logic.compression import CompressionMiddleware
+from app.logic.binary_codec import BinaryNegotiationMiddleware, schema_document
+from app.logic.profiling import ProfilingMiddleware, init_profiling_from_env
+from app.logic.logging_setup import configure_logging
 
+# GEMINI_API_KEY is read here, but the Gemini client itself is created lazily
+# by app.logic.llm.get_model() on the first LLM call.
 load_dotenv()
 
-# Configure API key
-gemini_api_key = os.getenv("GEMINI_API_KEY") or "YOUR_PLACEHOLDER_KEY"
-genai.configure(api_key=gemini_api_key)
+# Log records are formatted and written on a background thread
+configure_logging()
 
 
-model = genai.GenerativeModel('gemini-pro')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Restore server-side sessions (snapshot + journal tail) before serving
+    init_session_store_from_env()
+    init_plan_store_from_env()
+    init_topic_store_from_env()
+    init_profiling_from_env()
+    yield
+    session_store.close()
+    plan_store.close()
+    topic_store.close()
+
 
 app = FastAPI(
     title="AI Study Assistant API",
     description="Backend API for the AI Study Assistant, powered by Google Gemini Pro.",
     version="0.0.1",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -46,6 +67,16 @@ async def read_root():
 async def ping():
     return {"status": "ok"}
 
+@app.get("/binary_schema")
+async def binary_schema():
+    # Field / enum registry for application/msgpack bodies
+    return schema_document()
+
+install_metrics(app)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(BinaryNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 # Include routers
 app.include_router(planner.router, prefix="/study_plan", tags=["Planner"])
 app.include_router(scheduler.router, prefix="/scheduler", tags=["Scheduler"])
@@ -54,4 +85,7 @@ app.include_router(teacher.router, prefix="/teacher", tags=["Teacher Mode"])
 app.include_router(practice.router, prefix="/practice", tags=["Practice Mode"])
 app.include_router(revision.router, prefix="/revision", tags=["Revision Mode"])
 app.include_router(exam.router, prefix="/exam", tags=["Exam Strategy"])
+app.include_router(cohort.router, prefix="/cohort", tags=["Cohort Analytics"])
+app.include_router(topics.router, prefix="/topics", tags=["Syllabus Import"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from app.logic.llm_hedging import hedger
+from app.logic.profiling import ProfileRule, profiler
+
+router = APIRouter()
+
+class ProfileRuleRequest(BaseModel):
+    # Requests whose path starts with this are candidates
+    prefix: str = Field(..., min_length=1)
+    # Fraction of matching requests to profile
+    rate: float = Field(0.05, gt=0, le=1)
+    # Stop after this many profiles
+    limit: int = Field(20, ge=1, le=10000)
+    cpu: bool = True
+    memory: bool = False
+
+class HedgingRequest(BaseModel):
+    enabled: bool
+
+def require_signature(request: Request, x_profile: Optional[str] = Header(None)) -> None:
+    # Same signed X-Profile header as profiled requests, signed for this
+    # method and path
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="profiling disabled")
+    if not profiler.verify(x_profile, request.method, request.url.path):
+        raise HTTPException(status_code=403, detail="invalid or expired X-Profile signature")
+
+@router.get("/profiling", dependencies=[Depends(require_signature)])
+async def profiling_status():
+    """
+    Active sampling rules and the summaries of recent profiles.
+    """
+    return {
+        "directory": profiler.directory,
+        "interval_ms": profiler.interval * 1000.0,
+        "rules": profiler.rules(),
+        "recent": profiler.recent(),
+    }
+
+@router.post("/profiling", dependencies=[Depends(require_signature)])
+async def add_profiling_rule(request: ProfileRuleRequest):
+    """
+    Profile `rate` of the requests under `prefix`, `limit` times in total.
+    Replaces an existing rule for the same prefix.
+    """
+    profiler.set_rule(ProfileRule(
+        prefix=request.prefix,
+        rate=request.rate,
+        remaining=request.limit,
+        cpu=request.cpu,
+        memory=request.memory,
+    ))
+    return {"rules": profiler.rules()}
+
+@router.delete("/profiling", dependencies=[Depends(require_signature)])
+async def clear_profiling_rules():
+    profiler.clear_rules()
+    return {"rules": []}
+
+@router.get("/llm_hedging", dependencies=[Depends(require_signature)])
+async def llm_hedging_status():
+    """
+    Per-action model latency without (primary) and with (effective)
+    hedging, hedge delays, timeouts and the hedge budget.
+    """
+    return hedger.stats()
+
+@router.post("/llm_hedging", dependencies=[Depends(require_signature)])
+async def set_llm_hedging(request: HedgingRequest):
+    """
+    Turn hedging on or off. Calls waiting to hedge then keep waiting for
+    their first request only.
+    """
+    hedger.enabled = request.enabled
+    return hedger.stats()
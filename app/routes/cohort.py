@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.logic.cohort import cohort_analytics
+from app.logic.admission import LANE_CHEAP, admission
+
+router = APIRouter()
+
+class CohortRequest(BaseModel):
+    # Server-side session_ids making up the class; None = every session
+    session_ids: Optional[List[str]] = None
+    # Students whose percentile rank to return; None = the whole cohort
+    students: Optional[List[str]] = None
+    # Topics / students with fewer attempts are not ranked
+    min_attempts: int = Field(1, ge=1)
+    weakest_limit: int = Field(10, ge=0, le=500)
+
+@router.post("/analytics")
+async def cohort_analytics_view(request: CohortRequest):
+    """
+    Accuracy per topic, weakest topics cohort-wide and each student's
+    percentile rank, over the practice stats of server-side sessions.
+    """
+    async with admission(LANE_CHEAP):
+        # Ranking a large cohort takes a while; keep it off the event loop
+        return await run_in_threadpool(
+            cohort_analytics.summary,
+            session_ids=request.session_ids,
+            students=request.students,
+            min_attempts=request.min_attempts,
+            weakest_limit=request.weakest_limit,
+        )
@@ -1,32 +1,37 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
+
+from app.teacher.modes.exam import exam_llm_request
+from app.logic.llm import is_llm_request, llm_http_errors, run_llm_request
+from app.logic.admission import admission, lane_for
 
 router = APIRouter()
 
 class ExamRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    plan_id: Optional[str] = None # Stored plan: supplies topics, exam date and hours
+    # Run the built prompt (exam_notes) through the LLM and return its JSON
+    execute: bool = False
 
 @router.post("/")
 async def exam_action(request: ExamRequest):
     """
     Routes requests to the appropriate exam mode function.
     """
-    if request.action == "generate_exam_strategy":
-        # Placeholder implementation
-        return {
-            "recommended_order": ["Topic 1", "Topic 2"],
-            "time_allocations": [
-                {"topic": "Topic 1", "hours": 2.0},
-                {"topic": "Topic 2", "hours": 1.5}
-            ],
-            "high_yield_topics": ["Topic 1"],
-            "quick_revision_notes": [
-                "Focus on Topic 1 definitions.",
-                "Review Topic 2 formulas."
-            ]
-        }
-    
-    raise HTTPException(status_code=400, detail=f"Unknown action: {request.action}")
+    async with admission(lane_for("exam", request.action, request.execute)):
+        result = exam_llm_request(
+            action=request.action,
+            payload={**request.payload, "plan_id": request.plan_id} if request.plan_id else request.payload,
+            session_state=request.session_state
+        )
+
+        if result.get("error"):
+            raise HTTPException(status_code=400, detail=result.get("reason"))
+
+        if request.execute and is_llm_request(result):
+            with llm_http_errors():
+                return await run_llm_request(result)
+        return result
@@ -1,9 +1,17 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi import APIRouter, Depends, Header
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional
 from datetime import date
 
 from app.logic.scheduler import build_topics_from_payload, generate_study_plan, study_plan_to_dict
+from app.logic.sessions import session_store
+from app.logic.plan_store import plan_store
+from app.logic.what_if import MAX_WHAT_IF_AXIS, what_if_sweep
+from app.logic.http_cache import plan_etag, etag_matches, not_modified, json_response
+from app.logic.admission import LANE_CHEAP, lane_dependency
+from app.logic.spaced_repetition import review_tasks_by_day, session_deck
+from app.logic.availability import availability_extra, calendar_from_request
+from app.schemas import AvailabilityInput
 
 
 router = APIRouter()
@@ -13,28 +21,99 @@ class PlannerRequest(BaseModel):
     start_date: date
     exam_date: date
     hours_per_day: float
+    session_id: Optional[str] = None
+    availability: Optional[AvailabilityInput] = None
 
-@router.post("/generate_study_plan")
-async def generate_plan(request: PlannerRequest):
+@router.post("/generate_study_plan", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
+async def generate_plan(request: PlannerRequest, if_none_match: Optional[str] = Header(None)):
     """
     Generates a study plan based on a list of topics, a start date, an exam date, and the number of hours per day.
     """
     try:
+        # Due spaced-repetition reviews of a server-side session are part
+        # of the plan, so every review changes the ETag
+        deck = session_deck(session_store.get(request.session_id)) if request.session_id else None
+
+        # 0. Same inputs as the client's cached copy -> 304, no scheduling at all
+        extra = {"reviews": deck.total_reviews} if deck else {}
+        if request.availability:
+            extra["availability"] = availability_extra(request.availability)
+        etag = plan_etag(
+            request.topics,
+            request.start_date,
+            request.exam_date,
+            request.hours_per_day,
+            request.session_id,
+            extra=extra or None,
+        )
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
         # 1. Build topics from the payload
         topic_objects = build_topics_from_payload(request.topics)
+        calendar = calendar_from_request(request.hours_per_day, request.availability)
+        reserved = review_tasks_by_day(
+            deck,
+            request.start_date,
+            request.exam_date,
+            request.hours_per_day,
+            subjects={t.name: t.subject_name for t in topic_objects},
+            calendar=calendar,
+        ) if deck else None
 
         # 2. Generate the study plan
         study_plan = generate_study_plan(
             topics=topic_objects,
             start_date=request.start_date,
             exam_date=request.exam_date,
-            hours_per_day=request.hours_per_day
+            hours_per_day=request.hours_per_day,
+            reserved=reserved,
+            calendar=calendar,
         )
 
         # 3. Convert the StudyPlan to a JSON-serializable dictionary
         plan_dict = study_plan_to_dict(study_plan)
 
-        return plan_dict
+        # 4. Store the version (teacher/revision actions can then send just
+        #    plan_id) and point the server session at it
+        plan_dict["plan_id"] = plan_store.put(
+            plan_dict,
+            request.topics,
+            session_id=request.session_id,
+            parent_id=session_store.get(request.session_id).get("plan_id") if request.session_id else None,
+        )
+        if request.session_id:
+            session_store.attach(request.session_id, {"topics": request.topics})
+            session_store.record_plan(request.session_id, plan_dict["plan_id"])
+            plan_dict["parent_id"] = plan_store.parent(plan_dict["plan_id"])
+
+        return json_response(plan_dict, etag)
+
+    except Exception as e:
+        return {"error": True, "message": str(e)}
+
 
+class WhatIfRequest(BaseModel):
+    topics: List[Dict[str, Any]]
+    start_date: date
+    hours_per_day: List[float] = Field(..., min_length=1, max_length=MAX_WHAT_IF_AXIS)
+    exam_dates: List[date] = Field(..., min_length=1, max_length=MAX_WHAT_IF_AXIS)
+    availability: Optional[AvailabilityInput] = None
+
+@router.post("/what_if", dependencies=[Depends(lane_dependency(LANE_CHEAP))])
+async def what_if(request: WhatIfRequest):
+    """
+    Plan status and coverage for every hours_per_day x exam_date pair, without generating the plans.
+    """
+    try:
+        availability = request.availability.model_dump() if request.availability else {}
+        return what_if_sweep(
+            topics=build_topics_from_payload(request.topics),
+            start_date=request.start_date,
+            hours_per_day=request.hours_per_day,
+            exam_dates=request.exam_dates,
+            weekly=availability.get("weekly"),
+            exceptions=availability.get("exceptions"),
+        )
     except Exception as e:
         return {"error": True, "message": str(e)}
@@ -1,30 +1,286 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+import asyncio
+import json
+import time
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
-from app.teacher.modes.practice import practice_llm_request
+from app.teacher.modes.practice import practice_llm_request, grade_mcq_answer
 from app.logic.scheduler import build_topics_from_payload, Topic
+from app.logic.sessions import session_store
+from app.logic.llm import is_llm_request, llm_http_errors, run_llm_request
+from app.logic.metrics import WS_MESSAGE_LATENCY
+from app.logic.admission import LANES, LANE_LLM, admission, lane_for
 
 router = APIRouter()
 
 class PracticeRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    # When set, session_state lives on the server and is journaled
+    session_id: Optional[str] = None
+    # Run the built prompt through the LLM and return its JSON
+    execute: bool = False
 
 @router.post("/")
 async def practice_action(request: PracticeRequest):
     """
     Routes requests to the appropriate practice mode function.
     """
+    async with admission(lane_for("practice", request.action, request.execute)):
+        if not request.session_id:
+            llm_request = _run_practice_action(request, request.session_state)
+        else:
+            # Serialize read-modify-write on one server-side session; other
+            # sessions are not blocked.
+            async with session_store.lock(request.session_id):
+                session_state = session_store.attach(request.session_id, request.session_state)
+                llm_request = _run_practice_action(request, session_state)
+                session_store.record_practice_result(request.session_id, llm_request)
+
+        if request.execute and is_llm_request(llm_request):
+            with llm_http_errors():
+                return await run_llm_request(llm_request)
+        return llm_request
+
+
+def _run_practice_action(request: PracticeRequest, session_state: Dict[str, Any]) -> Dict[str, Any]:
     # practice_llm_request modifies session_state directly for practice_stats
     llm_request = practice_llm_request(
         action=request.action,
         payload=request.payload,
-        session_state=request.session_state
+        session_state=session_state
     )
 
     if llm_request.get("error"):
         raise HTTPException(status_code=400, detail=llm_request.get("reason"))
 
     return llm_request
+
+
+# =========================
+# WEBSOCKET PRACTICE SESSION
+# =========================
+#
+# One connection = one practice session. Session state (topics, practice
+# stats, generated questions, results) stays resident on the connection, so
+# frames carry only what changed:
+#
+#   -> {"type": "start", "session_id"?, "session_state"?, "payload": {topic_name, difficulty, num_questions}}
+#   <- {"type": "started", ...} then {"type": "question", "index": i, "question": {...}} per question
+#   -> {"type": "answer", "index": i, "answer": ...}
+#   <- {"type": "result", "index": i, "is_correct": bool, ..., "stats": {...}}
+#   -> {"type": "summary"}                  <- {"type": "summary", ...}
+#   -> {"type": "ping"}                     <- {"type": "pong"}
+#
+# Every reply carries "latency_ms": server time spent on the frame. A frame
+# that is not a JSON object, or has the wrong shape, gets
+# {"type": "error", "reason": ...} and the connection stays open. Each
+# question is graded once; answering it again is "already_answered".
+
+class _PracticeConnection:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.session_id: Optional[str] = None
+        self.session_state: Dict[str, Any] = {}
+        self.topic_name = ""
+        self.difficulty = "auto"
+        self.questions: List[Dict[str, Any]] = []
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.generation: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict[str, Any], started: Optional[float] = None) -> None:
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            message["latency_ms"] = round(elapsed * 1000, 3)
+            WS_MESSAGE_LATENCY.observe(elapsed, "/practice/ws", message.get("type", ""))
+        async with self._send_lock:
+            await self.websocket.send_json(message)
+
+    async def error(self, reason: str, started: float) -> None:
+        await self.send({"type": "error", "reason": reason}, started)
+
+    def _call(self, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return practice_llm_request(action=action, payload=payload, session_state=self.session_state)
+
+    async def _stop_generation(self) -> None:
+        # Awaited, so a cancelled generation cannot append to the next start
+        if self.generation is not None:
+            self.generation.cancel()
+            await asyncio.gather(self.generation, return_exceptions=True)
+            self.generation = None
+
+    async def _record_performance(self, was_correct: bool) -> Dict[str, Any]:
+        payload = {"topic_name": self.topic_name, "was_correct": was_correct, "difficulty": self.difficulty}
+        if not self.session_id:
+            return self._call("update_performance", payload).get("updated", {})
+        async with session_store.lock(self.session_id):
+            result = self._call("update_performance", payload)
+            session_store.record_practice_result(self.session_id, result)
+            return result.get("updated", {})
+
+    # ---- frames ----
+
+    async def on_start(self, message: Dict[str, Any], started: float) -> None:
+        payload = message.get("payload") or {}
+        client_state = message.get("session_state") or {}
+        session_id = message.get("session_id") or None
+        if not isinstance(payload, dict):
+            await self.error("invalid_payload", started)
+            return
+        if not isinstance(client_state, dict):
+            await self.error("invalid_session_state", started)
+            return
+        if session_id is not None and not isinstance(session_id, str):
+            await self.error("invalid_session_id", started)
+            return
+
+        await self._stop_generation()
+        payload = dict(payload)
+        self.session_id = session_id
+        if self.session_id:
+            self.session_state = session_store.attach(self.session_id, client_state)
+        else:
+            self.session_state = dict(client_state)
+
+        self.topic_name = payload.get("topic_name", "")
+        payload["count"] = payload.get("num_questions", payload.get("count", 5))
+        llm_request = self._call("generate_questions", payload)
+        if llm_request.get("error"):
+            await self.error(llm_request.get("reason", "invalid_start"), started)
+            return
+
+        self.difficulty = llm_request["metadata"].get("difficulty", "medium")
+        self.questions = []
+        self.results = {}
+        await self.send({
+            "type": "started",
+            "topic_name": self.topic_name,
+            "difficulty": self.difficulty,
+            "num_questions": llm_request["metadata"].get("count"),
+        }, started)
+
+        self.generation = asyncio.create_task(self._generate(llm_request, started))
+
+    async def _generate(self, llm_request: Dict[str, Any], started: float) -> None:
+        try:
+            async with LANES[LANE_LLM].slot():
+                generated = await run_llm_request(llm_request)
+        except Exception as e:
+            await self.error(f"question_generation_failed: {e}", started)
+            return
+
+        for question in generated.get("questions") or []:
+            question.setdefault("topic_name", self.topic_name)
+            self.questions.append(question)
+            public = {k: v for k, v in question.items() if k not in ("correct_answer", "explanation")}
+            await self.send({"type": "question", "index": len(self.questions) - 1, "question": public}, started)
+
+    async def on_answer(self, message: Dict[str, Any], started: float) -> None:
+        index = message.get("index")
+        if not isinstance(index, int) or not 0 <= index < len(self.questions):
+            await self.error("unknown_question_index", started)
+            return
+        if index in self.results:
+            # Double submit or client retry: stats and SM-2 move once
+            await self.error("already_answered", started)
+            return
+        if "answer" not in message:
+            await self.error("missing_user_answer", started)
+            return
+
+        question = self.questions[index]
+        user_answer = message["answer"]
+
+        is_correct = grade_mcq_answer(question, user_answer)
+        if is_correct is not None:
+            check = {
+                "is_correct": is_correct,
+                "correct_answer": question.get("correct_answer"),
+                "explanation": question.get("explanation", ""),
+                "feedback": "Correct." if is_correct else "Incorrect.",
+                "graded_by": "local",
+            }
+        else:
+            llm_request = self._call("check_answer", {"question": question, "user_answer": user_answer})
+            if llm_request.get("error"):
+                await self.error(llm_request.get("reason", "check_failed"), started)
+                return
+            try:
+                async with LANES[LANE_LLM].slot():
+                    checked = await run_llm_request(llm_request)
+            except Exception as e:
+                await self.error(f"answer_check_failed: {e}", started)
+                return
+            check = {
+                "is_correct": bool(checked.get("is_correct")),
+                "correct_answer": checked.get("correct_answer", question.get("correct_answer")),
+                "explanation": checked.get("explanation", ""),
+                "feedback": checked.get("feedback", ""),
+                "graded_by": "llm",
+            }
+
+        stats = await self._record_performance(check["is_correct"])
+        self.results[index] = check
+        await self.send({"type": "result", "index": index, **check, "stats": stats}, started)
+
+    async def on_summary(self, started: float) -> None:
+        correct = sum(1 for r in self.results.values() if r["is_correct"])
+        answered = len(self.results)
+        stats = self._call("topic_stats", {"topic_name": self.topic_name})
+        await self.send({
+            "type": "summary",
+            "topic_name": self.topic_name,
+            "num_questions": len(self.questions),
+            "answered": answered,
+            "correct": correct,
+            "accuracy": correct / answered if answered else 0.0,
+            "topic_stats": stats.get("stats"),
+        }, started)
+
+
+def _decode_frame(frame: Dict[str, Any]) -> Any:
+    # Text frames, or UTF-8 JSON in a binary frame; ValueError otherwise
+    text = frame.get("text")
+    if text is None:
+        text = (frame.get("bytes") or b"").decode("utf-8")
+    return json.loads(text)
+
+
+@router.websocket("/ws")
+async def practice_ws(websocket: WebSocket):
+    """
+    Interactive practice session over a single WebSocket connection.
+    """
+    await websocket.accept()
+    conn = _PracticeConnection(websocket)
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            started = time.perf_counter()
+            try:
+                message = _decode_frame(frame)
+            except ValueError:
+                await conn.error("invalid_json", started)
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            if kind == "start":
+                await conn.on_start(message, started)
+            elif kind == "answer":
+                await conn.on_answer(message, started)
+            elif kind == "summary":
+                await conn.on_summary(started)
+            elif kind == "ping":
+                await conn.send({"type": "pong"}, started)
+            else:
+                await conn.error(f"unknown_message_type: {kind}", started)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if conn.generation is not None:
+            conn.generation.cancel()
@@ -1,29 +1,52 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, List
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 
 from app.teacher.modes.revision import revision_llm_request
 from app.logic.scheduler import build_topics_from_payload, Topic
+from app.logic.sessions import session_store
+from app.logic.llm import is_llm_request, llm_http_errors, run_llm_request
+from app.logic.admission import admission, lane_for
 
 router = APIRouter()
 
 class RevisionRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    plan_id: Optional[str] = None # Stored plan (see /scheduler/plans) instead of a full plan in session_state
+    # When set, session_state lives on the server and is journaled
+    session_id: Optional[str] = None
+    # Run the built prompt through the LLM and return its JSON
+    execute: bool = False
 
 @router.post("/")
 async def revision_action(request: RevisionRequest):
     """
     Routes requests to the appropriate revision/exam mode function.
     """
-    llm_request = revision_llm_request(
-        action=request.action,
-        payload=request.payload,
-        session_state=request.session_state
-    )
+    async with admission(lane_for("revision", request.action, request.execute)):
+        payload = {**request.payload, "plan_id": request.plan_id} if request.plan_id else request.payload
+        if not request.session_id:
+            llm_request = revision_llm_request(
+                action=request.action,
+                payload=payload,
+                session_state=request.session_state
+            )
+        else:
+            async with session_store.lock(request.session_id):
+                session_state = session_store.attach(request.session_id, request.session_state)
+                llm_request = revision_llm_request(
+                    action=request.action,
+                    payload=payload,
+                    session_state=session_state,
+                    session_id=request.session_id
+                )
 
-    if llm_request.get("error"):
-        raise HTTPException(status_code=400, detail=llm_request.get("reason"))
+        if llm_request.get("error"):
+            raise HTTPException(status_code=400, detail=llm_request.get("reason"))
 
-    return llm_request
+        if request.execute and is_llm_request(llm_request):
+            with llm_http_errors():
+                return await run_llm_request(llm_request)
+        return llm_request
@@ -1,24 +1,156 @@
-from fastapi import APIRouter
-from app.schemas import PlannerRequest, StudyPlanResponse
-from app.logic.scheduler import build_topics_from_payload, generate_study_plan, study_plan_to_dict
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.schemas import PlannerRequest, StudyPlanResponse, MultiExamPlannerRequest, MultiExamPlanResponse
+from app.logic.scheduler import (
+    build_topics_from_payload,
+    generate_study_plan,
+    generate_multi_exam_plan,
+    summarize_subjects,
+    study_plan_to_dict,
+)
+from app.logic.sessions import session_store
+from app.logic.plan_store import plan_store
+from app.logic.http_cache import plan_etag, etag_matches, not_modified, json_response
+from app.logic.admission import LANE_CHEAP, lane_dependency
+from app.logic.spaced_repetition import review_tasks_by_day, session_deck
+from app.logic.availability import availability_extra, calendar_from_request
 from datetime import date
+from typing import Optional
 
 router = APIRouter()
 
-@router.post("/scheduler/", response_model=StudyPlanResponse)
-def create_study_plan(request: PlannerRequest):
+@router.post(
+    "/scheduler/",
+    response_model=StudyPlanResponse,
+    dependencies=[Depends(lane_dependency(LANE_CHEAP))],
+)
+def create_study_plan(request: PlannerRequest, if_none_match: Optional[str] = Header(None)):
     """
     Generate a study plan based on a list of topics and a date range.
     """
     topics_payload = [topic.model_dump() for topic in request.topics]
+    # Due reviews of a server-side session go into the plan (and its ETag)
+    deck = session_deck(session_store.get(request.session_id)) if request.session_id else None
+
+    extra = {"reviews": deck.total_reviews} if deck else {}
+    if request.availability:
+        extra["availability"] = availability_extra(request.availability)
+    etag = plan_etag(
+        topics_payload,
+        request.start_date,
+        request.exam_date,
+        request.hours_per_day,
+        request.session_id,
+        extra=extra or None,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    try:
+        calendar = calendar_from_request(request.hours_per_day, request.availability)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     topics = build_topics_from_payload(topics_payload)
+    reserved = review_tasks_by_day(
+        deck,
+        request.start_date,
+        request.exam_date,
+        request.hours_per_day,
+        subjects={t.name: t.subject_name for t in topics},
+        calendar=calendar,
+    ) if deck else None
     
     study_plan = generate_study_plan(
         topics=topics,
         start_date=request.start_date,
         exam_date=request.exam_date,
-        hours_per_day=request.hours_per_day
+        hours_per_day=request.hours_per_day,
+        reserved=reserved,
+        calendar=calendar,
     )
     
-    return study_plan_to_dict(study_plan)
+    plan_dict = study_plan_to_dict(study_plan)
+    plan_dict["plan_id"] = plan_store.put(
+        plan_dict,
+        topics_payload,
+        session_id=request.session_id,
+        parent_id=session_store.get(request.session_id).get("plan_id") if request.session_id else None,
+    )
+
+    if request.session_id:
+        session_store.attach(request.session_id, {"topics": topics_payload})
+        session_store.record_plan(request.session_id, plan_dict["plan_id"])
+        plan_dict["parent_id"] = plan_store.parent(plan_dict["plan_id"])
+
+    return json_response(plan_dict, etag)
+
+
+@router.post(
+    "/multi_exam",
+    response_model=MultiExamPlanResponse,
+    dependencies=[Depends(lane_dependency(LANE_CHEAP))],
+)
+def create_multi_exam_plan(request: MultiExamPlannerRequest, if_none_match: Optional[str] = Header(None)):
+    """
+    One study plan for several exams (one date per subject) sharing the
+    same study hours. Each subject's tasks finish before its exam.
+    """
+    if not request.exam_dates:
+        raise HTTPException(status_code=400, detail="exam_dates must not be empty.")
+
+    topics_payload = [topic.model_dump() for topic in request.topics]
+    last_exam = max(request.exam_dates.values())
+
+    etag = plan_etag(
+        topics_payload,
+        request.start_date,
+        last_exam,
+        request.hours_per_day,
+        request.session_id,
+        extra={
+            "exam_dates": request.exam_dates,
+            "availability": availability_extra(request.availability),
+        },
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    try:
+        study_plan = generate_multi_exam_plan(
+            topics=build_topics_from_payload(topics_payload),
+            start_date=request.start_date,
+            exam_dates=request.exam_dates,
+            hours_per_day=request.hours_per_day,
+            calendar=calendar_from_request(request.hours_per_day, request.availability),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    plan_dict = study_plan_to_dict(study_plan)
+    plan_dict["subjects"] = summarize_subjects(study_plan, request.exam_dates)
+    plan_dict["plan_id"] = plan_store.put(
+        plan_dict,
+        topics_payload,
+        session_id=request.session_id,
+        parent_id=session_store.get(request.session_id).get("plan_id") if request.session_id else None,
+    )
+
+    if request.session_id:
+        session_store.attach(request.session_id, {"topics": topics_payload})
+        session_store.record_plan(request.session_id, plan_dict["plan_id"])
+        plan_dict["parent_id"] = plan_store.parent(plan_dict["plan_id"])
+
+    return json_response(plan_dict, etag)
+
+
+
+@router.get("/plans/{plan_id}", response_model=StudyPlanResponse)
+def get_stored_plan(plan_id: str):
+    """
+    A stored plan version by plan_id (any planner route returns one).
+    parent_id is the session's previous plan, if any.
+    """
+    plan = plan_store.get(plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"plan_not_found: {plan_id}")
+    return plan
@@ -1,12 +1,11 @@
 from fastapi import APIRouter, HTTPException
 from app.schemas import StudyPlanRequest, StudyPlanResponse
 from app.logic.scheduler import generate_study_plan, build_topics_from_payload, study_plan_to_dict
+from app.logic.logging_setup import route_logger
 from datetime import date
-import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Sampled, lazily formatted logging (see app.logic.logging_setup)
+log = route_logger(__name__, "/study_plan/generate_study_plan")
 
 router = APIRouter()
 
@@ -16,7 +15,13 @@ def generate_plan(request: StudyPlanRequest):
     Generates a study plan based on user-provided topics, dates, and study hours.
     """
     try:
-        logger.info(f"Received request to generate study plan: {request}")
+        log.info(
+            "study_plan_request",
+            topics=len(request.topics),
+            start_date=request.start_date,
+            exam_date=request.exam_date,
+            hours_per_day=request.hours_per_day,
+        )
         
         if not request.topics:
             raise HTTPException(status_code=400, detail="No topics provided.")
@@ -24,7 +29,7 @@ def generate_plan(request: StudyPlanRequest):
         # Convert Pydantic models to Topic objects
         topics_data = [topic.model_dump() for topic in request.topics]
         topics = build_topics_from_payload(topics_data)
-        logger.info(f"Built {len(topics)} topic objects from payload.")
+        log.debug("topics_built", count=len(topics))
         
         # Generate the study plan
         plan = generate_study_plan(
@@ -33,17 +38,17 @@ def generate_plan(request: StudyPlanRequest):
             exam_date=request.exam_date,
             hours_per_day=request.hours_per_day,
         )
-        logger.info("Successfully generated study plan.")
+        log.debug("study_plan_generated", status=plan.status, days=len(plan.days))
         
         # Convert the plan to a dictionary for the response
         response_data = study_plan_to_dict(plan)
-        logger.info("Successfully converted study plan to dictionary.")
+        log.debug("study_plan_serialized")
         
         return response_data
 
     except HTTPException as http_exc:
-        logger.error(f"HTTP exception occurred: {http_exc.detail}")
+        log.error("study_plan_http_error", detail=http_exc.detail)
         raise http_exc
     except Exception as e:
-        logger.error(f"An unexpected error occurred during study plan generation: {e}", exc_info=True)
+        log.error("study_plan_failed", exc_info=True, error=e)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
@@ -1,19 +1,22 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
 from app.teacher.modes.teacher_mode import teacher_llm_request
-import logging
+from app.logic.llm import is_llm_request, llm_http_errors, run_llm_request
+from app.logic.logging_setup import route_logger
+from app.logic.admission import admission, lane_for
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Sampled, lazily formatted logging (see app.logic.logging_setup)
+log = route_logger(__name__, "/teacher/")
 
 router = APIRouter()
 
 class TeacherModeRequest(BaseModel):
     action: str
     payload: Dict[str, Any]
-    session_state: Dict[str, Any]
+    session_state: Dict[str, Any] = Field(default_factory=dict)
+    plan_id: Optional[str] = None # Stored plan (see /scheduler/plans) instead of a full plan in session_state
+    execute: bool = False # Run the built prompt through the LLM and return its JSON
 
 @router.post("/")
 async def teacher_mode(body: TeacherModeRequest):
@@ -21,24 +24,29 @@ async def teacher_mode(body: TeacherModeRequest):
     Handles various teacher mode actions by delegating to the teacher_llm_request function.
     """
     try:
-        logger.info(f"Received teacher mode request with action: {body.action}")
-        logger.debug(f"Payload: {body.payload}")
-        logger.debug(f"Session State: {body.session_state}")
+        log.info("teacher_request", action=body.action, payload=body.payload)
+        log.debug("teacher_session_state", session_state=body.session_state)
 
         # Validate that the action is a non-empty string
         if not body.action or not isinstance(body.action, str):
             raise HTTPException(status_code=400, detail="Invalid action provided.")
 
-        # Delegate the request to the core logic
-        response = teacher_llm_request(body.action, body.payload, body.session_state)
-        
-        logger.info(f"Successfully processed teacher mode action: {body.action}")
+        # Delegate the request to the core logic; prompt-only calls never
+        # wait behind executed ones (see app.logic.admission)
+        async with admission(lane_for("teacher", body.action, body.execute)):
+            payload = {**body.payload, "plan_id": body.plan_id} if body.plan_id else body.payload
+            response = teacher_llm_request(body.action, payload, body.session_state)
+            if body.execute and is_llm_request(response):
+                with llm_http_errors():
+                    response = await run_llm_request(response)
+
+        log.debug("teacher_request_done", action=body.action)
         return response
 
     except HTTPException as http_exc:
-        logger.error(f"HTTP exception in teacher mode: {http_exc.detail}")
+        log.error("teacher_http_error", detail=http_exc.detail)
         raise http_exc
     except Exception as e:
-        logger.error(f"An unexpected error occurred in teacher mode: {e}", exc_info=True)
+        log.error("teacher_failed", exc_info=True, error=e)
         raise HTTPException(status_code=500, detail=f"An unexpected server error occurred: {e}")
 
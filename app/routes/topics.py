@@ -0,0 +1,83 @@
+import io
+import os
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.logic.topic_import import FORMATS, import_topics
+from app.logic.topic_store import topic_store
+from app.logic.admission import LANE_IMPORT, admission
+
+router = APIRouter()
+
+# Request bodies beyond this are rejected (413) while streaming
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(256 * 1024 * 1024)))
+MAX_IMPORT_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json-lines": "jsonl",
+}
+
+
+@router.post("/import")
+async def import_syllabus(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv | jsonl (default: from Content-Type)"),
+    name: str = "",
+    chunk_size: int = Query(1000, ge=1, le=50000),
+    workers: int = Query(0, ge=0),
+    max_errors: int = Query(100, ge=0, le=10000),
+):
+    """
+    Import a syllabus sent as the raw request body (CSV with a header row,
+    or JSONL). The body is streamed to a temporary file and normalized
+    chunk by chunk; bad rows are reported, not fatal.
+    """
+    fmt = (format or _CONTENT_TYPES.get(request.headers.get("content-type", "").split(";")[0].strip(), "")).lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+
+    # Own lane: an import runs for seconds and must not hold cheap slots
+    async with admission(LANE_IMPORT):
+        # Spills to disk past 1 MiB, so the upload is never held in memory
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            received = 0
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > MAX_IMPORT_BYTES:
+                    raise HTTPException(status_code=413, detail=f"import larger than {MAX_IMPORT_BYTES} bytes")
+                spool.write(chunk)
+            spool.seek(0)
+
+            text = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+            try:
+                return await run_in_threadpool(
+                    import_topics, text, fmt, topic_store,
+                    name=name, chunk_size=chunk_size,
+                    workers=min(workers, MAX_IMPORT_WORKERS), max_errors=max_errors,
+                )
+            except UnicodeDecodeError as e:
+                raise HTTPException(status_code=400, detail=f"body is not UTF-8: {e}")
+            finally:
+                text.detach()
+
+
+@router.get("/{syllabus_id}")
+async def get_syllabus(
+    syllabus_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """
+    An imported syllabus: its import summary and one page of topics.
+    """
+    info = topic_store.info(syllabus_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"syllabus_not_found: {syllabus_id}")
+    return {**info, "offset": offset, "topics": topic_store.topics(syllabus_id, offset, limit)}
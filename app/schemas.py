@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from datetime import date
 
 # Input JSONs
@@ -12,15 +12,29 @@ class StudyTopicInput(BaseModel):
     progress: float = Field(..., ge=0, le=1) # Progress between 0.0 and 1.0
     base_hours: float
 
+class AvailabilityInput(BaseModel):
+    weekly: Dict[str, float] = Field(default_factory=dict) # "mon".."sun" -> hours; unlisted days use hours_per_day
+    exceptions: Dict[date, float] = Field(default_factory=dict) # date -> hours, 0 blocks the day
+
 class PlannerRequest(BaseModel):
     topics: List[StudyTopicInput]
     start_date: date
     exam_date: date
     hours_per_day: float = Field(..., gt=0) # Must be greater than 0
+    session_id: Optional[str] = None # Server-side session to store the plan in
+    availability: Optional[AvailabilityInput] = None # Per-weekday / per-date hours
 
 class StudyPlanRequest(PlannerRequest):
     pass
 
+class MultiExamPlannerRequest(BaseModel):
+    topics: List[StudyTopicInput]
+    start_date: date
+    exam_dates: Dict[str, date] # subject_name -> exam date
+    hours_per_day: float = Field(..., gt=0) # Shared across all subjects
+    session_id: Optional[str] = None
+    availability: Optional[AvailabilityInput] = None
+
 
 class TeacherRequest(BaseModel):
     user_id: str
@@ -82,3 +96,13 @@ class StudyPlanResponse(BaseModel):
     exam_date: date
     hours_per_day: float
     status: str
+    plan_id: Optional[str] = None # Stored version (app.logic.plan_store)
+    parent_id: Optional[str] = None
+
+class SubjectSummary(BaseModel):
+    exam_date: date
+    scheduled_hours: float
+    last_study_day: Optional[date]
+
+class MultiExamPlanResponse(StudyPlanResponse):
+    subjects: Dict[str, SubjectSummary]
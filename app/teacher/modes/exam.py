@@ -0,0 +1,404 @@
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import threading
+
+from app.logic.scheduler import (
+    Difficulty,
+    Topic,
+    Weakness,
+    Weight,
+    build_topics_from_payload,
+    compute_priority_score,
+    estimate_required_hours,
+)
+from app.logic.metrics import timed_stage
+from app.logic.plan_store import resolve_session_plan
+from app.logic.spaced_repetition import today_utc
+
+# =========================
+# BASE SYSTEM PROMPT
+# =========================
+
+exam_system_prompt = """
+You are an exam strategist for a student in the final stretch before an exam.
+
+Rules:
+- Be concrete: name topics, hours and what to do with them.
+- No motivational filler.
+- Always return VALID JSON ONLY. No text, no markdown, no commentary outside JSON.
+""".strip()
+
+
+def _wrap_llm_request(
+    action: str,
+    user_prompt: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Standard wrapper for LLM API calls (same pattern as teacher/revision).
+    """
+    req: Dict[str, Any] = {
+        "messages": [
+            {"role": "system", "content": exam_system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "response_format": {"type": "json_object"},
+        "metadata": {"exam_action": action},
+    }
+
+    if metadata:
+        req["metadata"].update(metadata)
+
+    return req
+
+
+# =========================
+# 1) TIME ALLOCATION
+# =========================
+
+def allocate_hours(needs: List[float], weights: List[float], budget: float) -> List[float]:
+    """
+    Split budget hours across topics: every topic gets hours in proportion
+    to its weight (priority) until its need is met, and what a satisfied
+    topic does not use goes to the others (water-filling, O(n log n)).
+    With enough budget everyone gets their full need.
+    """
+    allocation = [0.0] * len(needs)
+    if budget <= 0 or not needs:
+        return allocation
+    if sum(needs) <= budget:
+        return list(needs)
+
+    # Topics whose need is small relative to their weight fill up first
+    order = sorted(range(len(needs)), key=lambda i: needs[i] / weights[i] if weights[i] > 0 else float("inf"))
+    remaining_budget = budget
+    remaining_weight = sum(weights[i] for i in order if weights[i] > 0)
+    for position, i in enumerate(order):
+        if weights[i] <= 0:
+            continue
+        level = remaining_budget / remaining_weight
+        if needs[i] <= level * weights[i]:
+            allocation[i] = needs[i]
+            remaining_budget -= needs[i]
+            remaining_weight -= weights[i]
+        else:
+            # Nobody left in order is satisfied at this level
+            for j in order[position:]:
+                if weights[j] > 0:
+                    allocation[j] = level * weights[j]
+            break
+    return allocation
+
+
+# =========================
+# 2) NOTE PROMPTS
+# =========================
+
+def note_prompt(topic: Topic) -> str:
+    """
+    One self-made revision note to write for a topic, picked from what
+    makes it high-yield.
+    """
+    if topic.weakness == Weakness.WEAK:
+        return f"{topic.name}: list the mistakes you made in practice and the rule that fixes each."
+    if topic.difficulty == Difficulty.HARD:
+        return f"{topic.name}: write the key steps or derivation from memory, then check them against your notes."
+    if topic.weight == Weight.HIGH:
+        return f"{topic.name}: one page of the definitions and results most likely to be examined."
+    return f"{topic.name}: a five-bullet recall sheet of what you would need in the exam."
+
+
+# =========================
+# 3) STRATEGY
+# =========================
+
+# Strategies for identical inputs are reused; results are shared, so
+# callers must treat them as read-only.
+EXAM_STRATEGY_CACHE_SIZE = 512
+_strategy_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_strategy_cache_lock = threading.Lock()
+
+
+def _strategy_key(raw_topics: List[Dict[str, Any]], days_left: int, hours_per_day: float,
+                  fraction: float, min_count: int) -> str:
+    body = json.dumps(
+        [raw_topics, days_left, hours_per_day, fraction, min_count],
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _build_exam_strategy(topics: List[Topic], days_left: int, hours_per_day: float,
+                         fraction: float, min_count: int) -> Dict[str, Any]:
+    priorities = [float(compute_priority_score(t)) for t in topics]
+    needs = [float(estimate_required_hours(t)) for t in topics]
+    budget = max(0, days_left) * hours_per_day
+    allocation = allocate_hours(needs, priorities, budget)
+
+    # Same ranking as revision's high_yield_topics: priority weighted by
+    # the work still left
+    order = sorted(range(len(topics)), key=lambda i: priorities[i] * (1.0 + needs[i]), reverse=True)
+    high_yield_count = min(len(topics), max(min_count, int(len(topics) * fraction)))
+    high_yield = order[:high_yield_count]
+
+    required = sum(needs)
+    return {
+        "kind": "exam_strategy",
+        "days_left": days_left,
+        "hours_per_day": hours_per_day,
+        "budget_hours": round(budget, 2),
+        "required_hours": round(required, 2),
+        "fits": required <= budget,
+        "recommended_order": [topics[i].name for i in order],
+        "time_allocations": [
+            {
+                "topic": topics[i].name,
+                "subject": topics[i].subject_name,
+                "hours": round(allocation[i], 2),
+                "required_hours": round(needs[i], 2),
+                "coverage": round(allocation[i] / needs[i], 3) if needs[i] > 0 else 1.0,
+                "priority_score": round(priorities[i], 3),
+            }
+            for i in order
+        ],
+        "high_yield_topics": [topics[i].name for i in high_yield],
+        "quick_revision_notes": [note_prompt(topics[i]) for i in high_yield],
+    }
+
+
+@timed_stage("exam_strategy")
+def build_exam_strategy(
+    raw_topics: List[Dict[str, Any]],
+    days_left: int,
+    hours_per_day: float,
+    fraction: float = 0.3,
+    min_count: int = 3,
+) -> Dict[str, Any]:
+    """
+    Pure Python, no LLM: recommended order, hours per topic solved against
+    days_left * hours_per_day, high-yield topics and note prompts.
+    Memoized on a hash of the topic set and the other inputs.
+    """
+    key = _strategy_key(raw_topics, days_left, hours_per_day, fraction, min_count)
+    with _strategy_cache_lock:
+        cached = _strategy_cache.get(key)
+        if cached is not None:
+            _strategy_cache.move_to_end(key)
+            return cached
+
+    strategy = _build_exam_strategy(
+        build_topics_from_payload(raw_topics), days_left, hours_per_day, fraction, min_count,
+    )
+    with _strategy_cache_lock:
+        _strategy_cache[key] = strategy
+        while len(_strategy_cache) > EXAM_STRATEGY_CACHE_SIZE:
+            _strategy_cache.popitem(last=False)
+    return strategy
+
+
+# =========================
+# 4) OPTIONAL NOTES (LLM)
+# =========================
+
+def build_exam_notes_request(strategy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Free-text notes on top of a computed strategy; the only LLM call in
+    Exam Mode.
+    """
+    summary = {
+        "days_left": strategy["days_left"],
+        "budget_hours": strategy["budget_hours"],
+        "required_hours": strategy["required_hours"],
+        "high_yield_topics": strategy["high_yield_topics"],
+        "time_allocations": strategy["time_allocations"][:15],
+    }
+    user_prompt = f"""
+The backend computed this exam strategy for the student:
+{json.dumps(summary, ensure_ascii=False)}
+
+Write short notes that help the student follow it:
+- what to do first, given the high-yield topics,
+- how to use the allocated hours (topics with coverage < 1 cannot be finished),
+- one warning if the budget is below the required hours.
+
+Return ONLY:
+{{
+  "kind": "exam_notes",
+  "notes": [string]   // 3 to 6 notes, one sentence each
+}}
+""".strip()
+    return _wrap_llm_request(
+        action="exam_notes",
+        user_prompt=user_prompt,
+        metadata={"days_left": strategy["days_left"]},
+    )
+
+
+# =========================
+# ROUTER
+# =========================
+
+# Cost class of each action handled by exam_llm_request (see
+# PRACTICE_ACTION_COSTS in practice.py).
+EXAM_ACTION_COSTS: Dict[str, str] = {
+    "generate_exam_strategy": "cheap",
+    "exam_notes": "llm",
+}
+
+# Shape of the model's answer per action (the "exam_action" metadata of
+# the request), in the JSON-schema subset of app.logic.llm_output.
+EXAM_OUTPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "exam_notes": {
+        "type": "object",
+        "required": ["kind", "notes"],
+        "properties": {
+            "kind": {"const": "exam_notes"},
+            # "3 to 6 notes"
+            "notes": {"type": "array", "minItems": 3, "maxItems": 6, "items": {"type": "string"}},
+        },
+    },
+}
+
+
+# Study hours per day when neither the payload, the session nor its plan
+# give any (the exam screen only sends the exam date and topics)
+DEFAULT_EXAM_HOURS_PER_DAY = 2.0
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if not isinstance(value, (int, float, str)):
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _exam_window(
+    payload: Dict[str, Any],
+    session_state: Dict[str, Any],
+) -> Tuple[Optional[int], Optional[float], Optional[str]]:
+    """
+    (days_left, hours_per_day, None), or (None, None, reason) naming the
+    first bad field. Each comes from the payload, else the session (and
+    its plan); hours_per_day falls back to DEFAULT_EXAM_HOURS_PER_DAY.
+    """
+    plan = session_state.get("plan")
+
+    today = today_utc()
+    if payload.get("today_iso") is not None:
+        try:
+            today = date.fromisoformat(payload["today_iso"])
+        except (TypeError, ValueError):
+            return None, None, "invalid_today_iso"
+
+    days_left: Optional[int] = None
+    if payload.get("days_left") is not None:
+        number = _number(payload["days_left"])
+        if number is None or number != int(number):
+            return None, None, "invalid_days_left"
+        days_left = int(number)
+    elif payload.get("exam_date"):
+        try:
+            days_left = (date.fromisoformat(payload["exam_date"]) - today).days
+        except (TypeError, ValueError):
+            return None, None, "invalid_exam_date"
+    elif plan is not None:
+        days_left = (plan.exam_date - today).days
+    if days_left is None:
+        return None, None, "missing_exam_date"
+
+    for source in (payload, session_state):
+        if source.get("hours_per_day") is not None:
+            hours_per_day = _number(source["hours_per_day"])
+            if hours_per_day is None or hours_per_day <= 0:
+                return None, None, "invalid_hours_per_day"
+            return days_left, hours_per_day, None
+    if plan is not None:
+        return days_left, float(plan.hours_per_day), None
+    return days_left, DEFAULT_EXAM_HOURS_PER_DAY, None
+
+
+def _exam_topics(
+    payload: Dict[str, Any],
+    session_topics: List[Dict[str, Any]],
+) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+    """
+    The topics to plan for: payload["topics"] when sent (the exam screen's
+    "Topics to Cover"), else the session's. A name in payload["topics"]
+    picks the session topic of that name (case-insensitive), or stands for
+    a new topic with default fields; a dict is taken as a full topic.
+    """
+    wanted = payload.get("topics")
+    if not wanted:
+        return session_topics, None
+    if not isinstance(wanted, list):
+        return None, "invalid_topics"
+
+    by_name = {str(t.get("topic_name", "")).strip().lower(): t for t in session_topics}
+    topics: List[Dict[str, Any]] = []
+    for item in wanted:
+        if isinstance(item, dict) and isinstance(item.get("topic_name"), str):
+            topics.append({"subject_name": "", **item})
+        elif isinstance(item, str) and item.strip():
+            topics.append(by_name.get(item.strip().lower()) or {"topic_name": item.strip(), "subject_name": ""})
+        else:
+            return None, "invalid_topics"
+    return topics, None
+
+
+def exam_llm_request(
+    action: str,
+    payload: Dict[str, Any],
+    session_state: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Main entrypoint for Exam Mode.
+
+    action:
+      - "generate_exam_strategy"   local, memoized
+      - "exam_notes"               LLM request for free-text notes
+
+    payload: exam_date (or days_left), hours_per_day, optional topics,
+    today_iso, fraction, min_count. Without them, the plan in
+    session_state (or plan_id) supplies exam date and hours, and the
+    session its topics.
+    """
+    session_state, plan_error = resolve_session_plan(session_state, payload)
+    if plan_error:
+        return {"error": True, "reason": plan_error}
+
+    action = (action or "").strip().lower()
+    if action not in EXAM_ACTION_COSTS:
+        return {"error": True, "reason": f"unknown_exam_action: {action}"}
+
+    raw_topics, topics_error = _exam_topics(
+        payload, [t for t in session_state.get("topics") or [] if isinstance(t, dict)],
+    )
+    if topics_error:
+        return {"error": True, "reason": topics_error}
+    if not raw_topics:
+        return {"error": True, "reason": "no_topics_in_session_state"}
+
+    days_left, hours_per_day, window_error = _exam_window(payload, session_state)
+    if window_error:
+        return {"error": True, "reason": window_error}
+
+    strategy = build_exam_strategy(
+        raw_topics,
+        days_left=days_left,
+        hours_per_day=hours_per_day,
+        fraction=float(payload.get("fraction", 0.3)),
+        min_count=int(payload.get("min_count", 3)),
+    )
+
+    if action == "exam_notes":
+        return build_exam_notes_request(strategy)
+    return strategy
@@ -1,9 +1,11 @@
 from dataclasses import dataclass, asdict
 from typing import Any, Dict, List, Optional
 import json
-from datetime import datetime
+from datetime import date, datetime
 
 from app.logic.scheduler import Topic
+from app.logic.metrics import timed_stage
+from app.logic.spaced_repetition import deck_for, grade_from_answer, today_utc
 
 
 # =========================
@@ -50,6 +52,14 @@ def _now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
 
 
+def _today_from_payload(payload: Dict[str, Any]) -> date:
+    # Clients may pass their local date; default to today in UTC
+    try:
+        return date.fromisoformat(str(payload["today_iso"])[:10])
+    except (KeyError, ValueError):
+        return today_utc()
+
+
 def _get_or_create_topic_perf(
     performance_store: Dict[str, Dict[str, Any]],
     topic_name: str,
@@ -268,6 +278,50 @@ Rules:
     )
 
 
+def _mcq_option_index(options: List[Any], value: Any) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if 0 <= value < len(options) else None
+
+    # Option text wins over index/letter readings ("4" among ["3", "4"]).
+    text = str(value).strip()
+    target = text.lower()
+    for idx, option in enumerate(options):
+        if str(option).strip().lower() == target:
+            return idx
+
+    if text.isdigit():
+        idx = int(text)
+        return idx if 0 <= idx < len(options) else None
+    if len(text) == 1 and text.isalpha():
+        idx = ord(target) - ord("a")
+        return idx if 0 <= idx < len(options) else None
+    return None
+
+
+def grade_mcq_answer(
+    question_object: Dict[str, Any],
+    user_answer: Any,
+) -> Optional[bool]:
+    """
+    Pure Python grading for MCQs whose correct_answer can be resolved to an
+    option (index, letter or option text). Returns None when the question
+    needs the LLM checker (open answers, unresolvable keys).
+    """
+    if str(question_object.get("question_type", "")).lower() != "mcq":
+        return None
+    options = question_object.get("options") or []
+    if not options:
+        return None
+
+    correct_idx = _mcq_option_index(options, question_object.get("correct_answer"))
+    if correct_idx is None:
+        return None
+    answer_idx = _mcq_option_index(options, user_answer)
+    return answer_idx == correct_idx
+
+
 # =========================
 # PERFORMANCE TRACKING
 # =========================
@@ -337,6 +391,69 @@ def get_topic_stats(
 # ROUTER
 # =========================
 
+# Cost class of each action handled by practice_llm_request. "llm" actions
+# only build a prompt here, but are model-bound once executed; "cheap" ones
+# are answered in pure Python. Used for admission lanes.
+PRACTICE_ACTION_COSTS: Dict[str, str] = {
+    "generate_questions": "llm",
+    "check_answer": "llm",
+    "start_practice": "llm",
+    "update_performance": "cheap",
+    "topic_stats": "cheap",
+    "suggest_difficulty": "cheap",
+    "due_reviews": "cheap",
+}
+
+# Shape of the model's answer per action (the "practice_action" metadata
+# of the request), in the JSON-schema subset of app.logic.llm_output.
+# Executed answers are checked against it, then repaired or re-asked.
+PRACTICE_OUTPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "generate_questions": {
+        "type": "object",
+        "required": ["kind", "topic_name", "questions"],
+        "properties": {
+            "kind": {"const": "practice_questions"},
+            "topic_name": {"type": "string"},
+            "subject_name": {"type": "string"},
+            "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
+            "questions": {
+                "type": "array",
+                # "EXACTLY {count} questions"
+                "minItems": {"$meta": "count"},
+                "maxItems": {"$meta": "count"},
+                "items": {
+                    "type": "object",
+                    "required": ["id", "prompt", "correct_answer"],
+                    "properties": {
+                        "id": {"type": ["string", "number"]},
+                        "question_type": {"type": "string"},
+                        "prompt": {"type": "string"},
+                        "options": {"type": "array"},
+                        "correct_answer": {},
+                        "explanation": {"type": "string"},
+                    },
+                },
+            },
+        },
+    },
+    "check_answer": {
+        "type": "object",
+        "required": ["kind", "is_correct", "feedback"],
+        "properties": {
+            "kind": {"const": "answer_check"},
+            "question_id": {"type": ["string", "number"]},
+            "topic_name": {"type": "string"},
+            "is_correct": {"type": "boolean"},
+            "correct_answer": {},
+            "explanation": {"type": "string"},
+            "feedback": {"type": "string"},
+            "score": {"type": "number"},
+        },
+    },
+}
+
+
+@timed_stage("prompt_build_practice")
 def practice_llm_request(
     action: str,
     payload: Dict[str, Any],
@@ -413,7 +530,26 @@ def practice_llm_request(
             was_correct=was_correct,
             difficulty=difficulty,
         )
-        return {"ok": True, "updated": updated}
+        # Every answer is also a spaced-repetition review (one card per
+        # topic unless the client tracks its own card_id)
+        review = deck_for(session_state).review(
+            card_id=str(payload.get("card_id") or topic_name.strip()),
+            topic_name=topic_name.strip(),
+            grade=grade_from_answer(was_correct, difficulty),
+            today=_today_from_payload(payload),
+        )
+        return {"ok": True, "updated": updated, "review": review}
+
+    if action == "due_reviews":
+        today = _today_from_payload(payload)
+        limit = payload.get("limit")
+        cards = deck_for(session_state).due(today, int(limit) if limit else None)
+        return {
+            "kind": "due_reviews",
+            "today": today.isoformat(),
+            "count": len(cards),
+            "cards": cards,
+        }
 
     if action == "topic_stats":
         topic_name = payload.get("topic_name", "")
@@ -1,5 +1,8 @@
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
 import json
+import threading
 
 from app.logic.scheduler import (
     Topic,
@@ -7,6 +10,8 @@ from app.logic.scheduler import (
     estimate_required_hours,
     topic_to_dict,
 )
+from app.logic.metrics import timed_stage
+from app.logic.plan_store import plan_store
 
 # =========================
 # BASE SYSTEM PROMPT
@@ -179,6 +184,31 @@ Rules:
 # 3) HIGH-YIELD TOPICS (pure Python)
 # =========================
 
+def _high_yield_item(topic: Topic, priority: float, remaining_hours: float, combined_score: float) -> Dict[str, Any]:
+    return {
+        "topic": topic_to_dict(topic),
+        "priority_score": priority,
+        "estimated_remaining_hours": remaining_hours,
+        "combined_score": combined_score,
+    }
+
+
+def _high_yield_count(n: int, fraction: float, min_count: int) -> int:
+    return min(n, max(min_count, int(n * fraction)))
+
+
+def _high_yield_result(total: int, selected: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Add rank for UI display
+    for idx, item in enumerate(selected, start=1):
+        item["rank"] = idx
+    return {
+        "kind": "high_yield_topics",
+        "total_topics": total,
+        "selected_count": len(selected),
+        "topics": selected,
+    }
+
+
 def select_high_yield_topics(
     topics: List[Topic],
     fraction: float = 0.3,
@@ -189,49 +219,164 @@ def select_high_yield_topics(
     - Uses compute_priority_score (weight + weakness + difficulty)
     - Uses estimate_required_hours (remaining work)
     to rank topics and return the top ~fraction (20–30%) as high-yield.
-    """
-    if not topics:
-        return {
-            "kind": "high_yield_topics",
-            "total_topics": 0,
-            "selected_count": 0,
-            "topics": [],
-        }
 
-    scored: List[Dict[str, Any]] = []
+    Only the selected topics are ranked (heapq.nlargest) and serialized;
+    ties keep input order.
+    """
+    scores = []
     for t in topics:
         priority = float(compute_priority_score(t))
         remaining_hours = float(estimate_required_hours(t))
-        combined_score = priority * (1.0 + remaining_hours)
-
-        scored.append(
-            {
-                "topic": topic_to_dict(t),
-                "priority_score": priority,
-                "estimated_remaining_hours": remaining_hours,
-                "combined_score": combined_score,
-            }
+        scores.append((priority * (1.0 + remaining_hours), priority, remaining_hours))
+
+    top_n = _high_yield_count(len(topics), fraction, min_count)
+    best = heapq.nlargest(top_n, range(len(topics)), key=lambda i: scores[i][0])
+    return _high_yield_result(
+        len(topics),
+        [_high_yield_item(topics[i], scores[i][1], scores[i][2], scores[i][0]) for i in best],
+    )
+
+
+def _topic_from_raw(t: Any) -> Topic:
+    if not isinstance(t, dict):
+        return t
+    return Topic(
+        name=t.get("topic_name", ""),
+        subject_name=t.get("subject_name", ""),
+        weight=t.get("weight", "medium"),
+        difficulty=t.get("difficulty", "medium"),
+        weakness=t.get("weakness", "moderate"),
+        progress=t.get("progress", 0.0),
+        base_hours=t.get("base_hours", 2.0)
+    )
+
+
+class HighYieldIndex:
+    """
+    select_high_yield_topics for one topic list, kept up to date as single
+    topics change.
+
+    Topics are scored once; a min-heap of (-combined_score, position, seq)
+    orders them. Changing one topic rescores it and pushes a fresh entry
+    (O(log n)); superseded entries are skipped lazily and the heap is
+    rebuilt once they outnumber live topics (same scheme as ReviewDeck in
+    app.logic.spaced_repetition). Reading the top k walks O(k) heap nodes
+    plus superseded entries.
+    """
+
+    def __init__(self, raw_topics: List[Any]):
+        self._rebuild(raw_topics)
+
+    def _rebuild(self, raw_topics: List[Any]) -> None:
+        self._raw: List[Any] = list(raw_topics)
+        self._topics: List[Topic] = [_topic_from_raw(t) for t in self._raw]
+        self._scores = [self._score(t) for t in self._topics]
+        self._latest: List[int] = [0] * len(self._topics)
+        self._seq = 0
+        self._heap: List[Tuple[float, int, int]] = [(-s[0], i, 0) for i, s in enumerate(self._scores)]
+        heapq.heapify(self._heap)
+
+    @staticmethod
+    def _score(topic: Topic) -> Tuple[float, float, float]:
+        priority = float(compute_priority_score(topic))
+        remaining_hours = float(estimate_required_hours(topic))
+        return priority * (1.0 + remaining_hours), priority, remaining_hours
+
+    def __len__(self) -> int:
+        return len(self._topics)
+
+    def update(self, position: int, raw_topic: Any) -> None:
+        """
+        Replace the topic at position (e.g. new progress or weakness).
+        """
+        self._raw[position] = raw_topic
+        self._topics[position] = topic = _topic_from_raw(raw_topic)
+        self._scores[position] = score = self._score(topic)
+        self._seq += 1
+        self._latest[position] = self._seq
+        heapq.heappush(self._heap, (-score[0], position, self._seq))
+        if len(self._heap) > 2 * len(self._topics) + 64:
+            self._heap = [(-s[0], i, self._latest[i]) for i, s in enumerate(self._scores)]
+            heapq.heapify(self._heap)
+
+    def sync(self, raw_topics: List[Any]) -> int:
+        """
+        Bring the index in line with raw_topics: topics that changed in
+        place are updated one by one; an added, removed or reordered topic
+        rebuilds. Returns the number of topics rescored.
+        """
+        if len(raw_topics) != len(self._raw) or any(
+            _topic_key(old) != _topic_key(new) for old, new in zip(self._raw, raw_topics)
+        ):
+            self._rebuild(raw_topics)
+            return len(self._raw)
+        changed = 0
+        for position, (old, new) in enumerate(zip(self._raw, raw_topics)):
+            if old is not new and old != new:
+                self.update(position, new)
+                changed += 1
+        return changed
+
+    def top(self, k: int) -> List[int]:
+        """
+        Positions of the k best topics, best first; ties keep list order.
+        """
+        heap, latest = self._heap, self._latest
+        found: List[int] = []
+        frontier = [(heap[0], 0)] if heap and k > 0 else []
+        while frontier and len(found) < k:
+            (_, position, seq), i = heapq.heappop(frontier)
+            if latest[position] == seq:
+                found.append(position)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return found
+
+    def select(self, fraction: float = 0.3, min_count: int = 3) -> Dict[str, Any]:
+        """
+        Same result as select_high_yield_topics on the current topics.
+        """
+        best = self.top(_high_yield_count(len(self._topics), fraction, min_count))
+        return _high_yield_result(
+            len(self._topics),
+            [
+                _high_yield_item(self._topics[i], self._scores[i][1], self._scores[i][2], self._scores[i][0])
+                for i in best
+            ],
         )
 
-    # Sort by combined_score descending
-    scored.sort(key=lambda x: x["combined_score"], reverse=True)
 
-    n = len(scored)
-    top_n = max(min_count, int(n * fraction))
-    top_n = min(top_n, n)
+def _topic_key(t: Any) -> Tuple[str, str]:
+    if isinstance(t, dict):
+        return t.get("topic_name", ""), t.get("subject_name", "")
+    return t.name, t.subject_name
 
-    selected = scored[:top_n]
 
-    # Add rank for UI display
-    for idx, item in enumerate(selected, start=1):
-        item["rank"] = idx
+# One HighYieldIndex per server-side session, least recently used dropped
+# first. Callers hold the session lock while syncing / reading one.
+HIGH_YIELD_INDEX_SESSIONS = 1024
+_session_indexes: "OrderedDict[str, HighYieldIndex]" = OrderedDict()
+_session_indexes_lock = threading.Lock()
 
-    return {
-        "kind": "high_yield_topics",
-        "total_topics": n,
-        "selected_count": top_n,
-        "topics": selected,
-    }
+
+def session_high_yield_index(session_id: str, raw_topics: List[Any]) -> HighYieldIndex:
+    """
+    The session's HighYieldIndex, synced to its current topic list.
+    """
+    with _session_indexes_lock:
+        index = _session_indexes.get(session_id)
+        if index is not None:
+            _session_indexes.move_to_end(session_id)
+    if index is None:
+        index = HighYieldIndex(raw_topics)
+        with _session_indexes_lock:
+            _session_indexes[session_id] = index
+            while len(_session_indexes) > HIGH_YIELD_INDEX_SESSIONS:
+                _session_indexes.popitem(last=False)
+    else:
+        index.sync(raw_topics)
+    return index
 
 
 # =========================
@@ -356,10 +501,105 @@ Rules:
 # ROUTER
 # =========================
 
+# Cost class of each action handled by revision_llm_request (see
+# PRACTICE_ACTION_COSTS in practice.py).
+REVISION_ACTION_COSTS: Dict[str, str] = {
+    "revision_points": "llm",
+    "revision_flashcards": "llm",
+    "last_minute_revision": "llm",
+    "expected_exam_questions": "llm",
+    "high_yield_topics": "cheap",
+    "generate_revision_plan": "cheap",
+}
+
+_STRS = {"type": "array", "items": {"type": "string"}}
+
+# Shape of the model's answer per action (the "revision_action" metadata
+# of the request), in the JSON-schema subset of app.logic.llm_output.
+# Executed answers are checked against it, then repaired or re-asked.
+REVISION_OUTPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "revision_points": {
+        "type": "object",
+        "required": ["kind", "topic_name", "bullets"],
+        "properties": {
+            "kind": {"const": "revision_points"},
+            "topic_name": {"type": "string"},
+            "subject_name": {"type": "string"},
+            "bullets": {"type": "array", "minItems": 1, "items": {"type": "string"}},
+            "key_definitions": _STRS,
+            "key_formulas_or_rules": _STRS,
+            "quick_example": {"type": "string"},
+            "common_mistakes": _STRS,
+        },
+    },
+    "revision_flashcards": {
+        "type": "object",
+        "required": ["kind", "topic_name", "flashcards"],
+        "properties": {
+            "kind": {"const": "revision_flashcards"},
+            "topic_name": {"type": "string"},
+            "subject_name": {"type": "string"},
+            "count": {"type": "number"},
+            "flashcards": {
+                "type": "array",
+                # "EXACTLY {count} flashcards"
+                "minItems": {"$meta": "requested_count"},
+                "maxItems": {"$meta": "requested_count"},
+                "items": {
+                    "type": "object",
+                    "required": ["front", "back"],
+                    "properties": {"id": {"type": ["string", "number"]}, "front": {"type": "string"}, "back": {"type": "string"}},
+                },
+            },
+        },
+    },
+    "last_minute_revision": {
+        "type": "object",
+        "required": ["kind", "topic_name", "bullets"],
+        "properties": {
+            "kind": {"const": "last_minute_revision"},
+            "topic_name": {"type": "string"},
+            "subject_name": {"type": "string"},
+            # "EXACTLY 3 bullets"
+            "bullets": {"type": "array", "minItems": 3, "maxItems": 3, "items": {"type": "string"}},
+        },
+    },
+    "expected_exam_questions": {
+        "type": "object",
+        "required": ["kind", "topic_name", "questions"],
+        "properties": {
+            "kind": {"const": "expected_exam_questions"},
+            "topic_name": {"type": "string"},
+            "subject_name": {"type": "string"},
+            "questions": {
+                "type": "array",
+                # "BETWEEN {count} and {count + 2} questions"
+                "minItems": {"$meta": "requested_count"},
+                "maxItems": {"$meta": "requested_count", "add": 2},
+                "items": {
+                    "type": "object",
+                    "required": ["prompt"],
+                    "properties": {
+                        "id": {"type": ["string", "number"]},
+                        "question_type": {"type": "string"},
+                        "marks": {"type": "number"},
+                        "prompt": {"type": "string"},
+                        "hint": {"type": "string"},
+                        "difficulty": {"type": "string", "enum": ["easy", "medium", "hard"]},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+@timed_stage("prompt_build_revision")
 def revision_llm_request(
     action: str,
     payload: Dict[str, Any],
     session_state: Dict[str, Any],
+    session_id: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Main entrypoint for Revision Mode.
@@ -372,25 +612,54 @@ def revision_llm_request(
       - "expected_exam_questions"
 
     session_state:
-      - should contain "topics": List[Topic]
+      - should contain "topics": List[Topic], or a "plan_id" (here or in
+        payload) whose stored plan carries them
+
+    session_id: set for server-side sessions; high-yield selections then
+    come from the session's HighYieldIndex instead of rescoring every topic.
     """
     raw_topics = session_state.get("topics") or []
-    topics: List[Topic] = []
-    for t in raw_topics:
-        if isinstance(t, dict):
-            topics.append(Topic(
-                name=t.get("topic_name", ""),
-                subject_name=t.get("subject_name", ""),
-                weight=t.get("weight", "medium"),
-                difficulty=t.get("difficulty", "medium"),
-                weakness=t.get("weakness", "moderate"),
-                progress=t.get("progress", 0.0),
-                base_hours=t.get("base_hours", 2.0)
-            ))
-        else:
-            topics.append(t)
+    plan_id = payload.get("plan_id") or session_state.get("plan_id")
+    if not raw_topics and plan_id:
+        raw_topics = plan_store.topics(plan_id)
+        if raw_topics is None:
+            if payload.get("plan_id"):
+                return {"error": True, "reason": f"plan_not_found: {plan_id}"}
+            raw_topics = []
     action = (action or "").strip().lower()
 
+    if action in ("high_yield_topics", "generate_revision_plan"):
+        fraction = float(payload.get("fraction", 0.3 if action == "high_yield_topics" else 0.5))
+        min_count = int(payload.get("min_count", 3))
+        if session_id:
+            high_yield_result = session_high_yield_index(session_id, raw_topics).select(fraction, min_count)
+        else:
+            high_yield_result = select_high_yield_topics(
+                topics=[_topic_from_raw(t) for t in raw_topics],
+                fraction=fraction,
+                min_count=min_count,
+            )
+        if action == "high_yield_topics":
+            return high_yield_result
+
+        # generate_revision_plan: high_yield_topics formatted for the frontend
+        revision_topics = []
+        for item in high_yield_result.get("topics", []):
+            t_dict = item.get("topic", {})
+            revision_topics.append({
+                "subject": t_dict.get("subject_name", "Unknown"),
+                "topic": t_dict.get("topic_name", "Unknown"),
+                "weakness": t_dict.get("weakness", "moderate"),
+                "priority": f"Score: {item.get('priority_score', 0):.2f}"
+            })
+
+        return {
+            "kind": "revision_plan",
+            "revision_topics": revision_topics
+        }
+
+    topics: List[Topic] = [_topic_from_raw(t) for t in raw_topics]
+
     if action == "revision_points":
         topic_name = payload.get("topic_name", "")
         if not topic_name:
@@ -411,15 +680,6 @@ def revision_llm_request(
             count=count,
         )
 
-    if action == "high_yield_topics":
-        fraction = float(payload.get("fraction", 0.3))
-        min_count = int(payload.get("min_count", 3))
-        return select_high_yield_topics(
-            topics=topics,
-            fraction=fraction,
-            min_count=min_count,
-        )
-
     if action == "last_minute_revision":
         topic_name = payload.get("topic_name", "")
         if not topic_name:
@@ -440,31 +700,4 @@ def revision_llm_request(
             count=count,
         )
 
-    if action == "generate_revision_plan":
-        # This maps to high_yield_topics but formatted for the frontend
-        fraction = float(payload.get("fraction", 0.5))
-        min_count = int(payload.get("min_count", 3))
-        
-        high_yield_result = select_high_yield_topics(
-            topics=topics,
-            fraction=fraction,
-            min_count=min_count,
-        )
-        
-        # Transform for frontend
-        revision_topics = []
-        for item in high_yield_result.get("topics", []):
-            t_dict = item.get("topic", {})
-            revision_topics.append({
-                "subject": t_dict.get("subject_name", "Unknown"),
-                "topic": t_dict.get("topic_name", "Unknown"),
-                "weakness": t_dict.get("weakness", "moderate"),
-                "priority": f"Score: {item.get('priority_score', 0):.2f}"
-            })
-            
-        return {
-            "kind": "revision_plan",
-            "revision_topics": revision_topics
-        }
-
     return {"error": True, "reason": f"unknown_revision_action: {action}"}
@@ -2,6 +2,8 @@ from typing import Any, Dict, List, Optional
 import json
 
 from app.logic.scheduler import topic_to_dict, study_plan_to_dict, Topic, StudyPlan
+from app.logic.metrics import timed_stage
+from app.logic.plan_store import resolve_session_plan
 
 
 base_system_prompt = """
@@ -414,11 +416,164 @@ No text outside the JSON.
     )
 
 
+# Cost class of each action handled by teacher_llm_request (see
+# PRACTICE_ACTION_COSTS in practice.py). Every teacher action is model-bound.
+TEACHER_ACTION_COSTS: Dict[str, str] = {
+    "explain_topic": "llm",
+    "summarize_topic": "llm",
+    "give_examples": "llm",
+    "check_understanding": "llm",
+    "breakdown_steps": "llm",
+    "explain_plan": "llm",
+    "explain_today": "llm",
+}
+
+_STR = {"type": "string"}
+_STRS = {"type": "array", "items": _STR}
+_NUM = {"type": "number"}
+
+# Shape of the model's answer per action (the "teacher_action" metadata of
+# the request), in the JSON-schema subset of app.logic.llm_output.
+# Executed answers are checked against it, then repaired or re-asked.
+TEACHER_OUTPUT_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "explain_topic": {
+        "type": "object",
+        "required": ["kind", "topic_name", "summary", "main_ideas", "recommended_study_plan"],
+        "properties": {
+            "kind": {"const": "topic_explanation"},
+            "topic_name": _STR,
+            "subject_name": _STR,
+            "level": _STR,
+            "summary": _STR,
+            "why_important": _STR,
+            "student_status": {"type": "object"},
+            "main_ideas": {"type": "array", "items": {
+                "type": "object", "required": ["title", "description"],
+                "properties": {"title": _STR, "description": _STR},
+            }},
+            "recommended_study_plan": {"type": "array", "items": {
+                "type": "object", "required": ["title", "description"],
+                "properties": {"step": _NUM, "title": _STR, "description": _STR},
+            }},
+            "warnings": _STRS,
+        },
+    },
+    "summarize_topic": {
+        "type": "object",
+        "required": ["kind", "topic_name", "one_line_summary"],
+        "properties": {
+            "kind": {"const": "topic_summary"},
+            "topic_name": _STR,
+            "subject_name": _STR,
+            "one_line_summary": _STR,
+            "progress_label": _STR,
+            "risk_level": {"type": "string", "enum": ["low", "medium", "high"]},
+            "exam_weight_label": _STR,
+            "recommended_focus": _STR,
+            "tags": _STRS,
+        },
+    },
+    "give_examples": {
+        "type": "object",
+        "required": ["kind", "topic_name", "examples"],
+        "properties": {
+            "kind": {"const": "topic_examples"},
+            "topic_name": _STR,
+            "subject_name": _STR,
+            "examples": {
+                "type": "array",
+                "minItems": {"$meta": "requested_count"},
+                "maxItems": {"$meta": "requested_count", "add": 2},
+                "items": {
+                    "type": "object", "required": ["title", "description"],
+                    "properties": {"title": _STR, "description": _STR, "estimated_time_minutes": _NUM, "type": _STR},
+                },
+            },
+        },
+    },
+    "check_topic_understanding": {
+        "type": "object",
+        "required": ["kind", "topic_name", "questions"],
+        "properties": {
+            "kind": {"const": "topic_understanding_check"},
+            "topic_name": _STR,
+            "subject_name": _STR,
+            "overall_judgement": _STR,
+            "questions": {"type": "array", "minItems": 1, "items": {
+                "type": "object", "required": ["prompt"],
+                "properties": {"id": {"type": ["string", "number"]}, "prompt": _STR, "expected_if_strong": _STR},
+            }},
+            "red_flags": _STRS,
+            "advice_if_weak": _STR,
+            "advice_if_okay": _STR,
+            "advice_if_strong": _STR,
+        },
+    },
+    "breakdown_steps": {
+        "type": "object",
+        "required": ["kind", "topic_name", "steps"],
+        "properties": {
+            "kind": {"const": "topic_breakdown_steps"},
+            "topic_name": _STR,
+            "subject_name": _STR,
+            "steps": {"type": "array", "minItems": 1, "items": {
+                "type": "object", "required": ["title", "description"],
+                "properties": {
+                    "step": _NUM, "title": _STR, "description": _STR,
+                    "focus": _STR, "recommended_time_minutes": _NUM,
+                },
+            }},
+            "emphasis": _STRS,
+            "common_mistakes": _STRS,
+        },
+    },
+    "explain_study_plan": {
+        "type": "object",
+        "required": ["kind", "overall_strategy", "day_summaries"],
+        "properties": {
+            "kind": {"const": "study_plan_explanation"},
+            "status": _STR,
+            "status_comment": _STR,
+            "overall_strategy": _STR,
+            "key_principles": _STRS,
+            "day_summaries": {"type": "array", "items": {
+                "type": "object", "required": ["date"],
+                "properties": {"date": _STR, "total_hours": _NUM, "main_focus": _STRS, "notes": _STR},
+            }},
+        },
+    },
+    "explain_today": {
+        "type": "object",
+        "required": ["kind", "mode", "tasks", "summary"],
+        "properties": {
+            "kind": {"const": "today_explanation"},
+            "mode": {"type": "string", "enum": ["exact_match", "fallback_first_day", "no_plan"]},
+            "date": {"type": ["string", "null"]},
+            "total_hours": {"type": ["number", "null"]},
+            "tasks": {"type": "array", "items": {
+                "type": "object", "required": ["topic_name"],
+                "properties": {
+                    "topic_name": _STR, "subject_name": _STR, "task_type": _STR,
+                    "duration_hours": _NUM, "how_to_approach": _STR,
+                },
+            }},
+            "summary": _STR,
+        },
+    },
+}
+
+
+@timed_stage("prompt_build_teacher")
 def teacher_llm_request(
     action: str,
     payload: Dict[str, Any],
     session_state: Dict[str, Any],
 ) -> Dict[str, Any]:
+    # payload/session_state "plan_id" -> stored plan (and its topics)
+    session_state, plan_error = resolve_session_plan(session_state, payload)
+    if plan_error:
+        return {"error": True, "reason": plan_error}
+
     raw_topics = session_state.get("topics") or []
     topics: List[Topic] = []
     for t in raw_topics:
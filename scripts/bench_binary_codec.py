@@ -0,0 +1,112 @@
+"""
+Size and speed of MessagePack (schema registry) vs JSON bodies.
+
+    python -m scripts.bench_binary_codec [--topics 400] [--days 90] [--repeat 20]
+
+Builds a realistic plan (synthetic syllabus over --days days) and a
+session_state with practice stats and review cards for every topic, then
+prints bytes (plain and gzip) and best encode / decode times for JSON and
+for app.logic.binary_codec.
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+from app.logic import binary_codec
+from app.logic.scheduler import build_topics_from_payload, generate_study_plan, study_plan_to_dict
+from scripts.bench_plan_responses import synthetic_syllabus
+
+
+def synthetic_session_state(topics: List[Dict[str, Any]], start: date, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    stats: Dict[str, Any] = {}
+    cards: Dict[str, Any] = {}
+    for topic in topics:
+        name = topic["topic_name"]
+        attempts = rng.randint(1, 40)
+        last = start - timedelta(days=rng.randint(0, 20))
+        stats[name] = {
+            "topic_name": name,
+            "attempts": attempts,
+            "correct": rng.randint(0, attempts),
+            "last_difficulty": rng.choice(["easy", "medium", "hard"]),
+            "last_updated_iso": f"{last.isoformat()}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z",
+        }
+        interval = rng.choice([1, 3, 6, 14, 30])
+        cards[name] = {
+            "card_id": name,
+            "topic_name": name,
+            "ease": round(rng.uniform(1.3, 2.8), 2),
+            "interval_days": interval,
+            "repetitions": rng.randint(0, 6),
+            "lapses": rng.randint(0, 3),
+            "reviews": rng.randint(1, 12),
+            "due": (last + timedelta(days=interval)).isoformat(),
+            "last_review": last.isoformat(),
+        }
+    return {"topics": topics, "practice_stats": stats, "review_cards": cards}
+
+
+def _best_ms(fn: Callable[[], Any], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return min(samples)
+
+
+def _compare(label: str, value: Any, repeat: int) -> None:
+    as_json = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    as_msgpack = binary_codec.encode(value)
+    assert binary_codec.decode(as_msgpack) == json.loads(as_json), "round trip changed the value"
+
+    rows = [
+        ("json", as_json,
+         lambda: json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+         lambda: json.loads(as_json)),
+        ("msgpack", as_msgpack,
+         lambda: binary_codec.encode(value),
+         lambda: binary_codec.decode(as_msgpack)),
+    ]
+    print(f"\n{label}")
+    print(f"{'format':<10} {'bytes':>10} {'gzip bytes':>11} {'encode ms':>10} {'decode ms':>10}")
+    for name, body, encode, decode in rows:
+        print(
+            f"{name:<10} {len(body):>10} {len(gzip.compress(body, 5)):>11} "
+            f"{_best_ms(encode, repeat):>10.2f} {_best_ms(decode, repeat):>10.2f}"
+        )
+    print(f"msgpack / json size: {len(as_msgpack) / len(as_json):.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if binary_codec.msgpack is None:
+        print("msgpack is not installed (pip install msgpack)", file=sys.stderr)
+        return 1
+
+    raw_topics = synthetic_syllabus(args.topics)
+    start = date(2026, 1, 5)
+    plan = study_plan_to_dict(generate_study_plan(
+        build_topics_from_payload(raw_topics), start, start + timedelta(days=args.days), 6.0,
+    ))
+    print(f"{args.topics} topics, {len(plan['days'])} plan days, "
+          f"{sum(len(day['tasks']) for day in plan['days'])} tasks")
+
+    _compare("StudyPlanResponse", plan, args.repeat)
+    _compare("session_state", synthetic_session_state(raw_topics, start), args.repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
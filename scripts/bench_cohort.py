@@ -0,0 +1,63 @@
+"""
+Latency of cohort analytics at class and school scale.
+
+    python -m scripts.bench_cohort [--students 100000] [--topics 500] [--density 0.3]
+
+Builds a synthetic CohortMatrix (each student practiced about `density`
+of the topics) and times cohort_summary for the whole cohort, for one
+class of 40, and for a cached repeat after a performance update.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.logic.cohort import CohortMatrix, cohort_summary
+
+
+def synthetic_matrix(students: int, topics: int, density: float, seed: int = 7) -> CohortMatrix:
+    rng = np.random.default_rng(seed)
+    practiced = rng.random((students, topics)) < density
+    attempts = np.where(practiced, rng.integers(1, 40, size=(students, topics)), 0)
+    skill = rng.beta(4, 2, size=(students, 1))
+    correct = rng.binomial(attempts, skill)
+    return CohortMatrix.from_arrays(
+        [f"student-{i}" for i in range(students)],
+        [f"Topic {j}" for j in range(topics)],
+        attempts,
+        correct,
+    )
+
+
+def _timed(label: str, fn, repeat: int = 5) -> None:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    print(f"{label:<44} best {min(samples):8.1f} ms   median {sorted(samples)[len(samples) // 2]:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--density", type=float, default=0.3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matrix = synthetic_matrix(args.students, args.topics, args.density)
+    print(f"{args.students} students x {args.topics} topics, built in {time.perf_counter() - start:.1f} s")
+
+    klass = matrix.student_ids[:40]
+    _timed("whole cohort, no student rows", lambda: cohort_summary(matrix, students=[]))
+    _timed("whole cohort, every student ranked", lambda: cohort_summary(matrix))
+    _timed("one class of 40", lambda: cohort_summary(matrix, session_ids=klass))
+    _timed("update_performance + whole cohort", lambda: (
+        matrix.set("student-0", "Topic 0", 12, 7),
+        cohort_summary(matrix, students=["student-0"]),
+    ))
+
+
+if __name__ == "__main__":
+    main()
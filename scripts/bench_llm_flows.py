@@ -0,0 +1,118 @@
+"""
+Reproducible end-to-end timings of the teacher / practice / revision LLM
+flows, with model answers replayed from a cassette.
+
+    python -m scripts.bench_llm_flows [--cassette scripts/cassettes/llm_flows.jsonl]
+                                      [--mode replay|record|auto] [--latency-scale 0]
+                                      [--repeat 20]
+
+Each flow builds its prompt with teacher_llm_request / practice_llm_request /
+revision_llm_request on a fixed syllabus and plan, then runs it through
+run_llm_request. In replay mode (the default) no model is called, so the
+numbers and the output digest are the same on any machine. With
+--latency-scale 1 replayed answers take as long as they did when recorded.
+
+To re-record, point the app's model at a backend (GEMINI_API_KEY, or
+LLM_BACKEND_URL, e.g. scripts/stub_llm.py) and run with --mode record on
+a new cassette file.
+"""
+import argparse
+import asyncio
+import copy
+import hashlib
+import json
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.logic import llm
+from app.logic.llm_cassette import MODES, Cassette
+from app.logic.scheduler import build_topics_from_payload, generate_study_plan
+from app.teacher.modes.practice import practice_llm_request
+from app.teacher.modes.revision import revision_llm_request
+from app.teacher.modes.teacher_mode import teacher_llm_request
+from scripts.bench_plan_responses import _percentile, synthetic_syllabus
+
+DEFAULT_CASSETTE = Path(__file__).resolve().parent / "cassettes" / "llm_flows.jsonl"
+
+START = date(2026, 1, 5)
+TOPIC = "Topic 3"
+
+_QUESTION = {
+    "question": "Which normal form removes transitive dependencies?",
+    "options": ["1NF", "2NF", "3NF", "BCNF"],
+    "correct_answer": "3NF",
+}
+
+Builder = Callable[[str, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+FLOWS: List[Tuple[str, Builder, str, Dict[str, Any]]] = [
+    ("teacher", teacher_llm_request, "explain_topic", {"topic_name": TOPIC}),
+    ("teacher", teacher_llm_request, "summarize_topic", {"topic_name": TOPIC}),
+    ("teacher", teacher_llm_request, "give_examples", {"topic_name": TOPIC, "count": 2}),
+    ("teacher", teacher_llm_request, "check_understanding", {"topic_name": TOPIC}),
+    ("teacher", teacher_llm_request, "breakdown_steps", {"topic_name": TOPIC}),
+    ("teacher", teacher_llm_request, "explain_plan", {}),
+    ("teacher", teacher_llm_request, "explain_today", {"today_iso": (START + timedelta(days=3)).isoformat()}),
+    ("practice", practice_llm_request, "generate_questions", {"topic_name": TOPIC, "difficulty": "medium", "count": 5}),
+    ("practice", practice_llm_request, "check_answer", {"question": _QUESTION, "user_answer": "2NF"}),
+    ("revision", revision_llm_request, "revision_points", {"topic_name": TOPIC}),
+    ("revision", revision_llm_request, "revision_flashcards", {"topic_name": TOPIC}),
+    ("revision", revision_llm_request, "last_minute_revision", {"topic_name": TOPIC}),
+    ("revision", revision_llm_request, "expected_exam_questions", {"topic_name": TOPIC}),
+]
+
+
+def session_state() -> Dict[str, Any]:
+    raw_topics = synthetic_syllabus(24)
+    plan = generate_study_plan(build_topics_from_payload(raw_topics), START, START + timedelta(days=30), 4.0)
+    return {"topics": raw_topics, "plan": plan}
+
+
+async def _run(repeat: int) -> int:
+    state = session_state()
+    digest = hashlib.sha256()
+    print(f"{'flow':<36} {'prompt ms':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode, builder, action, payload in FLOWS:
+        build_ms: List[float] = []
+        total_ms: List[float] = []
+        result: Any = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            llm_request = builder(action, copy.deepcopy(payload), dict(state))
+            built = time.perf_counter()
+            if llm_request.get("error"):
+                print(f"{mode}.{action}: {llm_request.get('reason')}", file=sys.stderr)
+                return 1
+            result = await llm.run_llm_request(llm_request)
+            build_ms.append((built - started) * 1000.0)
+            total_ms.append((time.perf_counter() - started) * 1000.0)
+        digest.update(json.dumps(result, sort_keys=True).encode("utf-8"))
+        print(
+            f"{mode + '.' + action:<36} {statistics.median(build_ms):>10.2f} "
+            f"{statistics.median(total_ms):>8.2f} {_percentile(total_ms, 95):>8.2f}"
+        )
+    print(f"output digest {digest.hexdigest()[:16]}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cassette", default=str(DEFAULT_CASSETTE))
+    parser.add_argument("--mode", choices=MODES, default="replay")
+    parser.add_argument("--latency-scale", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, mode=args.mode, latency_scale=args.latency_scale)
+    print(f"cassette {args.cassette}: {len(cassette)} recordings, mode {args.mode}")
+    llm.use_cassette(cassette)
+    # one answer per flow is enough to record
+    return asyncio.run(_run(1 if args.mode == "record" else max(1, args.repeat)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Tail latency of model calls with and without hedging.
+
+    python -m scripts.bench_llm_hedging [--calls 2000] [--concurrency 16]
+                                        [--latency lognormal:600:0.3]
+                                        [--tail-rate 0.04] [--tail-factor 8]
+                                        [--time-scale 0.05]
+
+Runs the same simulated model (the --latency spec of scripts/stub_llm, and
+a --tail-rate share of calls --tail-factor times slower) through
+app.logic.llm_hedging.Hedger, once with hedging off and once on, and
+prints p50/p95/p99 and the extra model calls hedging cost. Latencies are
+multiplied by --time-scale while running and reported unscaled.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+from app.logic.llm_hedging import Hedger
+from app.logic.llm_output import example_output, schema_for
+from scripts.bench_plan_responses import _percentile
+from scripts.stub_llm import parse_latency
+
+REQUEST = {"messages": [], "metadata": {"teacher_action": "explain_topic"}}
+# Hedges only win with an answer that passes validation
+ANSWER = json.dumps(example_output(schema_for(REQUEST).schema))
+
+
+async def _run(args: argparse.Namespace, hedging: bool) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    sample = parse_latency(args.latency)
+    sent = [0]
+
+    async def model_call(llm_request: Dict[str, Any]) -> str:
+        sent[0] += 1
+        delay = sample(rng)
+        if rng.random() < args.tail_rate:
+            delay *= args.tail_factor
+        await asyncio.sleep(delay * args.time_scale)
+        return ANSWER
+
+    hedger = Hedger(
+        enabled=hedging,
+        budget=args.budget,
+        default_timeout=3600.0,
+        lane_busy=lambda: False,
+    )
+    queue = list(range(args.calls))
+    latencies: List[float] = []
+
+    async def worker() -> None:
+        while queue:
+            queue.pop()
+            started = time.perf_counter()
+            await hedger.call(REQUEST, model_call)
+            latencies.append((time.perf_counter() - started) / args.time_scale * 1000.0)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    # the first calls only warm up the p95 estimate
+    measured = latencies[hedger.min_samples:]
+    return {
+        "p50": _percentile(measured, 50),
+        "p95": _percentile(measured, 95),
+        "p99": _percentile(measured, 99),
+        "extra": sent[0] / args.calls - 1.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:600:0.3")
+    parser.add_argument("--tail-rate", type=float, default=0.04)
+    parser.add_argument("--tail-factor", type=float, default=8.0)
+    parser.add_argument("--budget", type=float, default=0.05)
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'hedging':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'extra calls':>12}")
+    for hedging in (False, True):
+        result = asyncio.run(_run(args, hedging))
+        print(
+            f"{'on' if hedging else 'off':<8} {result['p50']:>8.0f} {result['p95']:>8.0f} "
+            f"{result['p99']:>8.0f} {result['extra']:>11.1%}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Bandwidth and latency of plan responses: plain vs compressed vs 304.
+
+    python -m scripts.bench_plan_responses [--topics 400] [--days 90] [--requests 200]
+
+Polls /study_plan/generate_study_plan and /scheduler/scheduler/ in-process
+with an unchanged syllabus and prints bytes on the wire and p50/p99 latency
+for each client behaviour.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+import httpx
+
+
+def synthetic_syllabus(count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {
+            "subject_name": f"Subject {i % 12}",
+            "topic_name": f"Topic {i}",
+            "difficulty": rng.choice(["easy", "medium", "hard"]),
+            "weight": rng.choice(["low", "medium", "high"]),
+            "weakness": rng.choice(["strong", "moderate", "weak"]),
+            "progress": round(rng.random() * 0.6, 2),
+            "base_hours": rng.choice([2.0, 3.0, 4.0, 6.0]),
+        }
+        for i in range(count)
+    ]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _run(path: str, body: Dict[str, Any], requests: int) -> None:
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = await client.post(path, json=body, headers={"Accept-Encoding": "identity"})
+        first.raise_for_status()
+        etag = first.headers.get("etag", "")
+
+        scenarios = {
+            "identity (before)": {"Accept-Encoding": "identity"},
+            "gzip": {"Accept-Encoding": "gzip"},
+            "br": {"Accept-Encoding": "br"},
+            "If-None-Match": {"Accept-Encoding": "gzip, br", "If-None-Match": etag},
+        }
+        print(f"\n{path}")
+        print(f"{'client':<20} {'status':>6} {'bytes/resp':>11} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, headers in scenarios.items():
+            latencies: List[float] = []
+            wire = 0
+            status = 0
+            for _ in range(requests):
+                started = time.perf_counter()
+                resp = await client.post(path, json=body, headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                wire = resp.num_bytes_downloaded
+                status = resp.status_code
+            print(
+                f"{label:<20} {status:>6} {wire:>11} "
+                f"{statistics.median(latencies):>8.2f} {_percentile(latencies, 99):>8.2f}"
+            )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    start = date(2026, 1, 1)
+    body = {
+        "topics": synthetic_syllabus(args.topics),
+        "start_date": start.isoformat(),
+        "exam_date": (start + timedelta(days=args.days)).isoformat(),
+        "hours_per_day": 6.0,
+    }
+    asyncio.run(_run("/study_plan/generate_study_plan", body, args.requests))
+    asyncio.run(_run("/scheduler/scheduler/", body, args.requests))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Bulk-import a syllabus (CSV with a header row, or JSONL) into the topic store.
+
+    python -m scripts.import_topics FILE [--format csv|jsonl] [--name NAME]
+        [--store topics.sqlite] [--chunk-size 1000] [--workers 0] [--max-errors 100]
+
+FILE may be "-" for stdin. Rows are read and normalized chunk by chunk
+(across --workers processes if > 1); bad rows are reported and skipped.
+Without --store, TOPIC_STORE_PATH / SESSION_DATA_DIR pick the sqlite file
+the server uses. Prints the import summary as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+
+from app.logic.topic_import import FORMATS, import_topics
+from app.logic.topic_store import init_topic_store_from_env, topic_store
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("file")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    parser.add_argument("--name", default="")
+    parser.add_argument("--store", help="sqlite file (default: the server's topic store)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--max-errors", type=int, default=100)
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        extension = os.path.splitext(args.file)[1].lower().lstrip(".")
+        fmt = {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(extension)
+    if fmt is None:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    if args.store:
+        topic_store.attach_db(args.store)
+    else:
+        init_topic_store_from_env()
+    if topic_store.path is None:
+        print("warning: no --store / TOPIC_STORE_PATH / SESSION_DATA_DIR; importing into memory only", file=sys.stderr)
+
+    if args.file == "-":
+        stream = open(sys.stdin.fileno(), encoding="utf-8-sig", newline="", closefd=False)
+    else:
+        stream = open(args.file, encoding="utf-8-sig", newline="")
+    with stream:
+        summary = import_topics(
+            stream, fmt, topic_store,
+            name=args.name or os.path.basename(args.file),
+            chunk_size=args.chunk_size, workers=args.workers, max_errors=args.max_errors,
+        )
+    topic_store.close()
+
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] and not summary["imported"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
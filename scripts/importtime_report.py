@@ -0,0 +1,75 @@
+"""
+Cold-start import report for the API entrypoints.
+
+    python -m scripts.importtime_report [--module app.main] [--budget-ms 600] [--top 20]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+prints the slowest modules (cumulative and self time) and exits non-zero if
+the cold import exceeds the budget or pulls in a module that must stay lazy.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+# Modules that must never be imported just to start the app.
+FORBIDDEN_AT_STARTUP = ("google.generativeai",)
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "600"))
+
+
+def _measure(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Return (module, self_us, cumulative_us) for every import, in import order.
+    """
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=repo_root,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"import {module} failed")
+
+    rows: List[Tuple[str, int, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, timings = line.split(":", 1)
+        self_us, cumulative_us, name = timings.split("|", 2)
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = _measure(args.module)
+    total_ms = next(cum for name, _, cum in rows if name == args.module) / 1000.0
+
+    print(f"cold import of {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[: args.top]:
+        print(f"{cum_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+    failed = False
+    loaded = {name for name, _, _ in rows}
+    for forbidden in FORBIDDEN_AT_STARTUP:
+        if forbidden in loaded:
+            print(f"\nFAIL: {forbidden} is imported at startup")
+            failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: cold import exceeds budget by {total_ms - args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
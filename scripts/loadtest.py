@@ -0,0 +1,395 @@
+"""
+Offline load generator for app.main:app and api.main:app.
+
+    python -m scripts.loadtest [--target app|api|both] [--uvicorn]
+                               [--duration 20] [--concurrency 32]
+                               [--synthetic-share 0.7] [--replay FILE.jsonl ...]
+                               [--llm-url URL | --stub-latency lognormal:400:0.5
+                                --stub-failure-rate 0.01 --stub-malformed-rate 0.0]
+                               [--out report.json] [--max-error-rate 0.01]
+
+Traffic is a mix of
+  * examples/*_request.json, sent to the routes they document,
+  * replayed JSONL traffic (default: ./requests.jsonl if present), one
+    {"method", "path", "body", "headers"?, "app"?} object per line; lines
+    of any other shape are skipped,
+  * synthetic sessions: plan -> update_performance -> topic_stats ->
+    executed LLM actions -> ..., one session_id per flow.
+
+LLM calls go to scripts/stub_llm.py (started here unless --llm-url is
+given) through LLM_BACKEND_URL. Apps run in-process over ASGI by default,
+or under uvicorn with --uvicorn.
+
+Prints a JSON report with throughput, p50/p95/p99 and error rates per
+route. Exits non-zero when a target's error rate (5xx other than admission
+503s, or transport errors) is above --max-error-rate.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from scripts.bench_plan_responses import _percentile, synthetic_syllabus
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# method, path, body, headers
+Call = Tuple[str, str, Dict[str, Any], Dict[str, str]]
+
+# examples/<name>_request.json -> routes it is valid for, per app
+_EXAMPLE_ROUTES: Dict[str, Dict[str, List[str]]] = {
+    "plan": {
+        "app": ["/study_plan/generate_study_plan", "/scheduler/scheduler/"],
+        "api": ["/study_plan/generate_study_plan"],
+    },
+    "practice": {"app": ["/practice/"], "api": ["/practice/"]},
+    "teacher": {"app": ["/teacher/"], "api": ["/teacher/"]},
+}
+
+
+# =========================
+# TRAFFIC
+# =========================
+
+def example_flows(target: str) -> List[List[Call]]:
+    flows: List[List[Call]] = []
+    for path in sorted((REPO_ROOT / "examples").glob("*_request.json")):
+        routes = _EXAMPLE_ROUTES.get(path.name[: -len("_request.json")], {}).get(target, [])
+        body = json.loads(path.read_text())
+        flows.extend([("POST", route, body, {})] for route in routes)
+    return flows
+
+
+def replay_flows(paths: List[Path], target: str) -> Tuple[List[List[Call]], int]:
+    """
+    Recorded requests from JSONL files; returns (flows, skipped lines).
+    """
+    flows: List[List[Call]] = []
+    skipped = 0
+    for path in paths:
+        with path.open() as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    skipped += 1
+                    continue
+                if not isinstance(entry, dict) or "path" not in entry or "method" not in entry:
+                    skipped += 1
+                    continue
+                if entry.get("app", target) != target:
+                    continue
+                flows.append([(
+                    entry["method"].upper(),
+                    entry["path"],
+                    entry.get("body") or {},
+                    entry.get("headers") or {},
+                )])
+    return flows, skipped
+
+
+def synthetic_flow(target: str, n: int, rng: random.Random) -> List[Call]:
+    topics = synthetic_syllabus(rng.randint(10, 60), seed=n)
+    focus = topics[0]["topic_name"]
+    start = date(2026, 1, 1)
+    plan = {
+        "topics": topics,
+        "start_date": start.isoformat(),
+        "exam_date": (start + timedelta(days=rng.randint(14, 90))).isoformat(),
+        "hours_per_day": rng.choice([2.0, 4.0, 6.0]),
+    }
+    state = {"topics": topics}
+
+    def answer() -> Dict[str, Any]:
+        return {"topic_name": focus, "was_correct": rng.random() < 0.7, "difficulty": "medium"}
+
+    if target == "app":
+        session_id = f"load-app-{n}"
+        calls: List[Call] = [("POST", "/study_plan/generate_study_plan", {**plan, "session_id": session_id}, {})]
+        calls += [
+            ("POST", "/practice/", {"action": "update_performance", "payload": answer(), "session_id": session_id}, {})
+            for _ in range(3)
+        ]
+        calls += [
+            ("POST", "/practice/", {"action": "topic_stats", "payload": {"topic_name": focus}, "session_id": session_id}, {}),
+            ("POST", "/practice/", {
+                "action": "generate_questions", "payload": {"topic_name": focus, "count": 5},
+                "session_id": session_id, "execute": True,
+            }, {}),
+            ("POST", "/teacher/", {
+                "action": "explain_topic", "payload": {"topic_name": focus},
+                "session_state": state, "execute": True,
+            }, {}),
+            ("POST", "/revision/", {"action": "high_yield_topics", "payload": {}, "session_state": state}, {}),
+            ("POST", "/scheduler/scheduler/", plan, {}),
+        ]
+        return calls
+
+    session_id = f"load-api-{n}"
+    return [
+        ("POST", "/study_plan/generate_study_plan", plan, {}),
+        ("POST", "/practice/", {"action": "update_performance", "payload": answer(), "session_state": state}, {}),
+        ("POST", "/assistant/batch", {
+            "session_id": session_id,
+            "session_state": state,
+            "execute": True,
+            "items": [
+                {"mode": "teacher", "action": "explain_topic", "payload": {"topic_name": focus}},
+                {"mode": "practice", "action": "topic_stats", "payload": {"topic_name": focus}},
+                {"mode": "revision", "action": "high_yield_topics", "payload": {}},
+            ],
+        }, {}),
+        ("POST", "/revision/", {"action": "generate_revision_plan", "payload": {}, "session_state": state}, {}),
+        ("POST", "/teacher/", {"action": "summarize_topic", "payload": {"topic_name": focus}, "session_state": state}, {}),
+    ]
+
+
+# =========================
+# RUNNER
+# =========================
+
+class RouteStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status: Counter = Counter()
+        self.transport_errors = 0
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        count = len(self.latencies) + self.transport_errors
+        rejected = self.status[429] + self.status[503]
+        errors = self.transport_errors + sum(
+            n for code, n in self.status.items() if code >= 500 and code != 503
+        )
+        client_errors = sum(n for code, n in self.status.items() if 400 <= code < 500 and code != 429)
+        latencies = self.latencies or [0.0]
+        return {
+            "count": count,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "max_ms": round(max(latencies), 3),
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "rejected_rate": round(rejected / count, 4) if count else 0.0,
+            "client_error_rate": round(client_errors / count, 4) if count else 0.0,
+            "status": {str(code): n for code, n in sorted(self.status.items())},
+            "transport_errors": self.transport_errors,
+        }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    target: str,
+    fixed_flows: List[List[Call]],
+    synthetic_share: float,
+    duration: float,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+    total = RouteStats()
+    session_numbers = itertools.count()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+
+    async def send(call: Call) -> None:
+        method, path, body, headers = call
+        route = stats[f"{method} {path}"]
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, path, json=body or None, headers=headers)
+        except httpx.HTTPError:
+            route.transport_errors += 1
+            total.transport_errors += 1
+            return
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        for s in (route, total):
+            s.latencies.append(elapsed_ms)
+            s.status[resp.status_code] += 1
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            if not fixed_flows or rng.random() < synthetic_share:
+                flow = synthetic_flow(target, next(session_numbers), rng)
+            else:
+                flow = rng.choice(fixed_flows)
+            for call in flow:
+                if time.perf_counter() >= deadline:
+                    break
+                await send(call)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "total": total.report(elapsed),
+        "routes": {key: s.report(elapsed) for key, s in sorted(stats.items())},
+    }
+
+
+# =========================
+# PROCESSES
+# =========================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"process exited early while waiting for {url}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"timed out waiting for {url}")
+
+
+def _spawn(args: List[str], ready_url: str, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", *args],
+        cwd=REPO_ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(ready_url, proc)
+    except Exception:
+        proc.terminate()
+        raise
+    return proc
+
+
+async def _run_target(target: str, args, fixed_flows: List[List[Call]], llm_url: str) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(60.0)
+    if not args.uvicorn:
+        import importlib
+
+        app = importlib.import_module(f"{target}.main").app
+        # Unhandled app exceptions become 500s, as they would behind a server
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+            result = await run_load(
+                client, target, fixed_flows, args.synthetic_share, args.duration, args.concurrency, args.seed,
+            )
+        return {"mode": "in-process", **result}
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    proc = _spawn(
+        ["uvicorn", f"{target}.main:app", "--port", str(port), "--log-level", "warning"],
+        f"{base_url}/ping",
+        env={"LLM_BACKEND_URL": llm_url},
+    )
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+            result = await run_load(
+                client, target, fixed_flows, args.synthetic_share, args.duration, args.concurrency, args.seed,
+            )
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"mode": "uvicorn", **result}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=["app", "api", "both"], default="both")
+    parser.add_argument("--uvicorn", action="store_true", help="serve each app with uvicorn instead of in-process")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per target")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--synthetic-share", type=float, default=0.7)
+    parser.add_argument("--replay", type=Path, nargs="*", default=None)
+    parser.add_argument("--llm-url", default="", help="use a running LLM endpoint instead of the stub")
+    parser.add_argument("--stub-latency", default="lognormal:400:0.5")
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0)
+    parser.add_argument("--stub-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--max-error-rate", type=float, default=None)
+    args = parser.parse_args()
+
+    replay_paths = args.replay
+    if replay_paths is None:
+        default = REPO_ROOT / "requests.jsonl"
+        replay_paths = [default] if default.exists() else []
+
+    stub = None
+    llm_url = args.llm_url
+    if not llm_url:
+        port = _free_port()
+        llm_url = f"http://127.0.0.1:{port}/generate"
+        stub = _spawn(
+            [
+                "scripts.stub_llm", "--port", str(port),
+                "--latency", args.stub_latency,
+                "--failure-rate", str(args.stub_failure_rate),
+                "--malformed-rate", str(args.stub_malformed_rate),
+                "--seed", str(args.seed),
+            ],
+            f"http://127.0.0.1:{port}/health",
+        )
+
+    # Must be in place before the in-process apps make their first LLM call
+    os.environ["LLM_BACKEND_URL"] = llm_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    targets = ["app", "api"] if args.target == "both" else [args.target]
+    report: Dict[str, Any] = {
+        "config": {
+            "duration_s": args.duration,
+            "concurrency": args.concurrency,
+            "synthetic_share": args.synthetic_share,
+            "uvicorn": args.uvicorn,
+            "llm_url": llm_url,
+            "stub_latency": None if args.llm_url else args.stub_latency,
+            "stub_failure_rate": None if args.llm_url else args.stub_failure_rate,
+            "stub_malformed_rate": None if args.llm_url else args.stub_malformed_rate,
+            "replay": [str(p) for p in replay_paths],
+        },
+        "targets": {},
+    }
+    failed = False
+    try:
+        for target in targets:
+            fixed, skipped = replay_flows(replay_paths, target)
+            fixed += example_flows(target)
+            result = asyncio.run(_run_target(target, args, fixed, llm_url))
+            result["replay_lines_skipped"] = skipped
+            report["targets"][target] = result
+            if args.max_error_rate is not None and result["total"]["error_rate"] > args.max_error_rate:
+                failed = True
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    print(text)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""
+Print an X-Profile header value for one request.
+
+    PROFILE_SECRET=... python -m scripts.sign_profile POST /study_plan/generate_study_plan [--ttl 300]
+
+The signed request is profiled (or, for /admin/profiling, authorized);
+see app.logic.profiling.
+"""
+import argparse
+import os
+import sys
+
+from app.logic.profiling import sign_request
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("method")
+    parser.add_argument("path")
+    parser.add_argument("--ttl", type=int, default=300, help="seconds the header stays valid")
+    parser.add_argument("--secret", default=os.getenv("PROFILE_SECRET"), help="default: $PROFILE_SECRET")
+    args = parser.parse_args()
+
+    if not args.secret:
+        print("PROFILE_SECRET is not set", file=sys.stderr)
+        return 1
+    print(sign_request(args.secret, args.method, args.path, args.ttl))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
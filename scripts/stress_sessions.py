@@ -0,0 +1,104 @@
+"""
+Stress check for per-session serialization of session_state mutations.
+
+    python -m scripts.stress_sessions [--sessions 50] [--updates 200]
+
+1. Fires sessions x updates concurrent update_performance calls at
+   /practice/ (in-process ASGI) and verifies every attempt was recorded.
+2. Runs a read-modify-write with an await in the middle under
+   session_store.lock() and verifies no increments are lost, while a
+   different session is never blocked by a busy one.
+
+Exits non-zero on any lost update.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.logic.sessions import SessionStore
+
+
+async def _route_stress(sessions: int, updates: int) -> int:
+    from app.main import app
+    from app.logic.sessions import session_store
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+
+        async def submit(session_id: str, i: int) -> None:
+            resp = await client.post("/practice/", json={
+                "action": "update_performance",
+                "payload": {"topic_name": "Algebra", "was_correct": i % 2 == 0},
+                "session_id": session_id,
+            })
+            resp.raise_for_status()
+
+        jobs = [
+            submit(f"stress-{s}", i)
+            for i in range(updates)
+            for s in range(sessions)
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        elapsed = time.perf_counter() - started
+
+    lost = 0
+    for s in range(sessions):
+        perf = session_store.get(f"stress-{s}")["practice_stats"]["Algebra"]
+        lost += updates - perf["attempts"]
+        lost += (updates + 1) // 2 - perf["correct"]
+    print(f"route: {sessions * updates} updates in {elapsed:.2f}s, lost={lost}")
+    return lost
+
+
+async def _lock_stress(sessions: int, updates: int) -> int:
+    store = SessionStore()
+
+    async def bump(session_id: str) -> None:
+        async with store.lock(session_id):
+            stats = store.get(session_id)["practice_stats"]
+            current = stats.get("n", 0)
+            await asyncio.sleep(0)  # yield mid read-modify-write
+            stats["n"] = current + 1
+
+    await asyncio.gather(*[
+        bump(f"s{s}") for _ in range(updates) for s in range(sessions)
+    ])
+    lost = sum(updates - store.get(f"s{s}")["practice_stats"]["n"] for s in range(sessions))
+
+    # A slow holder on one session must not delay another session.
+    async def hold(session_id: str, seconds: float) -> None:
+        async with store.lock(session_id):
+            await asyncio.sleep(seconds)
+
+    async def quick(session_id: str) -> float:
+        started = time.perf_counter()
+        async with store.lock(session_id):
+            pass
+        return time.perf_counter() - started
+
+    holder = asyncio.ensure_future(hold("busy", 0.5))
+    await asyncio.sleep(0)
+    other_wait = await quick("idle")
+    await holder
+
+    print(f"lock: lost={lost}, other-session wait={other_wait * 1000:.2f}ms, live locks={len(store.lock)}")
+    return lost + (1 if other_wait > 0.1 else 0)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--updates", type=int, default=200)
+    args = parser.parse_args()
+
+    failures = asyncio.run(_lock_stress(args.sessions, args.updates))
+    failures += asyncio.run(_route_stress(args.sessions, args.updates))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the LLM, for load tests without network access.
+
+    python -m scripts.stub_llm [--port 8765] [--latency lognormal:400:0.5]
+                               [--failure-rate 0.01] [--malformed-rate 0.0]
+
+Point the app at it with LLM_BACKEND_URL=http://127.0.0.1:8765/generate.
+
+    POST /generate {"prompt": "..."} -> {"text": "<json>"}
+    GET  /health                     -> {"ok": true, "served": n}
+
+Latency specs (milliseconds):
+    fixed:MS  uniform:LO:HI  lognormal:MEDIAN:SIGMA  exponential:MEAN
+
+--failure-rate answers HTTP 500; --malformed-rate answers 200 with text
+that is not JSON (what a model does when it ignores the output format).
+
+Prompts naming a "kind" with an output schema (app.logic.llm_output) get
+the smallest answer matching it, so validation passes without re-asks.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+from app.logic.llm_output import example_output, schema_for_kind
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Return a sampler of delays in seconds for a latency spec.
+    """
+    kind, _, rest = spec.partition(":")
+    args = [float(a) for a in rest.split(":")] if rest else []
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0] / 1000.0
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000.0
+    if kind == "lognormal" and len(args) == 2:
+        mu = math.log(max(args[0], 1e-6))
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000.0
+    if kind == "exponential" and len(args) == 1:
+        return lambda rng: rng.expovariate(1.0 / max(args[0], 1e-6)) / 1000.0
+    raise ValueError(f"bad latency spec: {spec!r}")
+
+
+_KIND = re.compile(r'"kind":\s*"(\w+)"')
+_COUNT = re.compile(r"(?:EXACTLY|BETWEEN|around)\s+(\d+)")
+
+
+def _schema_answer(prompt: str):
+    match = _KIND.search(prompt)
+    schema = schema_for_kind(match.group(1)) if match else None
+    if schema is None:
+        return None
+    count = _COUNT.search(prompt)
+    n = min(int(count.group(1)), 20) if count else 5
+    return example_output(schema.schema, {"count": n, "requested_count": n})
+
+
+def _canned_answer(prompt: str) -> Dict:
+    answer = _schema_answer(prompt)
+    if answer is not None:
+        return answer
+    # One body that satisfies every mode's response_format well enough for
+    # load purposes; question count follows the prompt when it names one.
+    match = re.search(r"(\d+)\s+(?:multiple|questions|mcq)", prompt, re.IGNORECASE)
+    count = min(int(match.group(1)), 20) if match else 5
+    questions: List[Dict] = [
+        {
+            "question": f"Stub question {i + 1}?",
+            "options": ["A", "B", "C", "D"],
+            "correct_answer": "A",
+            "explanation": "Stub explanation.",
+        }
+        for i in range(count)
+    ]
+    return {
+        "kind": "stub",
+        "explanation": "Stub explanation.",
+        "summary": "Stub summary.",
+        "examples": ["Stub example."],
+        "steps": ["Step 1", "Step 2"],
+        "points": ["Point 1", "Point 2"],
+        "flashcards": [{"front": "Q", "back": "A"}],
+        "questions": questions,
+        "is_correct": True,
+        "correct_answer": "A",
+        "feedback": "Stub feedback.",
+    }
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, latency, failure_rate: float, malformed_rate: float, seed: int):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.served = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _StubServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # keep load tests quiet
+        pass
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"ok": True, "served": self.server.served})
+        else:
+            self._send_json(404, {"error": "not_found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if self.path != "/generate":
+            self._send_json(404, {"error": "not_found"})
+            return
+        try:
+            prompt = json.loads(raw or b"{}").get("prompt", "")
+        except ValueError:
+            self._send_json(400, {"error": "bad_json"})
+            return
+
+        server = self.server
+        with server.rng_lock:
+            delay = server.latency(server.rng)
+            roll = server.rng.random()
+            server.served += 1
+        time.sleep(delay)
+
+        if roll < server.failure_rate:
+            self._send_json(500, {"error": "stub_failure"})
+        elif roll < server.failure_rate + server.malformed_rate:
+            self._send_json(200, {"text": "Sure! Here is your answer: ```not json```"})
+        else:
+            self._send_json(200, {"text": json.dumps(_canned_answer(prompt))})
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:400:0.5")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = _StubServer(
+        (args.host, args.port),
+        parse_latency(args.latency),
+        args.failure_rate,
+        args.malformed_rate,
+        args.seed,
+    )
+    print(f"stub LLM on http://{args.host}:{server.server_address[1]}/generate", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())